@@ -0,0 +1,326 @@
+"""
+Sales Analytics Module
+Hourly, daily and all-time sales rollups kept up to date by SQLite triggers,
+so the /api/stats endpoints never scan the raw transactions table
+
+Rollups are kept per store (transactions without a store under ''), so a
+report can cover one store or, summed up, all of them.
+
+Rebuild the rollups from raw history:
+    python analytics.py --rebuild [--db ../data/products.db]
+"""
+
+import argparse
+import os
+import re
+import sys
+
+# Rollup tables and the bucket each transaction is counted in ({ts} is its created_at)
+ROLLUPS = (
+    ('sales_hourly', "strftime('%Y-%m-%d %H:00:00', {ts})"),
+    ('sales_daily', "date({ts})"),
+    ('sales_total', "'all'"),
+)
+
+# Orderings accepted by top_products
+TOP_PRODUCT_METRICS = ('revenue', 'weight_g', 'transactions')
+
+# Category of products missing from the catalog
+UNKNOWN_CATEGORY = 'Inne'
+
+# Store key of transactions rung up without a store (primary key columns cannot be NULL)
+NO_STORE = ''
+
+_METRIC_SUMS = '''SUM(transactions) AS transactions, SUM(weight_g) AS weight_g, SUM(revenue) AS revenue,
+                  SUM(confidence_sum) AS confidence_sum, SUM(confidence_count) AS confidence_count'''
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def rollup_schema_statements(by_store=True):
+    """
+    CREATE statements for the rollup tables and the triggers that update them on every insert
+
+    Args:
+        by_store: Key the rollups by store too (False: the original schema, for migration 2 only,
+                  which runs before transactions have a store_id column)
+    """
+    store_column = "store_id TEXT NOT NULL," if by_store else ""
+    store_key = "store_id, " if by_store else ""
+    store_value = f"COALESCE(NEW.store_id, '{NO_STORE}'), " if by_store else ""
+
+    statements = []
+    for table, bucket in ROLLUPS:
+        statements.append(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                {store_column}
+                product_name TEXT NOT NULL,
+                transactions INTEGER NOT NULL,
+                weight_g REAL NOT NULL,
+                revenue REAL NOT NULL,
+                confidence_sum REAL NOT NULL,
+                confidence_count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, {store_key}product_name)
+            ) WITHOUT ROWID
+        ''')
+        statements.append(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_on_insert
+            AFTER INSERT ON transactions
+            BEGIN
+                INSERT INTO {table} VALUES (
+                    {bucket.format(ts='NEW.created_at')}, {store_value}NEW.product_name, 1, NEW.weight_g,
+                    NEW.total_price, COALESCE(NEW.confidence, 0), NEW.confidence IS NOT NULL
+                )
+                ON CONFLICT (bucket, {store_key}product_name) DO UPDATE SET
+                    transactions = transactions + 1,
+                    weight_g = weight_g + excluded.weight_g,
+                    revenue = revenue + excluded.revenue,
+                    confidence_sum = confidence_sum + excluded.confidence_sum,
+                    confidence_count = confidence_count + excluded.confidence_count;
+            END
+        ''')
+    return statements
+
+
+def rollup_backfill_statements(by_store=True):
+    """Statements that recompute every rollup table from the raw transactions"""
+    store_value = f"COALESCE(store_id, '{NO_STORE}'), " if by_store else ""
+    statements = []
+    for table, bucket in ROLLUPS:
+        statements.append(f"DELETE FROM {table}")
+        statements.append(f'''
+            INSERT INTO {table}
+            SELECT {bucket.format(ts='created_at')}, {store_value}product_name, COUNT(*), SUM(weight_g),
+                   SUM(total_price), COALESCE(SUM(confidence), 0), COUNT(confidence)
+            FROM transactions
+            GROUP BY {'1, 2, 3' if by_store else '1, 2'}
+        ''')
+    return statements
+
+
+def rollup_rebuild_by_store_statements():
+    """Replace the rollups of migration 2 with rollups keyed by store, recomputed from history"""
+    statements = []
+    for table, _ in ROLLUPS:
+        statements.append(f"DROP TRIGGER IF EXISTS {table}_on_insert")
+        statements.append(f"DROP TABLE IF EXISTS {table}")
+    return statements + rollup_schema_statements() + rollup_backfill_statements()
+
+
+def _check_date(value, name):
+    """Validate an optional YYYY-MM-DD query argument"""
+    if value is not None and not _DATE_PATTERN.match(value):
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+    return value
+
+
+def _summary(row):
+    """Rounded metrics of one aggregated rollup row"""
+    return {
+        "transactions": row['transactions'],
+        "weight_kg": round(row['weight_g'] / 1000.0, 3),
+        "revenue": round(row['revenue'], 2),
+        "mean_confidence": round(row['confidence_sum'] / row['confidence_count'], 4)
+        if row['confidence_count'] else None
+    }
+
+
+class SalesAnalytics:
+    """Read side of the sales rollups"""
+
+    def __init__(self, database):
+        """
+        Initialize analytics
+
+        Args:
+            database: ProductDatabase (its pool and catalog are looked up on every call)
+        """
+        self.database = database
+
+    def _per_product(self, start=None, end=None, store_id=None):
+        """
+        Totals per product over whole days [start, end), or all time when no range is given
+
+        Reads at most (days in range x stores x products) rollup rows.
+
+        Args:
+            store_id: Only this store's sales (None: all stores)
+        """
+        _check_date(start, "from")
+        _check_date(end, "to")
+
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("bucket >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("bucket < ?")
+            params.append(end)
+        if store_id is not None:
+            conditions.append("store_id = ?")
+            params.append(store_id)
+
+        table = 'sales_total' if start is None and end is None else 'sales_daily'
+        sql = f"SELECT product_name, {_METRIC_SUMS} FROM {table}"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        sql += " GROUP BY product_name"
+
+        with self.database.pool.connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def top_products(self, limit=10, by='revenue', start=None, end=None, store_id=None):
+        """
+        Best selling products
+
+        Args:
+            limit: Number of products (at least 1)
+            by: 'revenue', 'weight_g' or 'transactions'
+            start: First day, inclusive (YYYY-MM-DD)
+            end: Last day, exclusive
+            store_id: Only this store's sales (None: all stores)
+
+        Raises:
+            ValueError: Invalid limit, ordering or date
+        """
+        if limit is None or limit < 1:
+            raise ValueError("limit must be a positive integer")
+        if by not in TOP_PRODUCT_METRICS:
+            raise ValueError(f"by must be one of {', '.join(TOP_PRODUCT_METRICS)}")
+
+        rows = sorted(self._per_product(start, end, store_id), key=lambda row: row[by], reverse=True)[:limit]
+        catalog = self.database.get_catalog().by_name
+
+        products = []
+        for row in rows:
+            product = catalog.get(row['product_name'])
+            entry = {"product_name": row['product_name'],
+                     "product_name_polish": product['name_polish'] if product else None}
+            entry.update(_summary(row))
+            products.append(entry)
+        return products
+
+    def revenue_by_category(self, start=None, end=None, store_id=None):
+        """Revenue, kilograms and transactions per product category, highest revenue first"""
+        catalog = self.database.get_catalog().by_name
+        categories = {}
+
+        for row in self._per_product(start, end, store_id):
+            product = catalog.get(row['product_name'])
+            category = (product['category'] if product else None) or UNKNOWN_CATEGORY
+            totals = categories.setdefault(category, {"transactions": 0, "weight_g": 0.0, "revenue": 0.0,
+                                                      "confidence_sum": 0.0, "confidence_count": 0})
+            for key in totals:
+                totals[key] += row[key]
+
+        result = []
+        for category, totals in categories.items():
+            entry = {"category": category}
+            entry.update(_summary(totals))
+            result.append(entry)
+        return sorted(result, key=lambda entry: entry['revenue'], reverse=True)
+
+    def confidence(self, start=None, end=None, store_id=None):
+        """Mean classification confidence overall and per product"""
+        rows = self._per_product(start, end, store_id)
+        total = sum(row['confidence_sum'] for row in rows)
+        count = sum(row['confidence_count'] for row in rows)
+
+        return {
+            "mean_confidence": round(total / count, 4) if count else None,
+            "transactions_with_confidence": count,
+            "products": {
+                row['product_name']: round(row['confidence_sum'] / row['confidence_count'], 4)
+                for row in rows if row['confidence_count']
+            }
+        }
+
+    def hourly(self, day, product_name=None, store_id=None):
+        """
+        Per-product, per-hour sales of one day
+
+        Raises:
+            ValueError: Missing or invalid day
+        """
+        if day is None:
+            raise ValueError("day is required")
+        _check_date(day, "day")
+
+        sql = f"SELECT bucket, product_name, {_METRIC_SUMS} FROM sales_hourly " \
+              "WHERE bucket >= ? AND bucket < date(?, '+1 day')"
+        params = [day, day]
+        if product_name is not None:
+            sql += " AND product_name = ?"
+            params.append(product_name)
+        if store_id is not None:
+            sql += " AND store_id = ?"
+            params.append(store_id)
+        sql += " GROUP BY bucket, product_name ORDER BY bucket, product_name"
+
+        with self.database.pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        hours = []
+        for row in rows:
+            entry = {"hour": row['bucket'], "product_name": row['product_name']}
+            entry.update(_summary(row))
+            hours.append(entry)
+        return hours
+
+    def rebuild(self):
+        """
+        Recompute all rollups from the raw transactions table in one transaction
+
+        Returns:
+            Dictionary with the number of rows in each rollup table
+        """
+        with self.database.pool.transaction() as conn:
+            for statement in rollup_backfill_statements():
+                conn.execute(statement)
+            return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table, _ in ROLLUPS}
+
+
+# Global analytics instance
+analytics = None
+
+
+def initialize_analytics(database):
+    """Initialize the global analytics instance"""
+    global analytics
+    analytics = SalesAnalytics(database)
+    return True
+
+
+def get_analytics():
+    """Get the global analytics instance"""
+    return analytics
+
+
+def main():
+    from database import ProductDatabase
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Sales rollup maintenance")
+    parser.add_argument('--db', default=os.environ.get('DB_PATH', os.path.join(base_dir, 'data', 'products.db')))
+    parser.add_argument('--rebuild', action='store_true', help="Recompute the rollups from raw transactions")
+    args = parser.parse_args()
+
+    if not args.rebuild:
+        parser.print_help()
+        sys.exit(1)
+
+    database = ProductDatabase(args.db)
+    if not database.connect() or not database.initialize_schema():
+        sys.exit(1)
+
+    print("Rebuilding sales rollups...")
+    counts = SalesAnalytics(database).rebuild()
+    for table, count in counts.items():
+        print(f"  {table}: {count} rows")
+    database.close()
+
+
+if __name__ == '__main__':
+    main()
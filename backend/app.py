@@ -1,19 +1,43 @@
 """
 Flask Backend Application for AI-Powered Shop Scale
 Handles image classification, weight estimation, and pricing
+
+Importing this module has no side effects. The server entry points
+initialize it: gunicorn.conf.py (preload_app in the master, then
+initialize_worker, or initialize_app in each worker), the ASGI lifespan in
+asgi.py and the __main__ block below. Routes that find it uninitialized
+(e.g. app.run from a script) call initialize_app on first use.
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
+import atexit
 import base64
+import hmac
+import json
+import socket
+import tempfile
+import threading
+import time
 from io import BytesIO
 from PIL import Image
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # Import our modules
-from model_loader import initialize_classifier, get_classifier
+from model_loader import initialize_classifier, preload_classifier, get_classifier, acquire_classifier
+from model_registry import DEFAULT_VERSION, ModelRegistry, initialize_model_manager, get_model_manager
 from weight_estimator import initialize_estimator, get_estimator
+from vision_weight import decode_frame, initialize_vision_weight, get_vision_weight
+from scale_reader import initialize_scale_reader, get_scale_reader
 from database import initialize_database, get_database
+from db_pool import PoolTimeout
+from analytics import initialize_analytics, get_analytics
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, get_metrics
+from profiler import list_profiles, load_profile, start_profile, stop_profile
+from inference_plan import initialize_inference_plan, get_inference_plan, set_inference_plan_labels
+from export_transactions import EXPORT_FORMATS, iter_transaction_chunks, parquet_available
+from price_import import load_labels, parse_price_list
 
 # Initialize Flask app
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,54 +47,555 @@ app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
 CORS(app)  # Enable CORS for frontend communication
 
 # Configuration
-MODEL_PATH = os.path.join(BASE_DIR, 'fruit_classifier_model.h5')
+# A .tflite file selects the lightweight TFLite interpreter backend
+MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join(BASE_DIR, 'fruit_classifier_model.h5'))
 LABELS_PATH = os.path.join(BASE_DIR, 'model_info.json')
-DB_PATH = os.path.join(BASE_DIR, 'data', 'products.db')
+# Versioned models (<dir>/<version>/ + ACTIVE file); MODEL_PATH is the version "default"
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', os.path.join(BASE_DIR, 'models'))
+# Seconds between checks of the ACTIVE file, so every worker follows an activation (0 = off)
+MODEL_REGISTRY_POLL = float(os.environ.get('MODEL_REGISTRY_POLL', '5'))
+DB_PATH = os.environ.get('DB_PATH', os.path.join(BASE_DIR, 'data', 'products.db'))
+
+# SQLite connection pool per process (WAL mode): size, lock wait in seconds and PRAGMA synchronous level
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', '5'))
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+
+# Write-behind (group commit) for /api/transaction: rows per transaction, max wait and durability
+# ("commit" answers after the row is on disk, "enqueue" as soon as it is queued)
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_MAX_ROWS = int(os.environ.get('WRITE_BEHIND_MAX_ROWS', '256'))
+WRITE_BEHIND_MAX_WAIT_MS = float(os.environ.get('WRITE_BEHIND_MAX_WAIT_MS', '2'))
+WRITE_BEHIND_DURABILITY = os.environ.get('WRITE_BEHIND_DURABILITY', 'commit')
+
+# Model inference path: "function" (compiled graph), "call" (eager) or "predict" (keras Model.predict)
+INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'function')
+
+# Micro-batching of concurrent /api/predict calls (useful with threaded workers)
+BATCH_INFERENCE = os.environ.get('BATCH_INFERENCE', '0') == '1'
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '32'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', '5'))
+
+# Largest accepted raw image upload and the chunk size used to read it
+MAX_IMAGE_BYTES = int(os.environ.get('MAX_IMAGE_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Largest number of images and total image bytes accepted by /api/predict_batch
+MAX_BATCH_IMAGES = int(os.environ.get('MAX_BATCH_IMAGES', '64'))
+MAX_BATCH_BYTES = int(os.environ.get('MAX_BATCH_BYTES', str(32 * 1024 * 1024)))
+# Largest request body of any kind: a batch, or one image as base64 JSON (a third larger), plus multipart framing
+MAX_REQUEST_BYTES = max(MAX_BATCH_BYTES, MAX_IMAGE_BYTES * 4 // 3) + UPLOAD_CHUNK_SIZE
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+
+# Cache of model outputs for repeated camera frames (opt-in: the perceptual hash can match two different items
+# on the same tray; size 0 disables it)
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '0'))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', '10'))
+PREDICTION_CACHE_HAMMING = int(os.environ.get('PREDICTION_CACHE_HAMMING', '0'))
+
+# Load the model in a background thread so non-ML endpoints serve immediately
+MODEL_LOAD_BACKGROUND = os.environ.get('MODEL_LOAD_BACKGROUND', '1') == '1'
+# How long /api/predict waits for a model that is still loading before answering 503
+MODEL_WAIT_TIMEOUT = float(os.environ.get('MODEL_WAIT_TIMEOUT', '60'))
+
+# Store of requests that name none (the shop this scale stands in; empty: base catalog prices)
+STORE_ID = os.environ.get('STORE_ID', '')
+# How requests name their store: "header" accepts X-Store-Id or X-Api-Key, "api_key" only X-Api-Key
+STORE_RESOLUTION = os.environ.get('STORE_RESOLUTION', 'header')
+
+# Token required by /api/admin/* endpoints (X-Admin-Token header); admin endpoints are disabled when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# Sampling profiler admin endpoint (off by default) and where profiles are saved for every worker to serve
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '0') == '1'
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'scale-profiles'))
+
+# Weight estimate: "table" (typical weight per product) or "vision" (item area in the camera frame,
+# used once the background and a reference weighing are calibrated through /api/admin/weight/*)
+WEIGHT_MODE = os.environ.get('WEIGHT_MODE', 'table')
+WEIGHT_CALIBRATION_DIR = os.environ.get('WEIGHT_CALIBRATION_DIR',
+                                        os.path.join(BASE_DIR, 'data', 'weight_calibration'))
+
+# Load cell indicator (tcp://host:port or serial:///dev/ttyUSB0?baud=9600; empty: no physical scale).
+# Its stable reading replaces the estimated weight in /api/predict and /api/calculate_price.
+SCALE_URL = os.environ.get('SCALE_URL', '')
+# Seconds and spread (grams) within which the reading must stay to count as stable
+SCALE_STABLE_SECONDS = float(os.environ.get('SCALE_STABLE_SECONDS', '0.5'))
+SCALE_STABLE_TOLERANCE = float(os.environ.get('SCALE_STABLE_TOLERANCE', '1.0'))
+# Shared memory slot through which the worker that owns the scale passes readings to the others
+SCALE_SHARED_PATH = os.environ.get('SCALE_SHARED_PATH', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'scale-reading'))
+# Lifetime of one /api/scale/stream response (the browser reconnects); keeps sync workers under their timeout
+SCALE_STREAM_SECONDS = float(os.environ.get('SCALE_STREAM_SECONDS', '60'))
+# Threads per gunicorn worker (set by gunicorn.conf.py, 0 outside gunicorn). A stream would hold a sync worker
+# (1 thread) for SCALE_STREAM_SECONDS, so there the stream is refused and the page polls /api/scale instead
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', '0'))
+SCALE_STREAM_KEEPALIVE = 15.0
+
+# Readiness states reported by /api/health
+STATE_STARTING = 'starting'
+STATE_MODEL_LOADING = 'model-loading'
+STATE_READY = 'ready'
+STATE_ERROR = 'error'
 
 # Global state
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR, MODEL_PATH, LABELS_PATH)
 app_initialized = False
+app_state = STATE_STARTING
+model_ready = threading.Event()
+init_lock = threading.Lock()
+
+
+def resolve_active_model():
+    """
+    Model version named by the registry's ACTIVE file
+
+    Returns:
+        Tuple (version, model_path, labels_path); the default model if the version is unusable
+    """
+    version = model_registry.read_active()
+    try:
+        return (version,) + model_registry.resolve(version)
+    except ValueError as e:
+        print(f"WARNING: {str(e)}, using the default model")
+        return (DEFAULT_VERSION, MODEL_PATH, LABELS_PATH)
+
+
+def active_labels_path():
+    """model_info.json of the model currently serving"""
+    classifier = get_classifier()
+    return classifier.labels_path if classifier is not None else resolve_active_model()[2]
+
+
+def load_model():
+    """Load and warm up the ML model, updating the readiness state"""
+    global app_state
+
+    start = time.time()
+    version, model_path, labels_path = resolve_active_model()
+    if not initialize_classifier(model_path, labels_path, BATCH_INFERENCE, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+                                 INFERENCE_MODE, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL,
+                                 PREDICTION_CACHE_HAMMING, version):
+        print("ERROR: Failed to load classifier model")
+        app_state = STATE_ERROR
+        model_ready.set()
+        return False
+
+    # Run one dummy inference so the first customer does not pay for graph tracing
+    get_classifier().warm_up()
+    set_inference_plan_labels(get_classifier().labels)
+
+    # Later versions are loaded, warmed up and swapped in by the model manager
+    options = {"batching": BATCH_INFERENCE, "max_batch_size": BATCH_MAX_SIZE, "max_wait_ms": BATCH_MAX_WAIT_MS,
+               "cache_size": PREDICTION_CACHE_SIZE, "cache_ttl": PREDICTION_CACHE_TTL,
+               "cache_hamming": PREDICTION_CACHE_HAMMING}
+    manager = initialize_model_manager(model_registry, INFERENCE_MODE, options,
+                                       on_swap=lambda classifier: set_inference_plan_labels(classifier.labels))
+    manager.start_watcher(MODEL_REGISTRY_POLL)
+
+    print(f"✓ ML model {version} loaded and warmed up in {time.time() - start:.1f}s")
+    app_state = STATE_READY
+    model_ready.set()
+    return True
+
+
+def start_write_behind():
+    """Start the group-commit transaction writer if enabled (after fork, it owns a thread)"""
+    if not WRITE_BEHIND:
+        return True
+
+    try:
+        get_database().enable_write_behind(WRITE_BEHIND_MAX_ROWS, WRITE_BEHIND_MAX_WAIT_MS, WRITE_BEHIND_DURABILITY)
+        print(f"✓ Transaction write-behind enabled (durability: {WRITE_BEHIND_DURABILITY})")
+        return True
+    except Exception as e:
+        print(f"ERROR: Failed to start transaction writer: {str(e)}")
+        return False
+
+
+def start_scale_reader():
+    """Start reading the physical scale if configured (after fork, it owns a thread)"""
+    if not SCALE_URL or get_scale_reader() is not None:
+        return True
+    return initialize_scale_reader(SCALE_URL, SCALE_SHARED_PATH, SCALE_STABLE_SECONDS, SCALE_STABLE_TOLERANCE)
+
+
+def shutdown_app():
+    """Write queued transactions and close the database (worker exit / interpreter exit)"""
+    reader = get_scale_reader()
+    if reader is not None:
+        reader.stop()
+
+    db = get_database()
+    if db is not None and db.writer is not None:
+        print("Draining transaction queue...")
+        db.disable_write_behind()
+
+
+atexit.register(shutdown_app)
 
 
 def initialize_app():
     """Initialize all components"""
-    global app_initialized
+    global app_initialized, app_state
+
+    with init_lock:
+        if app_initialized:
+            return True
+
+        print("=" * 60)
+        print("Initializing AI-Powered Shop Scale Application...")
+        print("=" * 60)
+
+        # Initialize weight estimator
+        print("\n[1/3] Initializing weight estimator...")
+        if not initialize_estimator():
+            print("ERROR: Failed to initialize weight estimator")
+            return False
+        if not initialize_vision_weight(get_estimator().weight_database, WEIGHT_CALIBRATION_DIR):
+            return False
+        print(f"✓ Weight estimator initialized (mode: {WEIGHT_MODE}, "
+              f"vision calibrated: {get_vision_weight().calibrated})")
+
+        # Initialize database
+        print("\n[2/3] Initializing database...")
+        if not initialize_database(DB_PATH, DB_POOL_SIZE, DB_BUSY_TIMEOUT, DB_SYNCHRONOUS):
+            print("ERROR: Failed to initialize database")
+            return False
+        initialize_analytics(get_database())
+        if not start_write_behind():
+            return False
+        print("✓ Database initialized")
+
+        if not start_scale_reader():
+            return False
+
+        if not initialize_inference_plan(resolve_active_model()[2], get_estimator(), get_database()):
+            return False
+
+        # Initialize ML model (TensorFlow is only imported here)
+        app_state = STATE_MODEL_LOADING
+        app_initialized = True
+
+        if MODEL_LOAD_BACKGROUND:
+            print("\n[3/3] Loading ML model in background...")
+            threading.Thread(target=load_model, name="model-loader", daemon=True).start()
+        else:
+            print("\n[3/3] Loading ML model...")
+            if not load_model():
+                return False
 
-    if app_initialized:
-        return True
+        print("\n" + "=" * 60)
+        print("Application initialized successfully!")
+        print("=" * 60 + "\n")
+
+    return True
+
+
+def preload_app():
+    """
+    Load fork-safe state once in the gunicorn master process
+
+    Workers inherit the imported modules, labels and catalog copy-on-write.
+    Everything that owns threads or file handles (TensorFlow runtime, sqlite
+    connection pool) is created after fork by initialize_worker().
+    """
+    global app_state
 
     print("=" * 60)
-    print("Initializing AI-Powered Shop Scale Application...")
+    print(f"Preloading AI-Powered Shop Scale Application (master pid {os.getpid()})...")
     print("=" * 60)
 
-    # Initialize ML model
-    print("\n[1/3] Loading ML model...")
-    if not initialize_classifier(MODEL_PATH, LABELS_PATH):
-        print("ERROR: Failed to load classifier model")
-        return False
-    print("✓ ML model loaded successfully")
-
-    # Initialize weight estimator
-    print("\n[2/3] Initializing weight estimator...")
     if not initialize_estimator():
         print("ERROR: Failed to initialize weight estimator")
         return False
-    print("✓ Weight estimator initialized")
+    if not initialize_vision_weight(get_estimator().weight_database, WEIGHT_CALIBRATION_DIR):
+        return False
 
-    # Initialize database
-    print("\n[3/3] Initializing database...")
-    if not initialize_database(DB_PATH):
+    # Run schema creation and default data once, then drop the connections before fork
+    if not initialize_database(DB_PATH, DB_POOL_SIZE, DB_BUSY_TIMEOUT, DB_SYNCHRONOUS):
         print("ERROR: Failed to initialize database")
         return False
-    print("✓ Database initialized")
+    initialize_analytics(get_database())
+    version, model_path, labels_path = resolve_active_model()
+    if not initialize_inference_plan(labels_path, get_estimator(), get_database()):
+        return False
+    get_database().close()
 
-    print("\n" + "=" * 60)
-    print("Application initialized successfully!")
-    print("=" * 60 + "\n")
+    if not preload_classifier(model_path, labels_path, INFERENCE_MODE, version):
+        print("ERROR: Failed to preload classifier")
+        return False
 
-    app_initialized = True
+    app_state = STATE_STARTING
+    print("✓ Preload complete, forking workers\n")
     return True
 
 
+def initialize_worker():
+    """Re-create fork-unsafe state in a freshly forked gunicorn worker and warm it up"""
+    global app_initialized, app_state
+
+    with init_lock:
+        if not get_database().connect():
+            print("ERROR: Failed to reconnect database in worker")
+            return False
+        if not start_write_behind():
+            return False
+        if not start_scale_reader():
+            return False
+
+        app_state = STATE_MODEL_LOADING
+        app_initialized = True
+
+        # Load synchronously: the worker only accepts requests once the model is warm
+        return load_model()
+
+
+def wait_for_model():
+    """Block until the model has finished loading; returns True if it is usable"""
+    if not app_initialized:
+        initialize_app()
+
+    model_ready.wait(MODEL_WAIT_TIMEOUT)
+    return app_state == STATE_READY
+
+
+def check_admin_token(token):
+    """
+    Validate an X-Admin-Token header value (independent of the web framework)
+
+    Returns:
+        Tuple (payload dict, HTTP status) if not authorized, None if authorized
+    """
+    if not ADMIN_TOKEN:
+        return {"error": "Admin endpoints are disabled (ADMIN_TOKEN is not set)"}, 403
+    if not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return {"error": "Invalid admin token"}, 401
+    return None
+
+
+def admin_auth_error():
+    """Error response for /api/admin/* and diagnostics requests without a valid admin token, None if authorized"""
+    auth_error = check_admin_token(request.headers.get('X-Admin-Token', ''))
+    if auth_error:
+        payload, status = auth_error
+        return jsonify(payload), status
+    return None
+
+
+def resolve_store(api_key, store_header):
+    """
+    Store a request belongs to, from its X-Api-Key or X-Store-Id header (independent of the web framework)
+
+    Args:
+        api_key: X-Api-Key header value ('' if missing)
+        store_header: X-Store-Id header value ('' if missing)
+
+    Returns:
+        Tuple (store_id, error, status): store_id None means the base catalog; error is None when resolved
+    """
+    catalog = get_database().get_catalog()
+
+    if api_key:
+        store_id = catalog.store_for_api_key(api_key)
+        if store_id is None:
+            return None, "Invalid API key", 401
+        return store_id, None, 200
+
+    if store_header and STORE_RESOLUTION == 'api_key':
+        return None, "Stores must be selected with an X-Api-Key header", 401
+
+    store_id = store_header or STORE_ID
+    if not store_id:
+        return None, None, 200
+    if store_id not in catalog.stores:
+        return None, f"Unknown store {store_id}", 404
+    return store_id, None, 200
+
+
+def request_store():
+    """
+    Store of the current Flask request
+
+    Returns:
+        Tuple (store_id, error_response); error_response is None when resolved
+    """
+    store_id, error, status = resolve_store(request.headers.get('X-Api-Key', ''),
+                                            request.headers.get('X-Store-Id', ''))
+    if error:
+        return None, (jsonify({"error": error}), status)
+    return store_id, None
+
+
+def model_unavailable_response():
+    """503 response for ML endpoints while the model is not ready"""
+    response = jsonify({"error": "Model is not ready", "state": app_state})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+
+@app.errorhandler(PoolTimeout)
+def database_busy_response(e):
+    """503 response when every database connection stayed busy for DB_BUSY_TIMEOUT, or a commit did not come"""
+    response = jsonify({"error": str(e)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight and note when it started"""
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.metrics_start = time.perf_counter()
+    get_metrics().request_started(g.metrics_route)
+
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Record status and latency (teardown also runs when a handler raised)"""
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        get_metrics().request_finished(g.metrics_route, request.method, g.pop('metrics_status', 500),
+                                       time.perf_counter() - start)
+
+
+def collect_process_metrics():
+    """CPU time and peak memory of this worker (peak memory only where the resource module exists)"""
+    try:
+        # Unix only; imported here so the app still starts on Windows (start.bat)
+        import resource
+    except ImportError:
+        return [('process_cpu_seconds_total', 'counter', 'User and system CPU time',
+                 [({}, time.process_time())])]
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return [
+        ('process_cpu_seconds_total', 'counter', 'User and system CPU time',
+         [({}, usage.ru_utime + usage.ru_stime)]),
+        ('process_max_resident_memory_bytes', 'gauge', 'Peak resident set size', [({}, usage.ru_maxrss * 1024)]),
+    ]
+
+
+def collect_app_metrics():
+    """Worker, model, cache and database metrics for /metrics (read at scrape time)"""
+    families = [
+        ('scale_worker_info', 'gauge', 'Worker process identity',
+         [({"pid": os.getpid(), "ppid": os.getppid(), "hostname": socket.gethostname()}, 1)]),
+        ('scale_app_state', 'gauge', 'Application readiness state',
+         [({"state": state}, int(state == app_state))
+          for state in (STATE_STARTING, STATE_MODEL_LOADING, STATE_READY, STATE_ERROR)]),
+    ] + collect_process_metrics()
+
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        families.append(('process_resident_memory_bytes', 'gauge', 'Resident set size', [({}, rss)]))
+    except (OSError, ValueError):
+        pass
+
+    classifier = get_classifier()
+    if classifier is not None:
+        families += [
+            ('scale_model_info', 'gauge', 'Model serving this worker',
+             [({"version": classifier.version or '', "model_file": os.path.basename(classifier.model_path),
+                "inference_mode": classifier.inference_mode}, 1)]),
+            ('scale_model_loaded', 'gauge', 'Whether the model is loaded', [({}, int(classifier.model is not None))]),
+            ('scale_model_in_flight', 'gauge', 'Predictions running on the model', [({}, classifier.in_flight)]),
+        ]
+        if classifier.batcher is not None:
+            stats = classifier.batcher.get_stats()
+            families += [
+                ('scale_batch_runs_total', 'counter', 'Micro-batches run', [({}, stats['batches_run'])]),
+                ('scale_batch_images_total', 'counter', 'Images scored in micro-batches', [({}, stats['images_run'])]),
+                ('scale_batch_queue_depth', 'gauge', 'Requests waiting for a micro-batch',
+                 [({}, stats['queue_depth'])]),
+            ]
+        if classifier.cache is not None:
+            stats = classifier.cache.get_stats()
+            families += [
+                ('scale_prediction_cache_hits_total', 'counter', 'Prediction cache hits',
+                 [({"kind": "exact"}, stats['exact_hits']), ({"kind": "similar"}, stats['similar_hits'])]),
+                ('scale_prediction_cache_misses_total', 'counter', 'Prediction cache misses', [({}, stats['misses'])]),
+                ('scale_prediction_cache_entries', 'gauge', 'Prediction cache entries', [({}, stats['size'])]),
+                ('scale_prediction_cache_evictions_total', 'counter', 'Entries evicted or expired',
+                 [({"reason": "size"}, stats['evictions']), ({"reason": "ttl"}, stats['expirations'])]),
+            ]
+
+    vision = get_vision_weight()
+    if vision is not None:
+        families.append(('scale_vision_weight_calibrated', 'gauge', 'Whether vision weighing is calibrated',
+                         [({"mode": WEIGHT_MODE}, int(vision.calibrated))]))
+
+    reader = get_scale_reader()
+    if reader is not None:
+        reading = reader.get_reading()
+        stats = reader.get_stats()
+        families += [
+            ('scale_reader_connected', 'gauge', 'Whether the physical scale is sending readings',
+             [({}, int(reading['connected']))]),
+            ('scale_reader_owner', 'gauge', 'Whether this worker reads the scale device', [({}, int(stats['owner']))]),
+            ('scale_reader_weight_grams', 'gauge', 'Latest scale reading', [({"stable": str(reading['stable']).lower()},
+                                                                              reading['grams'])]),
+            ('scale_reader_readings_total', 'counter', 'Readings received from the scale (owner only)',
+             [({}, stats['readings'])]),
+            ('scale_reader_stable_total', 'counter', 'Stable weights published (owner only)',
+             [({}, stats['stable_readings'])]),
+            ('scale_reader_reconnects_total', 'counter', 'Lost scale connections (owner only)',
+             [({}, stats['reconnects'])]),
+        ]
+
+    manager = get_model_manager()
+    if manager is not None and manager.shadow_stats is not None:
+        stats = manager.shadow_stats
+        families.append(('scale_shadow_predictions_total', 'counter', 'Shadow model predictions by outcome',
+                         [({"version": stats.version, "outcome": "agree"}, stats.agreed),
+                          ({"version": stats.version, "outcome": "disagree"}, stats.compared - stats.agreed),
+                          ({"version": stats.version, "outcome": "dropped"}, stats.dropped),
+                          ({"version": stats.version, "outcome": "error"}, stats.errors)]))
+
+    db = get_database()
+    if db is not None and db.pool is not None:
+        stats = db.pool.get_stats()
+        families += [
+            ('scale_db_connections', 'gauge', 'SQLite pool connections',
+             [({"state": "idle"}, stats['idle']), ({"state": "in_use"}, stats['in_use'])]),
+            ('scale_db_connections_max', 'gauge', 'SQLite pool size', [({}, stats['max_connections'])]),
+            ('scale_db_acquired_total', 'counter', 'Connections handed out', [({}, stats['acquired'])]),
+            ('scale_db_waits_total', 'counter', 'Acquisitions that had to wait', [({}, stats['waits'])]),
+            ('scale_db_wait_seconds_total', 'counter', 'Time spent waiting for a connection',
+             [({}, stats['wait_time_ms'] / 1000.0)]),
+            ('scale_db_timeouts_total', 'counter', 'Acquisitions that found no free connection (answered 503)',
+             [({}, stats['timeouts'])]),
+        ]
+        if db.catalog is not None:
+            families.append(('scale_catalog_version', 'gauge', 'Catalog version in memory',
+                             [({}, db.catalog.version)]))
+        if db.writer is not None:
+            stats = db.writer.get_stats()
+            families += [
+                ('scale_write_behind_queue_depth', 'gauge', 'Transactions waiting to be written',
+                 [({}, stats['queue_depth'])]),
+                ('scale_write_behind_rows_total', 'counter', 'Transactions written', [({}, stats['rows_written'])]),
+                ('scale_write_behind_batches_total', 'counter', 'Write-behind commits',
+                 [({}, stats['batches_written'])]),
+                ('scale_write_behind_failures_total', 'counter', 'Failed write-behind commits',
+                 [({}, stats['flush_failures'])]),
+                ('scale_write_behind_dead_lettered_total', 'counter', 'Transactions moved to the dead-letter file',
+                 [({}, stats['dead_lettered'])]),
+                ('scale_write_behind_commit_timeouts_total', 'counter', 'Transactions not committed in time (503)',
+                 [({}, stats['commit_timeouts'])]),
+            ]
+    return families
+
+
+get_metrics().add_collector(collect_app_metrics)
+
+
 @app.route('/')
 def serve_frontend():
     """Serve frontend index.html"""
@@ -88,88 +613,365 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         "status": "running",
+        "state": app_state,
+        "model_ready": app_state == STATE_READY,
         "app": "AI-Powered Shop Scale",
         "version": "1.0.0"
     })
 
 
+def upload_limit(mimetype, batch=False):
+    """
+    Largest accepted /api/predict or /api/predict_batch body (independent of the web framework)
+
+    Args:
+        mimetype: Content type of the request, without parameters
+        batch: The body is a /api/predict_batch upload
+    """
+    if batch:
+        return MAX_BATCH_BYTES
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        return MAX_IMAGE_BYTES
+    # Multipart and base64 JSON bodies are limited by MAX_CONTENT_LENGTH
+    return MAX_REQUEST_BYTES
+
+
+def check_batch_images(images):
+    """
+    Validate the images of a batch upload (independent of the web framework)
+
+    Returns:
+        Tuple (error, status), or (None, None) if the batch is acceptable
+    """
+    if not images:
+        return "No images provided", 400
+    if len(images) > MAX_BATCH_IMAGES:
+        return f"At most {MAX_BATCH_IMAGES} images per batch", 413
+    if sum(len(image) for image in images) > MAX_BATCH_BYTES:
+        return f"Images larger than {MAX_BATCH_BYTES} bytes in total", 413
+    return None, None
+
+
+def read_raw_body(max_bytes):
+    """
+    Read the raw request body in chunks, refusing anything larger than max_bytes
+
+    Returns:
+        Tuple (body, error_response); exactly one of them is None
+    """
+    too_large = (jsonify({"error": f"Upload larger than {max_bytes} bytes"}), 413)
+
+    # Reject early when the client announces an oversized body
+    length = request.content_length
+    if length is not None and length > max_bytes:
+        return None, too_large
+
+    body = bytearray()
+    stream = request.stream
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        body += chunk
+        if len(body) > max_bytes:
+            return None, too_large
+
+    if not body:
+        return None, (jsonify({"error": "No image provided"}), 400)
+    return body, None
+
+
+def read_image_from_request():
+    """
+    Extract the uploaded image bytes from the current request
+
+    Returns:
+        Tuple (image_data, error_response); exactly one of them is None
+    """
+    # Fast path: the image is the request body, no multipart or base64 decoding
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        return read_raw_body(upload_limit(request.mimetype))
+
+    # Multipart and JSON bodies over MAX_REQUEST_BYTES are refused by Werkzeug while parsing
+    try:
+        has_file = 'image' in request.files
+        data = None if has_file else request.get_json(silent=True)
+    except RequestEntityTooLarge:
+        return None, (jsonify({"error": f"Upload larger than {MAX_REQUEST_BYTES} bytes"}), 413)
+
+    if has_file:
+        # Handle multipart file upload
+        file = request.files['image']
+        return file.read(), None
+
+    if data and 'image' in data:
+        # Handle base64 encoded image
+        base64_image = data['image']
+        # Remove data:image/...;base64, prefix if present
+        if ',' in base64_image:
+            base64_image = base64_image.split(',')[1]
+        return base64.b64decode(base64_image), None
+
+    return None, (jsonify({"error": "No image provided"}), 400)
+
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """
     Predict fruit/vegetable type and estimate weight
-    Expects: POST with image data (base64 or multipart file)
+    Expects: POST with a raw image body (image/jpeg, image/png, application/octet-stream),
+             a multipart file or base64 JSON
     Returns: Classification results, weight estimate, and price
     """
-    # Ensure app is initialized (for gunicorn/production)
-    if not app_initialized:
-        initialize_app()
+    # Ensure the model is loaded (for gunicorn/production)
+    if not wait_for_model():
+        return model_unavailable_response()
 
     try:
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
+
         # Get image from request
-        image_data = None
-
-        if 'image' in request.files:
-            # Handle multipart file upload
-            file = request.files['image']
-            image_data = file.read()
-        elif 'image' in request.json:
-            # Handle base64 encoded image
-            base64_image = request.json['image']
-            # Remove data:image/...;base64, prefix if present
-            if ',' in base64_image:
-                base64_image = base64_image.split(',')[1]
-            image_data = base64.b64decode(base64_image)
-        else:
-            return jsonify({"error": "No image provided"}), 400
+        with get_metrics().stage('parse'):
+            image_data, error_response = read_image_from_request()
+        if error_response:
+            return error_response
 
-        # Get classifier and make prediction
-        classifier = get_classifier()
+        payload, status = run_prediction(image_data, store_id)
+        with get_metrics().stage('serialize'):
+            return jsonify(payload), status
+
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        print(f"Error in predict endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+def run_prediction(image_data, store_id=None):
+    """
+    Classify one image and add weight and the store's price (independent of the web framework)
+
+    Returns:
+        Tuple (payload dict, HTTP status)
+    """
+    # Vision weighing: decode once to the mask resolution, the classifier resizes the same frame
+    frame = None
+    vision = get_vision_weight()
+    if WEIGHT_MODE == 'vision' and vision is not None and vision.calibrated:
+        try:
+            with get_metrics().stage('frame'):
+                frame = decode_frame(image_data)
+        except Exception:
+            # Undecodable image: the classifier reports the error
+            frame = None
+
+    # Get classifier and make prediction (held so a model swap cannot release it mid-request)
+    with acquire_classifier() as classifier:
         if not classifier:
-            return jsonify({"error": "Classifier not initialized"}), 500
+            return {"error": "Classifier not initialized"}, 500
+        prediction_result = classifier.predict(frame if frame is not None else image_data, top_k=5)
 
-        prediction_result = classifier.predict(image_data, top_k=5)
+    if "error" in prediction_result:
+        return {"error": prediction_result["error"]}, 500
 
-        if "error" in prediction_result:
-            return jsonify({"error": prediction_result["error"]}), 500
+    # Shadow mode: a sample of images also goes to the candidate model, off the request path
+    manager = get_model_manager()
+    if manager is not None:
+        manager.maybe_shadow(image_data, prediction_result)
 
-        # Get top prediction
-        top_pred = prediction_result['top_prediction']
-        product_name = top_pred['label']
-        confidence = top_pred['confidence']
+    return build_prediction_response(prediction_result, store_id, classifier.version, frame,
+                                     measured_weight()), 200
 
-        # Estimate weight
-        estimator = get_estimator()
-        weight_result = estimator.estimate_weight(product_name)
 
-        # Calculate price
-        db = get_database()
-        price_result = db.calculate_price(product_name, weight_result['weight_grams'])
-
-        # Combine all results
-        response = {
-            "success": True,
-            "classification": {
-                "product": product_name,
-                "confidence": round(confidence * 100, 2),
-                "alternatives": prediction_result['predictions'][1:] if len(prediction_result['predictions']) > 1 else []
-            },
-            "weight": weight_result,
-            "price": price_result,
-            "timestamp": str(os.times())
+def measured_weight():
+    """Stable weight on the physical scale in grams (read from memory), or None"""
+    reader = get_scale_reader()
+    return reader.stable_weight() if reader is not None else None
+
+
+def build_prediction_response(prediction_result, store_id=None, model_version=None, frame=None,
+                              measured_grams=None):
+    """
+    Combine a classifier result with the weight estimate and the store's price
+
+    Args:
+        frame: Decoded frame for the vision weight estimate (None: typical weight from the table)
+        measured_grams: Stable reading of the physical scale, used instead of any estimate
+    """
+    # Get top prediction
+    top_pred = prediction_result['top_prediction']
+    product_name = top_pred['label']
+    confidence = top_pred['confidence']
+
+    metrics = get_metrics()
+    weight_result = None
+    if measured_grams is not None:
+        weight_result = {
+            "weight_grams": round(measured_grams, 1),
+            "weight_kg": round(measured_grams / 1000, 3),
+            "confidence": "measured",
+            "note": "Measured on the scale",
+            "method": "scale"
         }
+    elif frame is not None:
+        with metrics.stage('weight'):
+            weight_result = get_vision_weight().estimate(frame, product_name)
+
+    # Weight and price come from the per-class table, indexed by the argmax
+    plan = get_inference_plan()
+    class_id = top_pred['class_id']
+    if class_id < len(plan.labels) and plan.labels[class_id] == product_name:
+        if weight_result is None:
+            with metrics.stage('weight'):
+                weight_result = plan.estimate_weight(class_id)
+        with metrics.stage('price'):
+            price_result = plan.calculate_price(class_id, weight_result['weight_grams'], store_id)
+    else:
+        # Result of a model version swapped out mid-request, whose classes the plan no longer has
+        if weight_result is None:
+            with metrics.stage('weight'):
+                weight_result = get_estimator().estimate_weight(product_name)
+        with metrics.stage('price'):
+            price_result = get_database().calculate_price(product_name, weight_result['weight_grams'], store_id)
+
+    # Combine all results
+    return {
+        "success": True,
+        "classification": {
+            "product": product_name,
+            "confidence": round(confidence * 100, 2),
+            "alternatives": prediction_result['predictions'][1:] if len(prediction_result['predictions']) > 1 else [],
+            "model_version": model_version
+        },
+        "weight": weight_result,
+        "price": price_result,
+        "timestamp": str(os.times())
+    }
+
+
+def split_length_prefixed(body):
+    """
+    Split a length-prefixed binary body into images
+
+    Format: repeated [4-byte big-endian length][image bytes]
+
+    Returns:
+        List of memoryview slices (no copies), or None if the framing is invalid
+    """
+    view = memoryview(body)
+    images = []
+    offset = 0
+    while offset < len(view):
+        if offset + 4 > len(view):
+            return None
+        length = int.from_bytes(view[offset:offset + 4], 'big')
+        offset += 4
+        if length == 0 or offset + length > len(view):
+            return None
+        images.append(view[offset:offset + length])
+        offset += length
+    return images
+
+
+def read_images_from_request():
+    """
+    Extract a list of uploaded images from the current request
+
+    Returns:
+        Tuple (images, error_response); exactly one of them is None
+    """
+    if request.mimetype == 'application/octet-stream':
+        body, error_response = read_raw_body(upload_limit(request.mimetype, batch=True))
+        if error_response:
+            return None, error_response
+        images = split_length_prefixed(body)
+        if images is None:
+            return None, (jsonify({"error": "Malformed length-prefixed image batch"}), 400)
+    else:
+        try:
+            files = request.files.getlist('images') + request.files.getlist('image')
+        except RequestEntityTooLarge:
+            return None, (jsonify({"error": f"Upload larger than {MAX_REQUEST_BYTES} bytes"}), 413)
+        images = [file.read() for file in files]
+
+    error, status = check_batch_images(images)
+    if error:
+        return None, (jsonify({"error": error}), status)
+    return images, None
+
+
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Classify several images with one batched forward pass
+    Expects: multipart/form-data with repeated "images" fields, or an
+             application/octet-stream body of [4-byte big-endian length][image] records
+    Returns: One result per image, in upload order; a bad image only fails its own entry
+    """
+    # Ensure the model is loaded (for gunicorn/production)
+    if not wait_for_model():
+        return model_unavailable_response()
+
+    try:
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
+
+        images, error_response = read_images_from_request()
+        if error_response:
+            return error_response
 
-        return jsonify(response)
+        payload, status = run_batch_prediction(images, store_id)
+        return jsonify(payload), status
 
+    except PoolTimeout:
+        raise
     except Exception as e:
-        print(f"Error in predict endpoint: {str(e)}")
+        print(f"Error in predict_batch endpoint: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+def run_batch_prediction(images, store_id=None):
+    """
+    Classify several images and add weight and the store's price to each (independent of the web framework)
+
+    Returns:
+        Tuple (payload dict, HTTP status)
+    """
+    with acquire_classifier() as classifier:
+        if not classifier:
+            return {"error": "Classifier not initialized"}, 500
+        prediction_results = classifier.predict_batch(images, top_k=5)
+
+    results = []
+    for index, prediction_result in enumerate(prediction_results):
+        if "error" in prediction_result:
+            results.append({"index": index, "success": False, "error": prediction_result["error"]})
+            continue
+
+        try:
+            result = build_prediction_response(prediction_result, store_id, classifier.version)
+            result["index"] = index
+            results.append(result)
+        except Exception as e:
+            results.append({"index": index, "success": False, "error": str(e)})
+
+    return {
+        "success": True,
+        "count": len(results),
+        "failed": sum(1 for result in results if not result["success"]),
+        "results": results
+    }, 200
+
+
 @app.route('/api/calculate_price', methods=['POST'])
 def calculate_price():
     """
     Calculate price for a specific product and weight
-    Expects: {"product_name": "...", "weight_grams": ...}
+    Expects: {"product_name": "...", "weight_grams": ...}; without weight_grams the stable reading
+             of the physical scale is used
     """
     # Ensure app is initialized (for gunicorn/production)
     if not app_initialized:
@@ -179,25 +981,104 @@ def calculate_price():
         data = request.json
         product_name = data.get('product_name')
         weight_grams = data.get('weight_grams')
+        weight_source = "request"
+        if weight_grams is None and get_scale_reader() is not None:
+            weight_grams = measured_weight()
+            weight_source = "scale"
 
         if not product_name or weight_grams is None:
+            if product_name and weight_source == "scale":
+                return jsonify({"error": "No stable reading on the scale"}), 409
             return jsonify({"error": "Missing product_name or weight_grams"}), 400
 
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
+
         db = get_database()
-        result = db.calculate_price(product_name, weight_grams)
+        with get_metrics().stage('price'):
+            result = db.calculate_price(product_name, weight_grams, store_id)
 
         if "error" in result:
             return jsonify(result), 404
 
+        result["weight_source"] = weight_source
         return jsonify(result)
 
+    except PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def scale_event(reading):
+    """One server-sent event carrying a scale reading"""
+    return f"id: {reading['seq']}\nevent: reading\ndata: {json.dumps(reading)}\n\n"
+
+
+def scale_stream_available():
+    """Whether /api/scale/stream may hold a connection open (not on single-threaded sync workers)"""
+    return GUNICORN_THREADS != 1
+
+
+@app.route('/api/scale', methods=['GET'])
+def get_scale_reading():
+    """Latest reading of the physical scale"""
+    reader = get_scale_reader()
+    if reader is None:
+        return jsonify({"enabled": False})
+
+    reading = reader.get_reading()
+    reading["enabled"] = True
+    reading["stream"] = scale_stream_available()
+    reading["reader"] = reader.get_stats()
+    return jsonify(reading)
+
+
+@app.route('/api/scale/stream', methods=['GET'])
+def stream_scale_readings():
+    """
+    Live scale readings as server-sent events (EventSource)
+    Returns: an event per published reading; the stream ends after SCALE_STREAM_SECONDS and the browser reconnects
+    """
+    reader = get_scale_reader()
+    if reader is None:
+        return jsonify({"error": "No scale configured (SCALE_URL)"}), 404
+    if not scale_stream_available():
+        # Each stream would block a whole sync worker; clients poll /api/scale instead
+        response = jsonify({"error": "Live stream needs threaded workers (GUNICORN_THREADS > 1), poll /api/scale"})
+        response.headers['Retry-After'] = '60'
+        return response, 503
+
+    def events():
+        reading = reader.get_reading()
+        yield "retry: 1000\n\n" + scale_event(reading)
+
+        now = time.monotonic()
+        deadline = now + SCALE_STREAM_SECONDS
+        keepalive_at = now + SCALE_STREAM_KEEPALIVE
+        while now < deadline:
+            previous = reading
+            # Short waits, so a scale that goes silent is reported as disconnected
+            reading = reader.wait_for_update(previous["seq"], min(1.0, deadline - now))
+            now = time.monotonic()
+            if reading["seq"] != previous["seq"] or reading["connected"] != previous["connected"]:
+                yield scale_event(reading)
+                keepalive_at = now + SCALE_STREAM_KEEPALIVE
+            elif now >= keepalive_at:
+                yield ": keepalive\n\n"
+                keepalive_at = now + SCALE_STREAM_KEEPALIVE
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    """Get list of all available products"""
+    """Get list of all available products with the request's store prices"""
     # Ensure app is initialized (for gunicorn/production)
     if not app_initialized:
         if not initialize_app():
@@ -205,16 +1086,23 @@ def get_products():
 
     try:
         db = get_database()
-        if not db or not db.conn:
+        if not db or not db.pool:
             return jsonify({"error": "Database not initialized"}), 500
 
-        cursor = db.conn.cursor()
-        cursor.execute("SELECT name, name_polish, category, price_per_kg FROM products ORDER BY name")
-        rows = cursor.fetchall()
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
 
-        products = [dict(row) for row in rows]
-        return jsonify({"products": products, "count": len(products)})
+        # Pre-serialized body from the in-memory catalog; clients revalidate with If-None-Match
+        body, etag = db.get_catalog().listing(store_id)
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Vary'] = 'X-Store-Id, X-Api-Key'
+        return response.make_conditional(request)
 
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Error in get_products: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -228,14 +1116,25 @@ def get_product(name):
         initialize_app()
 
     try:
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
+
         db = get_database()
-        product = db.get_product_by_name(name)
+        product = db.get_product_by_name(name, store_id)
+
+        # Fall back to the Polish name (first match when several varieties share it)
+        if not product:
+            matches = db.get_products_by_polish_name(name, store_id)
+            product = matches[0] if matches else None
 
         if not product:
             return jsonify({"error": "Product not found"}), 404
 
         return jsonify(product)
 
+    except PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -243,7 +1142,7 @@ def get_product(name):
 @app.route('/api/transaction', methods=['POST'])
 def add_transaction():
     """
-    Record a transaction
+    Record a transaction, tagged with the request's store
     Expects: {"product_name": "...", "weight_g": ..., "price_per_kg": ..., "total_price": ..., "confidence": ...}
     """
     # Ensure app is initialized (for gunicorn/production)
@@ -261,39 +1160,415 @@ def add_transaction():
         if not all([product_name, weight_g, price_per_kg, total_price]):
             return jsonify({"error": "Missing required fields"}), 400
 
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
+
         db = get_database()
-        result = db.add_transaction(product_name, weight_g, price_per_kg, total_price, confidence)
+        with get_metrics().stage('transaction_write'):
+            result = db.add_transaction(product_name, weight_g, price_per_kg, total_price, confidence, store_id)
 
         return jsonify(result)
 
+    except PoolTimeout:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route('/api/transactions', methods=['GET'])
 def get_transactions():
-    """Get recent transactions"""
+    """
+    Get transactions, newest first (only the request's store when it names one)
+    Query: limit, cursor (next_cursor of the previous page), from, to (UTC dates), product, min_confidence
+    """
     # Ensure app is initialized (for gunicorn/production)
     if not app_initialized:
         initialize_app()
 
     try:
         limit = request.args.get('limit', 10, type=int)
+        min_confidence = request.args.get('min_confidence', type=float)
+        if request.args.get('min_confidence') is not None and min_confidence is None:
+            return jsonify({"error": "min_confidence must be a number"}), 400
+
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
+
         db = get_database()
-        transactions = db.get_recent_transactions(limit)
+        try:
+            transactions, next_cursor = db.get_transactions_page(
+                limit,
+                cursor=request.args.get('cursor'),
+                start=request.args.get('from'),
+                end=request.args.get('to'),
+                product_name=request.args.get('product'),
+                min_confidence=min_confidence,
+                store_id=store_id
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({"transactions": transactions, "count": len(transactions), "next_cursor": next_cursor})
+
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/transactions/export', methods=['GET'])
+def export_transactions():
+    """
+    Stream transactions in commit order as a chunked download (only the request's store when it names one)
+    Query: format (csv | ndjson | parquet), after_seq (resume after the last exported commit_seq), limit (>= 1)
+    """
+    # Ensure app is initialized (for gunicorn/production)
+    if not app_initialized:
+        initialize_app()
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(sorted(EXPORT_FORMATS))}"}), 400
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify({"error": "Parquet export is not available (pyarrow is not installed)"}), 501
+
+    store_id, error_response = request_store()
+    if error_response:
+        return error_response
+
+    # Values that are not integers are read as None and rejected with the out-of-range ones
+    after_seq = request.args.get('after_seq', type=int) if 'after_seq' in request.args else 0
+    if after_seq is None or after_seq < 0:
+        return jsonify({"error": "after_seq must be a non-negative integer"}), 400
+    limit = request.args.get('limit', type=int) if 'limit' in request.args else None
+    if 'limit' in request.args and (limit is None or limit < 1):
+        return jsonify({"error": "limit must be a positive integer"}), 400
+
+    mimetype, extension, encoder = EXPORT_FORMATS[export_format]
+    # Resumed CSV downloads are appended to the first part, so they carry no header row
+    chunks = iter_transaction_chunks(get_database(), after_seq, limit, store_id=store_id)
+    body = encoder(chunks, header=after_seq == 0)
+
+    response = Response(body, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="transactions_after_{after_seq}.{extension}"'
+    return response
+
+
+@app.route('/api/admin/prices', methods=['POST'])
+def import_prices():
+    """
+    Import a price list (CSV or JSON body) and swap it in atomically
+    Query: mode (merge | replace: also remove store overrides missing from the list), dry_run (1 = only diff)
+    """
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+
+    # Ensure app is initialized (for gunicorn/production)
+    if not app_initialized:
+        initialize_app()
+
+    mode = request.args.get('mode', 'merge')
+    if mode not in ('merge', 'replace'):
+        return jsonify({"error": "mode must be merge or replace"}), 400
+    dry_run = request.args.get('dry_run', '0') == '1'
+
+    list_format = 'json' if request.mimetype == 'application/json' else 'csv'
+    entries, errors = parse_price_list(request.get_data(), list_format)
+    if not entries and not errors:
+        errors = ["Price list is empty"]
+
+    # Rows that parsed are still validated, so one response lists every problem; nothing is written
+    result = get_database().import_price_list(entries, load_labels(active_labels_path()), mode == 'replace',
+                                              dry_run or bool(errors))
+    errors += result.get("errors", [])
+    if errors:
+        return jsonify({"applied": False, "errors": errors}), 400
+
+    if result["applied"]:
+        summary = result["summary"]
+        print(f"Price list imported: {summary['added']} added, {summary['changed']} changed, "
+              f"{summary['removed']} removed in {result['elapsed_ms']} ms")
+    return jsonify(result)
+
+
+@app.route('/api/admin/stores', methods=['GET'])
+def list_stores():
+    """List stores with their number of price overrides"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+
+    # Ensure app is initialized (for gunicorn/production)
+    if not app_initialized:
+        initialize_app()
+
+    stores = get_database().get_stores()
+    return jsonify({"stores": stores, "count": len(stores)})
+
+
+@app.route('/api/admin/stores', methods=['POST'])
+def register_store():
+    """
+    Register a store, or issue a new API key for an existing one
+    Expects: {"store_id": "...", "name": "..."}
+    Returns: The store with its API key (shown only once)
+    """
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+
+    # Ensure app is initialized (for gunicorn/production)
+    if not app_initialized:
+        initialize_app()
+
+    data = request.get_json(silent=True) or {}
+    store_id = str(data.get('store_id') or '').strip()
+    name = data.get('name')
+
+    result = get_database().register_store(store_id, name)
+    if "error" in result:
+        return jsonify(result), 400
+
+    print(f"Store {store_id} registered (new API key issued)")
+    return jsonify(result), 201
+
+
+def model_manager_or_error():
+    """(manager, None) once the model is loaded, (None, error response) otherwise"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return None, auth_error
+
+    if not wait_for_model():
+        return None, model_unavailable_response()
+
+    return get_model_manager(), None
+
+
+@app.route('/api/admin/models', methods=['GET'])
+def list_models():
+    """Registry versions, the active one, background loads and shadow statistics"""
+    manager, error_response = model_manager_or_error()
+    if error_response:
+        return error_response
+    return jsonify(manager.get_status())
+
+
+@app.route('/api/admin/models/activate', methods=['POST'])
+def activate_model():
+    """
+    Load a model version in the background and swap it in once warm
+    Expects: {"version": "..."}
+    Returns: 202 while the version loads (progress in GET /api/admin/models)
+    """
+    manager, error_response = model_manager_or_error()
+    if error_response:
+        return error_response
+
+    data = request.get_json(silent=True) or {}
+    result = manager.activate(str(data.get('version') or ''))
+    if "error" in result:
+        return jsonify(result), 409 if "still loading" in result["error"] else 400
+
+    return jsonify(result), 202 if result["state"] == "loading" else 200
+
+
+@app.route('/api/admin/models/shadow', methods=['POST'])
+def start_shadow_model():
+    """
+    Run a candidate version on a sample of /api/predict traffic and record agreement with the active model
+    Expects: {"version": "...", "sample_rate": 0.1}
+    Returns: 202 while the candidate loads (progress in GET /api/admin/models)
+    """
+    manager, error_response = model_manager_or_error()
+    if error_response:
+        return error_response
+
+    data = request.get_json(silent=True) or {}
+    try:
+        sample_rate = float(data.get('sample_rate', 0.1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "sample_rate must be a number"}), 400
+
+    result = manager.start_shadow(str(data.get('version') or ''), sample_rate)
+    if "error" in result:
+        return jsonify(result), 409 if "still loading" in result["error"] else 400
+    return jsonify(result), 202
+
 
-        return jsonify({"transactions": transactions, "count": len(transactions)})
+@app.route('/api/admin/models/shadow', methods=['DELETE'])
+def stop_shadow_model():
+    """Stop shadow predictions (and cancel a candidate still loading); returns the final agreement statistics"""
+    manager, error_response = model_manager_or_error()
+    if error_response:
+        return error_response
 
+    manager.stop_shadow()
+    stats = manager.shadow_stats
+    return jsonify({"success": True, "shadow": stats.to_dict() if stats is not None else None})
+
+
+def vision_weight_or_error():
+    """(vision weight estimator, None) for an authorized admin request, (None, error response) otherwise"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return None, auth_error
+
+    if not app_initialized:
+        initialize_app()
+    return get_vision_weight(), None
+
+
+@app.route('/api/admin/weight/calibration', methods=['GET'])
+def get_weight_calibration():
+    """Vision weight calibration: background, reference weighings and camera scale"""
+    vision, error_response = vision_weight_or_error()
+    if error_response:
+        return error_response
+
+    status = vision.get_status()
+    status["mode"] = WEIGHT_MODE
+    return jsonify(status)
+
+
+@app.route('/api/admin/weight/background', methods=['POST'])
+def calibrate_weight_background():
+    """
+    Set the empty-tray background for vision weighing
+    Expects: one or more frames of the empty tray, uploaded like /api/predict_batch
+    """
+    vision, error_response = vision_weight_or_error()
+    if error_response:
+        return error_response
+
+    images, error_response = read_images_from_request()
+    if error_response:
+        return error_response
+
+    result = vision.calibrate_background(images)
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+
+@app.route('/api/admin/weight/reference', methods=['POST'])
+def add_weight_reference():
+    """
+    Record a reference weighing for vision weighing
+    Expects: a frame of one item (like /api/predict) and ?product=...&weight_grams=... with its true weight
+    """
+    vision, error_response = vision_weight_or_error()
+    if error_response:
+        return error_response
+
+    product_name = request.args.get('product', '')
+    try:
+        weight_grams = float(request.args.get('weight_grams', ''))
+    except ValueError:
+        return jsonify({"error": "weight_grams must be a number"}), 400
+
+    image_data, error_response = read_image_from_request()
+    if error_response:
+        return error_response
+
+    result = vision.add_reference(image_data, product_name, weight_grams)
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result), 201
+
+
+@app.route('/api/admin/weight/reference', methods=['DELETE'])
+def clear_weight_references():
+    """Forget all reference weighings (the background stays)"""
+    vision, error_response = vision_weight_or_error()
+    if error_response:
+        return error_response
+    return jsonify(vision.clear_references())
+
+
+def stats_response(query):
+    """
+    Run an analytics query for the request's store (all stores if it names none); 400 for invalid arguments
+
+    Args:
+        query: Callable taking (analytics, store_id) and returning the payload
+    """
+    # Ensure app is initialized (for gunicorn/production)
+    if not app_initialized:
+        initialize_app()
+
+    try:
+        store_id, error_response = request_store()
+        if error_response:
+            return error_response
+        return jsonify(dict(query(get_analytics(), store_id), store_id=store_id))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except PoolTimeout:
+        raise
     except Exception as e:
+        print(f"Error in stats query: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/stats/top_products', methods=['GET'])
+def get_top_products():
+    """
+    Best selling products from the sales rollups
+    Query: limit (>= 1), by (revenue | weight_g | transactions), from, to (YYYY-MM-DD, to exclusive)
+    """
+    # A limit that is not an integer is passed on as None and rejected like a negative one
+    limit = request.args.get('limit', type=int) if 'limit' in request.args else 10
+    by = request.args.get('by', 'revenue')
+    start = request.args.get('from')
+    end = request.args.get('to')
+
+    return stats_response(lambda analytics, store_id: {
+        "products": analytics.top_products(limit, by, start, end, store_id), "by": by, "from": start, "to": end
+    })
+
+
+@app.route('/api/stats/categories', methods=['GET'])
+def get_category_stats():
+    """Revenue and kilograms per category. Query: from, to"""
+    start = request.args.get('from')
+    end = request.args.get('to')
+
+    return stats_response(lambda analytics, store_id: {
+        "categories": analytics.revenue_by_category(start, end, store_id), "from": start, "to": end
+    })
+
+
+@app.route('/api/stats/confidence', methods=['GET'])
+def get_confidence_stats():
+    """Mean classification confidence overall and per product. Query: from, to"""
+    start = request.args.get('from')
+    end = request.args.get('to')
+
+    return stats_response(lambda analytics, store_id: dict(analytics.confidence(start, end, store_id),
+                                                           **{"from": start, "to": end}))
+
+
+@app.route('/api/stats/hourly', methods=['GET'])
+def get_hourly_stats():
+    """Per-product, per-hour revenue and kilograms of one day. Query: day (YYYY-MM-DD), product"""
+    day = request.args.get('day')
+    product_name = request.args.get('product')
+
+    return stats_response(lambda analytics, store_id: {
+        "hours": analytics.hourly(day, product_name, store_id), "day": day
+    })
+
+
 @app.route('/api/model_info', methods=['GET'])
 def get_model_info():
     """Get ML model information"""
-    # Ensure app is initialized (for gunicorn/production)
-    if not app_initialized:
-        initialize_app()
+    # Ensure the model is loaded (for gunicorn/production)
+    if not wait_for_model():
+        return model_unavailable_response()
 
     try:
         classifier = get_classifier()
@@ -307,12 +1582,164 @@ def get_model_info():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/inference_plan', methods=['GET'])
+def get_inference_plan_report():
+    """Classes without a weight range or price in the compiled inference plan"""
+    if not app_initialized:
+        initialize_app()
+
+    plan = get_inference_plan()
+    if plan is None:
+        return jsonify({"error": "Inference plan not initialized"}), 500
+    return jsonify(plan.validation_report())
+
+
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    """Get prediction cache hit/miss statistics"""
+    classifier = get_classifier()
+    if not classifier:
+        return model_unavailable_response()
+
+    if classifier.cache is None:
+        return jsonify({"enabled": False})
+
+    stats = classifier.cache.get_stats()
+    stats["enabled"] = True
+    return jsonify(stats)
+
+
+@app.route('/api/db_stats', methods=['GET'])
+def get_db_stats():
+    """Get SQLite connection pool and write-behind queue statistics for this worker (admin only)"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+
+    if not app_initialized:
+        initialize_app()
+
+    db = get_database()
+    if not db or not db.pool:
+        return jsonify({"error": "Database not initialized"}), 500
+
+    stats = db.pool.get_stats()
+    stats["pid"] = os.getpid()
+    stats["write_behind"] = db.writer.get_stats() if db.writer is not None else {"enabled": False}
+    return jsonify(stats)
+
+
+def profiler_auth_error():
+    """Error response when the profiler is disabled or the admin token is wrong, None if allowed"""
+    auth_error = admin_auth_error()
+    if auth_error:
+        return auth_error
+    if not PROFILER_ENABLED:
+        return jsonify({"error": "Profiler is disabled (PROFILER_ENABLED is not set)"}), 403
+    return None
+
+
+@app.route('/api/admin/profile', methods=['POST'])
+def start_profiling():
+    """
+    Start a sampling profile of the worker that receives this request
+    Expects: {"seconds": 10, "interval_ms": 10, "tracemalloc": false, "include_idle": false}
+    Returns: 202 with the profile id (fetch the result from GET /api/admin/profile/<id>)
+    """
+    auth_error = profiler_auth_error()
+    if auth_error:
+        return auth_error
+
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get('seconds', 10))
+        interval_ms = float(data.get('interval_ms', 10))
+        top = int(data.get('top', 25))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds, interval_ms and top must be numbers"}), 400
+    if data.get('wait'):
+        # Waiting would block this worker, so the profile would only see it idle
+        return jsonify({"error": "wait is not supported, poll GET /api/admin/profile/<id> for the result"}), 400
+
+    result = start_profile(PROFILE_DIR, seconds, interval_ms, bool(data.get('tracemalloc', False)),
+                           bool(data.get('include_idle', False)), top)
+    if "error" in result:
+        if "already running" in result["error"]:
+            return jsonify(result), 409
+        return jsonify(result), 500 if "could not be written" in result["error"] else 400
+
+    print(f"Profiling worker {os.getpid()} for {seconds:g}s (profile {result['id']})")
+    return jsonify(result), 202
+
+
+@app.route('/api/admin/profile', methods=['DELETE'])
+def stop_profiling():
+    """End the profile running in the worker that receives this request"""
+    auth_error = profiler_auth_error()
+    if auth_error:
+        return auth_error
+
+    if not stop_profile():
+        return jsonify({"error": f"No profile is running in worker {os.getpid()}"}), 404
+    return jsonify({"success": True, "pid": os.getpid()})
+
+
+@app.route('/api/admin/profile', methods=['GET'])
+def get_profiles():
+    """Saved profiles of all workers"""
+    auth_error = profiler_auth_error()
+    if auth_error:
+        return auth_error
+    return jsonify({"profiles": list_profiles(PROFILE_DIR)})
+
+
+@app.route('/api/admin/profile/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    One profile
+    Query: format (json | collapsed: flamegraph.pl / speedscope input)
+    """
+    auth_error = profiler_auth_error()
+    if auth_error:
+        return auth_error
+
+    profile = load_profile(PROFILE_DIR, profile_id)
+    if profile is None:
+        return jsonify({"error": f"Profile {profile_id} not found"}), 404
+    if profile["state"] == "running":
+        response = jsonify(profile)
+        response.headers['Retry-After'] = str(int(profile["seconds"]) + 1)
+        return response, 202
+    if profile["state"] == "interrupted":
+        return jsonify(dict(profile, error=f"Worker {profile['pid']} exited before the profile was done")), 410
+    if profile["state"] == "failed":
+        return jsonify(profile), 500
+
+    if request.args.get('format') == 'collapsed':
+        response = Response(profile["collapsed"], mimetype='text/plain')
+        response.headers['Content-Disposition'] = f'attachment; filename="profile-{profile_id}.folded"'
+        return response
+    return jsonify(profile)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics_text():
+    """Request counts, latency histograms and worker stats in the Prometheus text format"""
+    return Response(get_metrics().render(), mimetype=METRICS_CONTENT_TYPE)
+
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
     return jsonify({"error": "Endpoint not found"}), 404
 
 
+@app.errorhandler(413)
+def request_too_large(error):
+    """Handle bodies over MAX_REQUEST_BYTES"""
+    return jsonify({"error": f"Request larger than {MAX_REQUEST_BYTES} bytes"}), 413
+
+
 @app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors"""
@@ -331,6 +1758,7 @@ if __name__ == '__main__':
     print("\nAvailable endpoints:")
     print("  GET  /                    - Health check")
     print("  POST /api/predict         - Classify fruit/vegetable and get price")
+    print("  POST /api/predict_batch   - Classify several images in one request")
     print("  POST /api/calculate_price - Calculate price for product")
     print("  GET  /api/products        - List all products")
     print("  GET  /api/product/<name>  - Get specific product")
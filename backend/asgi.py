@@ -0,0 +1,418 @@
+"""
+ASGI Entry Point
+Serves the same routes as app.py on asyncio: uvicorn asgi:app --workers 2
+
+/api/predict and /api/predict_batch are handled natively. The upload is read
+without blocking the event loop, and decoding, inference, weight and price run
+in a bounded thread pool (TensorFlow, NumPy and Pillow release the GIL). When
+too many requests are pending new ones get 429, and each request has a
+deadline after which it gets 504. /api/scale/stream is served natively too,
+so live scale readings do not hold a thread per browser. Multipart uploads
+and all other routes go to the Flask app through an ASGI adapter.
+Upload limits and the wait for a loading model are the same as in app.py.
+
+Importing app.py has no side effects: each server process initializes it on
+lifespan startup (or on its first request if the server sends no lifespan
+events).
+"""
+
+import asyncio
+import base64
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as scale_app
+from db_pool import PoolTimeout
+from metrics import get_metrics
+
+# Threads running decode + inference, and how many requests may wait for them
+INFERENCE_THREADS = int(os.environ.get('ASGI_INFERENCE_THREADS', str(os.cpu_count() or 2)))
+MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', '64'))
+# Seconds a request may take before it is answered with 504
+REQUEST_DEADLINE = float(os.environ.get('ASGI_REQUEST_DEADLINE', '10'))
+# How often a scale stream checks the shared reading for a new one (seconds)
+SCALE_STREAM_POLL = 0.05
+# How often a request waiting for the model checks whether it has loaded (seconds)
+MODEL_WAIT_POLL = 0.05
+
+
+class PoolFull(Exception):
+    """Too many requests are already waiting for the inference pool"""
+
+
+class DeadlineExceeded(Exception):
+    """The request deadline passed"""
+
+
+class BadRequest(Exception):
+    """The request body could not be understood"""
+
+
+class InferencePool:
+    """Bounded thread pool for CPU-bound request work with backpressure"""
+
+    def __init__(self, threads, max_pending):
+        """
+        Initialize the pool
+
+        Args:
+            threads: Number of worker threads
+            max_pending: Maximum number of queued plus running jobs
+        """
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='inference')
+        self.threads = threads
+        self.max_pending = max_pending
+
+        # Only touched from the event loop thread, so no lock is needed
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def is_full(self):
+        """True when a new job would be rejected"""
+        return self.pending >= self.max_pending
+
+    async def run(self, deadline, fn, *args):
+        """
+        Run fn(*args) in the pool
+
+        Raises:
+            PoolFull: The pending queue is full
+            DeadlineExceeded: The job did not finish before the deadline
+        """
+        if self.is_full():
+            self.rejected += 1
+            raise PoolFull()
+        self.pending += 1
+
+        def job():
+            # Skip work for requests that have already been answered with 504
+            if time.monotonic() > deadline:
+                raise DeadlineExceeded()
+            return fn(*args)
+
+        # The slot is released when the thread really finishes, not when we stop waiting
+        future = asyncio.get_running_loop().run_in_executor(self.executor, job)
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            self.expired += 1
+            raise DeadlineExceeded()
+
+    def get_stats(self):
+        """Return pool statistics"""
+        return {
+            "threads": self.threads,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "expired": self.expired
+        }
+
+    def _release(self, future):
+        self.pending -= 1
+        self.completed += 1
+
+
+pool = InferencePool(INFERENCE_THREADS, MAX_PENDING)
+
+
+def collect_pool_metrics():
+    """Inference pool backpressure for /metrics"""
+    return [
+        ('scale_asgi_pool_pending', 'gauge', 'Jobs queued or running in the inference pool', [({}, pool.pending)]),
+        ('scale_asgi_pool_jobs_total', 'counter', 'Inference pool jobs by outcome',
+         [({"outcome": "completed"}, pool.completed), ({"outcome": "rejected"}, pool.rejected),
+          ({"outcome": "expired"}, pool.expired)]),
+    ]
+
+
+get_metrics().add_collector(collect_pool_metrics)
+flask_app = WsgiToAsgi(scale_app.app)
+
+
+def get_header(scope, name):
+    """Return a request header value as str ('' if missing)"""
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+def get_mimetype(scope):
+    """Content type without parameters, lower-cased"""
+    return get_header(scope, b'content-type').split(';')[0].strip().lower()
+
+
+async def read_body(scope, receive, max_bytes):
+    """Read the request body from the ASGI channel; None if it exceeds max_bytes"""
+    length = get_header(scope, b'content-length')
+    if length.isdigit() and int(length) > max_bytes:
+        return None
+
+    body = bytearray()
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionResetError("Client disconnected")
+        body += message.get('body', b'')
+        if len(body) > max_bytes:
+            return None
+        more_body = message.get('more_body', False)
+    return body
+
+
+async def send_json(send, status, payload, headers=()):
+    """Send a complete JSON response"""
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+            (b'access-control-allow-origin', b'*'),
+        ] + list(headers)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def extract_image(mimetype, body):
+    """Image bytes from a raw or base64 JSON /api/predict body (runs in the pool)"""
+    if mimetype.startswith('image/') or mimetype == 'application/octet-stream':
+        return body
+
+    try:
+        base64_image = json.loads(body)['image']
+    except (ValueError, KeyError, TypeError):
+        raise BadRequest("No image provided")
+
+    # Remove data:image/...;base64, prefix if present
+    if ',' in base64_image:
+        base64_image = base64_image.split(',')[1]
+    return base64.b64decode(base64_image)
+
+
+def predict_job(mimetype, body, store_id):
+    """Decode, classify, weigh and price one upload"""
+    return scale_app.run_prediction(extract_image(mimetype, body), store_id)
+
+
+def predict_batch_job(body, store_id):
+    """Split a length-prefixed body and run the batch prediction"""
+    images = scale_app.split_length_prefixed(body)
+    if images is None:
+        raise BadRequest("Malformed length-prefixed image batch")
+    error, status = scale_app.check_batch_images(images)
+    if error:
+        return {"error": error}, status
+    return scale_app.run_batch_prediction(images, store_id)
+
+
+async def wait_for_model():
+    """app.wait_for_model without holding a thread: True once the model is usable, False after MODEL_WAIT_TIMEOUT"""
+    await initialize()
+    deadline = time.monotonic() + scale_app.MODEL_WAIT_TIMEOUT
+    while not scale_app.model_ready.is_set() and time.monotonic() < deadline:
+        await asyncio.sleep(MODEL_WAIT_POLL)
+    return scale_app.app_state == scale_app.STATE_READY
+
+
+async def handle_predict(scope, receive, send, batch):
+    """Native handler for /api/predict and /api/predict_batch"""
+    # Same as the Flask routes: requests arriving while the model loads wait for it
+    if not await wait_for_model():
+        await send_json(send, 503, {"error": "Model is not ready", "state": scale_app.app_state},
+                        [(b'retry-after', b'5')])
+        return
+
+    # Reject before reading the upload when the pool is already saturated
+    if pool.is_full():
+        pool.rejected += 1
+        await send_json(send, 429, {"error": "Server busy, try again"}, [(b'retry-after', b'1')])
+        return
+
+    store_id, error, status = scale_app.resolve_store(get_header(scope, b'x-api-key'),
+                                                     get_header(scope, b'x-store-id'))
+    if error:
+        await send_json(send, status, {"error": error})
+        return
+
+    deadline = time.monotonic() + REQUEST_DEADLINE
+    mimetype = get_mimetype(scope)
+
+    max_bytes = scale_app.upload_limit(mimetype, batch)
+    body = await read_body(scope, receive, max_bytes)
+    if body is None:
+        await send_json(send, 413, {"error": f"Upload larger than {max_bytes} bytes"})
+        return
+    if not body:
+        await send_json(send, 400, {"error": "No image provided"})
+        return
+
+    try:
+        if batch:
+            payload, status = await pool.run(deadline, predict_batch_job, body, store_id)
+        else:
+            payload, status = await pool.run(deadline, predict_job, mimetype, body, store_id)
+    except PoolFull:
+        await send_json(send, 429, {"error": "Server busy, try again"}, [(b'retry-after', b'1')])
+        return
+    except DeadlineExceeded:
+        await send_json(send, 504, {"error": "Request deadline exceeded"})
+        return
+    except BadRequest as e:
+        await send_json(send, 400, {"error": str(e)})
+        return
+    except PoolTimeout as e:
+        await send_json(send, 503, {"error": str(e)}, [(b'retry-after', b'1')])
+        return
+    except Exception as e:
+        print(f"Error in ASGI predict handler: {str(e)}")
+        await send_json(send, 500, {"error": str(e)})
+        return
+
+    await send_json(send, status, payload)
+
+
+async def handle_predict_with_metrics(scope, receive, send, batch):
+    """handle_predict recorded in the same request metrics as the Flask routes"""
+    route = '/api/predict_batch' if batch else '/api/predict'
+    status = [500]
+
+    async def send_recording_status(message):
+        if message['type'] == 'http.response.start':
+            status[0] = message['status']
+        await send(message)
+
+    metrics = get_metrics()
+    start = time.perf_counter()
+    metrics.request_started(route)
+    try:
+        await handle_predict(scope, receive, send_recording_status, batch)
+    finally:
+        metrics.request_finished(route, 'POST', status[0], time.perf_counter() - start)
+
+
+async def handle_scale_stream(scope, receive, send):
+    """Native /api/scale/stream: server-sent events of live scale readings until the client leaves"""
+    await initialize()
+    reader = scale_app.get_scale_reader()
+    if reader is None:
+        await send_json(send, 404, {"error": "No scale configured (SCALE_URL)"})
+        return
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'access-control-allow-origin', b'*'),
+        ]
+    })
+
+    try:
+        # The reading lives in shared memory, so checking it is cheap enough to do on the event loop
+        reading = reader.get_reading()
+        await send({'type': 'http.response.body', 'body': ("retry: 1000\n\n" + scale_app.scale_event(reading)).encode(),
+                    'more_body': True})
+        keepalive_at = time.monotonic() + scale_app.SCALE_STREAM_KEEPALIVE
+        while not disconnected.is_set():
+            try:
+                await asyncio.wait_for(disconnected.wait(), SCALE_STREAM_POLL)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+            previous, reading = reading, reader.get_reading()
+            if reading["seq"] != previous["seq"] or reading["connected"] != previous["connected"]:
+                chunk = scale_app.scale_event(reading)
+            elif time.monotonic() >= keepalive_at:
+                chunk = ": keepalive\n\n"
+            else:
+                continue
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            keepalive_at = time.monotonic() + scale_app.SCALE_STREAM_KEEPALIVE
+    except OSError:
+        # Client went away while we were sending
+        pass
+    finally:
+        watcher.cancel()
+
+
+async def initialize():
+    """Initialize the app off the event loop (no-op once done); True on success"""
+    if scale_app.app_initialized:
+        return True
+    return await asyncio.get_running_loop().run_in_executor(None, scale_app.initialize_app)
+
+
+async def handle_lifespan(receive, send):
+    """Answer ASGI lifespan events: initialize the app on startup; on exit stop the pool, drain queued transactions"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if await initialize():
+                await send({'type': 'lifespan.startup.complete'})
+            else:
+                await send({'type': 'lifespan.startup.failed', 'message': "Application initialization failed"})
+                return
+        elif message['type'] == 'lifespan.shutdown':
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+            scale_app.shutdown_app()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] == 'POST':
+        path = scope['path']
+        mimetype = get_mimetype(scope)
+
+        if path == '/api/predict' and mimetype != 'multipart/form-data':
+            await handle_predict_with_metrics(scope, receive, send, batch=False)
+            return
+
+        if path == '/api/predict_batch' and mimetype == 'application/octet-stream':
+            await handle_predict_with_metrics(scope, receive, send, batch=True)
+            return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == '/api/scale/stream':
+        await handle_scale_stream(scope, receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['path'] == '/api/pool_stats':
+        # Diagnostics need the admin token, like /api/db_stats
+        auth_error = scale_app.check_admin_token(get_header(scope, b'x-admin-token'))
+        if auth_error:
+            await send_json(send, auth_error[1], auth_error[0])
+        else:
+            await send_json(send, 200, pool.get_stats())
+        return
+
+    # Everything else is served by the Flask app
+    await flask_app(scope, receive, send)
@@ -6,19 +6,268 @@ Manages product information, prices, and transactions using SQLite
 import sqlite3
 import json
 import os
+import re
+import base64
+import hashlib
+import secrets
+import threading
+import time
 from datetime import datetime
 
+from analytics import rollup_backfill_statements, rollup_rebuild_by_store_statements, rollup_schema_statements
+from db_pool import ConnectionPool, PoolTimeout
+from price_import import MAX_STORE_ID_LENGTH, diff_price_list, summarize_diff, validate_price_list
+from transaction_writer import TransactionWriter
+
+# Seconds between checks whether another connection changed the products table
+CATALOG_CHECK_INTERVAL = 1.0
+
+# Columns returned by /api/products
+CATALOG_LISTING_COLUMNS = ('name', 'name_polish', 'category', 'price_per_kg')
+
+# Schema migrations applied in order by initialize_schema; PRAGMA user_version counts the applied ones
+SCHEMA_MIGRATIONS = [
+    # 1: transaction history newest first, overall and per product (id breaks created_at ties)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_product_name ON transactions (product_name, created_at, id)",
+    ],
+    # 2: hourly / daily / all-time sales rollups maintained by insert triggers, backfilled from history
+    rollup_schema_statements(by_store=False) + rollup_backfill_statements(by_store=False),
+    # 3: per-store price overrides from imported price lists
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS store_prices (
+            store_id TEXT NOT NULL,
+            product_name TEXT NOT NULL,
+            price_per_kg REAL NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (store_id, product_name)
+        ) WITHOUT ROWID
+        ''',
+    ] + [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS store_prices_{event.lower()}_version
+        AFTER {event} ON store_prices
+        BEGIN
+            UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+        END
+        '''
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ],
+    # 4: registered stores with their API keys, and the store every transaction was rung up in
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS stores (
+            store_id TEXT PRIMARY KEY,
+            name TEXT,
+            api_key_hash TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        ''',
+    ] + [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS stores_{event.lower()}_version
+        AFTER {event} ON stores
+        BEGIN
+            UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+        END
+        '''
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ] + [
+        "ALTER TABLE transactions ADD COLUMN store_id TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_store ON transactions (store_id, created_at, id)",
+    ],
+    # 5: sales rollups keyed by store as well, so per-store reports do not mix stores
+    rollup_rebuild_by_store_statements(),
+    # 6: commit order of transactions, the resume key of exports (write-behind ids are reserved in blocks and
+    # committed later, so id order is not commit order); writers serialize, so MAX + 1 follows commit order
+    [
+        "ALTER TABLE transactions ADD COLUMN commit_seq INTEGER",
+        "UPDATE transactions SET commit_seq = id",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_commit_seq ON transactions (commit_seq)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_commit_seq
+        AFTER INSERT ON transactions
+        WHEN NEW.commit_seq IS NULL
+        BEGIN
+            UPDATE transactions SET commit_seq = (SELECT COALESCE(MAX(commit_seq), 0) + 1 FROM transactions)
+            WHERE id = NEW.id;
+        END
+        ''',
+    ],
+]
+
+_UPSERT_PRODUCT_SQL = '''
+    INSERT INTO products (name, name_polish, category, price_per_kg, sell_by_weight)
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT (name) DO UPDATE SET
+        name_polish = excluded.name_polish,
+        category = COALESCE(excluded.category, category),
+        price_per_kg = excluded.price_per_kg
+'''
+
+_UPSERT_STORE_PRICE_SQL = '''
+    INSERT INTO store_prices (store_id, product_name, price_per_kg)
+    VALUES (?, ?, ?)
+    ON CONFLICT (store_id, product_name) DO UPDATE SET
+        price_per_kg = excluded.price_per_kg,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+# Largest page of /api/transactions
+MAX_TRANSACTIONS_PAGE = 1000
+
+# Bounds of the transaction history filter, in the format of created_at
+_TIMESTAMP_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}:\d{2})?$')
+
+
+def hash_api_key(api_key):
+    """Stored form of a store API key (the key itself is only shown once, when it is issued)"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def encode_cursor(created_at, transaction_id):
+    """Opaque pagination cursor pointing at the last row of a page"""
+    return base64.urlsafe_b64encode(f"{created_at}|{transaction_id}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a pagination cursor
+
+    Returns:
+        Tuple (created_at, transaction_id)
+
+    Raises:
+        ValueError: The cursor is malformed
+    """
+    try:
+        created_at, transaction_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return created_at, int(transaction_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _check_timestamp(value, name):
+    """Validate an optional YYYY-MM-DD or YYYY-MM-DD HH:MM:SS bound (anything else would silently match no rows)"""
+    if value is not None and not _TIMESTAMP_PATTERN.match(value):
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD or YYYY-MM-DD HH:MM:SS format")
+    return value
+
+
+class CatalogSnapshot:
+    """
+    Immutable in-memory view of the products table with lookup indexes
+
+    Prices are layered: the base catalog, and on top of it one dictionary of
+    overrides per store. Resolving a store price is two dictionary lookups,
+    however many stores there are.
+    """
+
+    def __init__(self, rows, version, store_rows=(), stores=()):
+        """
+        Build the snapshot
+
+        Args:
+            rows: Product rows as dictionaries, ordered by name
+            version: catalog_meta version the rows were read at
+            store_rows: (store_id, product_name, price_per_kg) override rows
+            stores: (store_id, name, api_key_hash) rows of registered stores
+        """
+        self.version = version
+        self.products = tuple(rows)
+        self.by_name = {product['name']: product for product in self.products}
+
+        by_polish_name = {}
+        for product in self.products:
+            by_polish_name.setdefault(product['name_polish'], []).append(product)
+        self.by_polish_name = {name: tuple(products) for name, products in by_polish_name.items()}
+
+        # Override layer: store_id -> {product_name: price_per_kg}
+        self.store_prices = {}
+        for store_id, product_name, price_per_kg in store_rows:
+            self.store_prices.setdefault(store_id, {})[product_name] = price_per_kg
+
+        # Known stores (registered or with imported prices) and API key hash -> store_id
+        self.stores = {store_id: None for store_id in self.store_prices}
+        self.stores_by_key = {}
+        for store_id, name, api_key_hash in stores:
+            self.stores[store_id] = name
+            if api_key_hash:
+                self.stores_by_key[api_key_hash] = store_id
+
+        # Pre-serialized /api/products body; the ETag is a content hash so every worker agrees on it
+        self.products_json, self.etag = self._serialize_listing(None)
+        # Per-store bodies are built on first request; the snapshot is replaced, never updated
+        self._store_listings = {}
+
+    def price_per_kg(self, product, store_id=None):
+        """Price of a base product row in a store (the base price when the store does not override it)"""
+        overrides = self.store_prices.get(store_id)
+        if overrides:
+            return overrides.get(product['name'], product['price_per_kg'])
+        return product['price_per_kg']
+
+    def store_for_api_key(self, api_key):
+        """store_id an API key belongs to, None if the key is unknown"""
+        return self.stores_by_key.get(hash_api_key(api_key))
+
+    def listing(self, store_id=None):
+        """
+        /api/products body and ETag for a store
+
+        Returns:
+            Tuple (json bytes, etag)
+        """
+        if store_id is None:
+            return self.products_json, self.etag
+
+        listing = self._store_listings.get(store_id)
+        if listing is None:
+            listing = self._serialize_listing(store_id)
+            self._store_listings[store_id] = listing
+        return listing
+
+    def _serialize_listing(self, store_id):
+        listing = []
+        for product in self.products:
+            entry = {column: product[column] for column in CATALOG_LISTING_COLUMNS}
+            entry['price_per_kg'] = self.price_per_kg(product, store_id)
+            listing.append(entry)
+
+        body = {"products": listing, "count": len(listing)}
+        if store_id is not None:
+            body["store_id"] = store_id
+        products_json = json.dumps(body, sort_keys=True).encode('utf-8')
+        return products_json, hashlib.sha1(products_json).hexdigest()
+
 
 class ProductDatabase:
     """Handles product database operations"""
 
-    def __init__(self, db_path):
-        """Initialize database connection"""
+    def __init__(self, db_path, pool_size=8, busy_timeout=5.0, synchronous='NORMAL'):
+        """
+        Initialize database settings (connections are opened by connect())
+
+        Args:
+            db_path: Path to the SQLite database file
+            pool_size: Maximum number of pooled connections
+            busy_timeout: Seconds a write waits for the lock before failing
+            synchronous: PRAGMA synchronous level for every connection
+        """
         self.db_path = db_path
-        self.conn = None
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self.synchronous = synchronous
+        self.pool = None
+        self.writer = None
+        self.catalog = None
+        self._catalog_checked_at = 0.0
+        self._catalog_lock = threading.Lock()
 
     def connect(self):
-        """Connect to SQLite database"""
+        """Open the SQLite connection pool (WAL mode)"""
         try:
             # Create directory if it doesn't exist
             db_dir = os.path.dirname(self.db_path)
@@ -26,48 +275,30 @@ class ProductDatabase:
                 os.makedirs(db_dir, exist_ok=True)
                 print(f"Created database directory: {db_dir}")
 
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-            print(f"Connected to database: {self.db_path}")
+            self.pool = ConnectionPool(self.db_path, self.pool_size, self.busy_timeout, self.synchronous)
+            # Open the first connection now so configuration errors show up at startup
+            with self.pool.connection():
+                pass
+            print(f"Connected to database: {self.db_path} (WAL, pool of {self.pool_size})")
             return True
         except Exception as e:
             print(f"Database connection error: {str(e)}")
             return False
 
+    def close(self):
+        """Close all pooled connections (before fork, connections must not be shared)"""
+        self.disable_write_behind()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
     def initialize_schema(self):
         """Create database tables if they don't exist"""
         try:
-            cursor = self.conn.cursor()
-
-            # Products table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    name_polish TEXT NOT NULL,
-                    category TEXT,
-                    price_per_kg REAL NOT NULL,
-                    price_per_unit REAL,
-                    sell_by_weight BOOLEAN DEFAULT 1,
-                    typical_weight_g INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            with self.pool.transaction() as conn:
+                self._create_tables(conn)
+                self._apply_migrations(conn)
 
-            # Transactions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    product_name TEXT NOT NULL,
-                    weight_g REAL NOT NULL,
-                    price_per_kg REAL NOT NULL,
-                    total_price REAL NOT NULL,
-                    confidence REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            self.conn.commit()
             print("Database schema initialized successfully")
             return True
 
@@ -75,6 +306,65 @@ class ProductDatabase:
             print(f"Error initializing schema: {str(e)}")
             return False
 
+    def _create_tables(self, conn):
+        """Run the schema statements inside the caller's transaction"""
+        cursor = conn.cursor()
+
+        # Products table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                name_polish TEXT NOT NULL,
+                category TEXT,
+                price_per_kg REAL NOT NULL,
+                price_per_unit REAL,
+                sell_by_weight BOOLEAN DEFAULT 1,
+                typical_weight_g INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Transactions table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                product_name TEXT NOT NULL,
+                weight_g REAL NOT NULL,
+                price_per_kg REAL NOT NULL,
+                total_price REAL NOT NULL,
+                confidence REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Catalog version counter, bumped by triggers on every products change from any connection
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0)")
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS products_{event.lower()}_version
+                AFTER {event} ON products
+                BEGIN
+                    UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+    def _apply_migrations(self, conn):
+        """Run the schema migrations newer than the database's user_version (inside the caller's transaction)"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        for number, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            print(f"Applying schema migration {number}...")
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+
     def populate_default_products(self):
         """Populate database with default fruit/vegetable products and prices (in PLN)"""
         # Polish names and realistic prices per kg in PLN
@@ -225,86 +515,310 @@ class ProductDatabase:
         ]
 
         try:
-            cursor = self.conn.cursor()
-
-            # Check if products already exist
-            cursor.execute("SELECT COUNT(*) FROM products")
-            count = cursor.fetchone()[0]
-
-            if count > 0:
-                print(f"Database already contains {count} products")
-                return True
-
-            # Insert products
-            for name, name_polish, category, price_per_kg in products:
-                try:
-                    cursor.execute('''
-                        INSERT INTO products (name, name_polish, category, price_per_kg, sell_by_weight)
-                        VALUES (?, ?, ?, ?, 1)
-                    ''', (name, name_polish, category, price_per_kg))
-                except sqlite3.IntegrityError:
-                    # Product already exists, skip
-                    pass
-
-            self.conn.commit()
-            print(f"Added {len(products)} products to database")
+            with self.pool.transaction() as conn:
+                added = self._insert_default_products(conn, products)
+
+            if added:
+                print(f"Added {len(products)} products to database")
             return True
 
         except Exception as e:
             print(f"Error populating products: {str(e)}")
             return False
 
-    def get_product_by_name(self, name):
-        """Get product information by name"""
+    def _insert_default_products(self, conn, products):
+        """Insert the default products into an empty table; returns False if products already exist"""
+        cursor = conn.cursor()
+
+        # Check if products already exist
+        cursor.execute("SELECT COUNT(*) FROM products")
+        count = cursor.fetchone()[0]
+
+        if count > 0:
+            print(f"Database already contains {count} products")
+            return False
+
+        # Insert products
+        for name, name_polish, category, price_per_kg in products:
+            try:
+                cursor.execute('''
+                    INSERT INTO products (name, name_polish, category, price_per_kg, sell_by_weight)
+                    VALUES (?, ?, ?, ?, 1)
+                ''', (name, name_polish, category, price_per_kg))
+            except sqlite3.IntegrityError:
+                # Product already exists, skip
+                pass
+
+        return True
+
+    def refresh_catalog(self):
+        """Reload the catalog snapshot (products, store prices, stores) and swap it in atomically"""
+        # One read transaction, so the version matches the rows
+        with self.pool.transaction('DEFERRED') as conn:
+            version = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()[0]
+            rows = [dict(row) for row in conn.execute("SELECT * FROM products ORDER BY name")]
+            store_rows = [tuple(row) for row in
+                          conn.execute("SELECT store_id, product_name, price_per_kg FROM store_prices")]
+            stores = [tuple(row) for row in conn.execute("SELECT store_id, name, api_key_hash FROM stores")]
+
+        # Readers keep using the old snapshot until this single assignment
+        self.catalog = CatalogSnapshot(rows, version, store_rows, stores)
+        self._catalog_checked_at = time.monotonic()
+        return self.catalog
+
+    def get_catalog(self):
+        """
+        Get the current catalog snapshot
+
+        At most once per CATALOG_CHECK_INTERVAL the catalog version counter is
+        read to pick up changes made through other connections; every other
+        call is a plain attribute read with no SQL.
+        """
+        catalog = self.catalog
+        if catalog is not None and time.monotonic() - self._catalog_checked_at < CATALOG_CHECK_INTERVAL:
+            return catalog
+
+        # Only one thread checks; the others keep serving the current snapshot
+        if not self._catalog_lock.acquire(blocking=catalog is None):
+            return catalog
+        try:
+            if self.catalog is None:
+                return self.refresh_catalog()
+
+            self._catalog_checked_at = time.monotonic()
+            with self.pool.connection() as conn:
+                version = conn.execute("SELECT version FROM catalog_meta WHERE id = 1").fetchone()[0]
+            if version != self.catalog.version:
+                print("Product catalog changed, reloading")
+                self.refresh_catalog()
+            return self.catalog
+
+        except Exception as e:
+            print(f"Error checking catalog version: {str(e)}")
+            return self.catalog
+
+        finally:
+            self._catalog_lock.release()
+
+    def get_product_by_name(self, name, store_id=None):
+        """Get product information by name, with the store's price"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM products WHERE name = ?", (name,))
-            row = cursor.fetchone()
+            catalog = self.get_catalog()
+            product = catalog.by_name.get(name)
 
-            if row:
-                return dict(row)
+            if product:
+                return dict(product, price_per_kg=catalog.price_per_kg(product, store_id))
             return None
 
         except Exception as e:
             print(f"Error getting product: {str(e)}")
             return None
 
-    def calculate_price(self, product_name, weight_grams):
-        """Calculate price for a product based on weight"""
+    def get_products_by_polish_name(self, name_polish, store_id=None):
+        """Get all products sharing a Polish name (e.g. several apple varieties), with the store's prices"""
         try:
-            product = self.get_product_by_name(product_name)
+            catalog = self.get_catalog()
+            return [dict(product, price_per_kg=catalog.price_per_kg(product, store_id))
+                    for product in catalog.by_polish_name.get(name_polish, ())]
+
+        except Exception as e:
+            print(f"Error getting products: {str(e)}")
+            return []
+
+    def update_product_price(self, name, price_per_kg):
+        """Change a product's price and publish a new catalog snapshot"""
+        try:
+            with self.pool.transaction() as conn:
+                cursor = conn.execute("UPDATE products SET price_per_kg = ? WHERE name = ?", (price_per_kg, name))
+            if cursor.rowcount == 0:
+                return {"error": f"Product {name} not found"}
+
+            self.refresh_catalog()
+            return {"success": True, "product_name": name, "price_per_kg": price_per_kg}
+
+        except PoolTimeout:
+            # All connections busy: the request handler answers 503 with Retry-After
+            raise
+        except Exception as e:
+            print(f"Error updating price: {str(e)}")
+            return {"error": str(e)}
+
+    def import_price_list(self, entries, labels, replace_stores=False, dry_run=False):
+        """
+        Validate and apply a parsed price list in one transaction
+
+        All upserts run with executemany inside a single BEGIN IMMEDIATE
+        transaction, and the in-memory catalog snapshot is swapped only after
+        the commit, so calculate_price sees either the old or the new list,
+        never a mix.
+
+        Args:
+            entries: PriceEntry list from price_import.parse_price_list
+            labels: Set of classifier labels every product must belong to
+            replace_stores: Remove overrides of listed stores that are missing from the list
+            dry_run: Validate and compute the diff without writing
+
+        Returns:
+            Dictionary with applied, diff, summary and elapsed_ms, or errors
+        """
+        start = time.perf_counter()
+        try:
+            with self.pool.transaction() as conn:
+                base_products = {row['name']: dict(row) for row in
+                                 conn.execute("SELECT name, name_polish, category, price_per_kg FROM products")}
+
+                errors = validate_price_list(entries, labels, base_products)
+                if errors:
+                    return {"applied": False, "errors": errors}
+
+                stores = sorted({entry.store for entry in entries if entry.store is not None})
+                store_prices = {}
+                if stores:
+                    placeholders = ', '.join('?' * len(stores))
+                    for row in conn.execute(f'''
+                        SELECT store_id, product_name, price_per_kg FROM store_prices
+                        WHERE store_id IN ({placeholders})
+                    ''', stores):
+                        store_prices[(row['store_id'], row['product_name'])] = row['price_per_kg']
+
+                diff, base_rows, store_rows, removed_rows = diff_price_list(entries, base_products, store_prices,
+                                                                            replace_stores)
+                if not dry_run:
+                    conn.executemany(_UPSERT_PRODUCT_SQL, base_rows)
+                    conn.executemany(_UPSERT_STORE_PRICE_SQL, store_rows)
+                    conn.executemany("DELETE FROM store_prices WHERE store_id = ? AND product_name = ?",
+                                     removed_rows)
+
+            applied = not dry_run and bool(base_rows or store_rows or removed_rows)
+            if applied:
+                self.refresh_catalog()
+
+            return {
+                "applied": applied,
+                "dry_run": dry_run,
+                "summary": summarize_diff(diff),
+                "diff": diff,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000.0, 1)
+            }
+
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error importing price list: {str(e)}")
+            return {"applied": False, "errors": [str(e)]}
+
+    def calculate_price(self, product_name, weight_grams, store_id=None):
+        """
+        Calculate price for a product based on weight
+
+        Args:
+            product_name: Product (classifier label)
+            weight_grams: Weight in grams
+            store_id: Store whose price override applies (None: base catalog price)
+        """
+        try:
+            catalog = self.get_catalog()
+            product = catalog.by_name.get(product_name)
 
             if not product:
                 return {"error": f"Product {product_name} not found"}
 
+            price_per_kg = catalog.price_per_kg(product, store_id)
             weight_kg = weight_grams / 1000
-            total_price = weight_kg * product['price_per_kg']
+            total_price = weight_kg * price_per_kg
 
             return {
                 "product_name": product['name'],
                 "product_name_polish": product['name_polish'],
                 "weight_grams": weight_grams,
                 "weight_kg": round(weight_kg, 3),
-                "price_per_kg": product['price_per_kg'],
+                "price_per_kg": price_per_kg,
                 "total_price": round(total_price, 2),
-                "currency": "PLN"
+                "currency": "PLN",
+                "store_id": store_id
             }
 
         except Exception as e:
             return {"error": str(e)}
 
-    def add_transaction(self, product_name, weight_g, price_per_kg, total_price, confidence=None):
-        """Add a transaction to the database"""
+    def register_store(self, store_id, name=None):
+        """
+        Register a store, or issue a new API key for an existing one (the old key stops working)
+
+        Returns:
+            Dictionary with store_id, name and api_key (only returned here, stored as a hash), or error
+        """
+        if not store_id or len(store_id) > MAX_STORE_ID_LENGTH:
+            return {"error": f"store_id must be 1-{MAX_STORE_ID_LENGTH} characters"}
+
+        api_key = secrets.token_urlsafe(32)
+        try:
+            with self.pool.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO stores (store_id, name, api_key_hash) VALUES (?, ?, ?)
+                    ON CONFLICT (store_id) DO UPDATE SET
+                        name = COALESCE(excluded.name, name),
+                        api_key_hash = excluded.api_key_hash
+                ''', (store_id, name, hash_api_key(api_key)))
+
+            self.refresh_catalog()
+            return {"success": True, "store_id": store_id, "name": self.catalog.stores.get(store_id),
+                    "api_key": api_key}
+
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error registering store: {str(e)}")
+            return {"error": str(e)}
+
+    def get_stores(self):
+        """Known stores with their name, number of price overrides and whether they have an API key"""
+        catalog = self.get_catalog()
+        keyed = set(catalog.stores_by_key.values())
+        return [{
+            "store_id": store_id,
+            "name": catalog.stores[store_id],
+            "price_overrides": len(catalog.store_prices.get(store_id, ())),
+            "api_key": store_id in keyed
+        } for store_id in sorted(catalog.stores)]
+
+    def enable_write_behind(self, max_batch_rows=256, max_wait_ms=2, durability='commit'):
+        """
+        Record transactions through a background group-commit queue
+
+        Args:
+            max_batch_rows: Maximum number of rows written in one transaction
+            max_wait_ms: Maximum time a queued row waits before it is written
+            durability: 'commit' answers after the row is on disk, 'enqueue' right after queuing
+        """
+        self.disable_write_behind()
+        self.writer = TransactionWriter(self.pool, max_batch_rows, max_wait_ms, durability)
+        self.writer.start()
+
+    def disable_write_behind(self):
+        """Write every queued transaction and go back to one commit per transaction"""
+        if self.writer is not None:
+            writer = self.writer
+            self.writer = None
+            writer.stop()
+
+    def add_transaction(self, product_name, weight_g, price_per_kg, total_price, confidence=None, store_id=None):
+        """Add a transaction to the database, tagged with the store it was rung up in"""
+        writer = self.writer
+        if writer is not None:
+            return writer.submit(product_name, weight_g, price_per_kg, total_price, confidence, store_id)
+
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO transactions (product_name, weight_g, price_per_kg, total_price, confidence)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (product_name, weight_g, price_per_kg, total_price, confidence))
+            with self.pool.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO transactions (product_name, weight_g, price_per_kg, total_price, confidence, store_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (product_name, weight_g, price_per_kg, total_price, confidence, store_id))
 
-            self.conn.commit()
             return {"success": True, "transaction_id": cursor.lastrowid}
 
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error adding transaction: {str(e)}")
             return {"error": str(e)}
@@ -312,29 +826,104 @@ class ProductDatabase:
     def get_recent_transactions(self, limit=10):
         """Get recent transactions"""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                SELECT * FROM transactions
-                ORDER BY created_at DESC
-                LIMIT ?
-            ''', (limit,))
-
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            transactions, _ = self.get_transactions_page(limit)
+            return transactions
 
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error getting transactions: {str(e)}")
             return []
 
+    def build_transactions_query(self, limit=10, cursor=None, start=None, end=None, product_name=None,
+                                 min_confidence=None, store_id=None):
+        """
+        SQL for one page of transactions, newest first
+
+        Keyset pagination: the next page continues after (created_at, id) of
+        the previous page's last row, so every page is an index range scan no
+        matter how deep it is.
+
+        Args:
+            limit: Rows per page
+            cursor: Cursor returned with the previous page
+            start: Earliest created_at, inclusive ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS', UTC)
+            end: Latest created_at, exclusive
+            product_name: Only this product
+            min_confidence: Only rows with at least this classification confidence
+            store_id: Only this store's transactions
+
+        Returns:
+            Tuple (sql, params)
+
+        Raises:
+            ValueError: Invalid cursor, start or end
+        """
+        _check_timestamp(start, "from")
+        _check_timestamp(end, "to")
+
+        conditions = []
+        params = []
+
+        if product_name is not None:
+            conditions.append("product_name = ?")
+            params.append(product_name)
+        if store_id is not None:
+            conditions.append("store_id = ?")
+            params.append(store_id)
+        if start is not None:
+            conditions.append("created_at >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("created_at < ?")
+            params.append(end)
+        if cursor is not None:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        if min_confidence is not None:
+            conditions.append("confidence >= ?")
+            params.append(min_confidence)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = f"SELECT * FROM transactions {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return sql, params
+
+    def get_transactions_page(self, limit=10, cursor=None, start=None, end=None, product_name=None,
+                              min_confidence=None, store_id=None):
+        """
+        Get one page of transactions, newest first (arguments as in build_transactions_query)
+
+        Returns:
+            Tuple (transactions, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: Invalid cursor, start or end
+        """
+        limit = max(1, min(limit, MAX_TRANSACTIONS_PAGE))
+        # Fetch one extra row to know whether another page follows
+        sql, params = self.build_transactions_query(limit + 1, cursor, start, end, product_name, min_confidence,
+                                                    store_id)
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        transactions = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = transactions[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        return transactions, next_cursor
+
 
 # Global database instance
 db = None
 
 
-def initialize_database(db_path):
+def initialize_database(db_path, pool_size=8, busy_timeout=5.0, synchronous='NORMAL'):
     """Initialize the global database instance"""
     global db
-    db = ProductDatabase(db_path)
+    db = ProductDatabase(db_path, pool_size, busy_timeout, synchronous)
 
     if not db.connect():
         return False
@@ -345,6 +934,14 @@ def initialize_database(db_path):
     if not db.populate_default_products():
         return False
 
+    try:
+        catalog = db.refresh_catalog()
+        print(f"Product catalog loaded into memory ({len(catalog.products)} products, "
+              f"{len(catalog.stores)} stores)")
+    except Exception as e:
+        print(f"Error loading product catalog: {str(e)}")
+        return False
+
     return True
 
 
@@ -0,0 +1,182 @@
+"""
+SQLite Connection Pool Module
+Bounded pool of SQLite connections in WAL mode shared by the request threads of one process
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Allowed values of PRAGMA synchronous
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+class PoolClosed(Exception):
+    """The pool was closed (e.g. before a gunicorn fork)"""
+
+
+class PoolTimeout(Exception):
+    """Every connection stayed in use for the whole busy timeout (answered with 503 and Retry-After)"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections
+
+    Every connection runs in WAL mode, so readers never block the writer and
+    the writer never blocks readers. Writes go through transaction(), which
+    takes the write lock up front (BEGIN IMMEDIATE) so concurrent writers wait
+    on the busy timeout instead of failing with "database is locked".
+    Connections keep their compiled statements in sqlite3's statement cache,
+    so the same SQL text is prepared only once per connection.
+    """
+
+    def __init__(self, db_path, max_connections=8, busy_timeout=5.0, synchronous='NORMAL',
+                 cached_statements=128):
+        """
+        Initialize the pool (connections are opened lazily)
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_connections: Maximum number of open connections
+            busy_timeout: Seconds a statement waits for a lock before failing
+            synchronous: PRAGMA synchronous level; NORMAL is durable in WAL mode except on power loss
+            cached_statements: Prepared statements kept per connection
+        """
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unknown synchronous level '{synchronous}', expected one of {SYNCHRONOUS_LEVELS}")
+
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.busy_timeout = busy_timeout
+        self.synchronous = synchronous.upper()
+        self.cached_statements = cached_statements
+
+        self._idle = queue.LifoQueue()  # Most recently used first, its pages are still warm
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # Counters for monitoring
+        self.acquired = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def _open(self):
+        """Open and configure a new connection"""
+        # isolation_level=None: autocommit, transactions are started explicitly in transaction()
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        return conn
+
+    def acquire(self):
+        """
+        Take a connection from the pool, opening one or waiting if all are in use
+
+        Raises:
+            PoolClosed: The pool was closed
+            PoolTimeout: No connection became free within busy_timeout
+        """
+        if self._closed:
+            raise PoolClosed()
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._all) < self.max_connections:
+                    conn = self._open()
+                    self._all.append(conn)
+
+            if conn is None:
+                start = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.busy_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise PoolTimeout(f"No database connection free within {self.busy_timeout:g}s "
+                                      f"(all {self.max_connections} in use)") from None
+                with self._lock:
+                    self.waits += 1
+                    self.wait_time += time.perf_counter() - start
+
+        with self._lock:
+            self.acquired += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for reads (autocommit, one snapshot per statement)"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self, mode='IMMEDIATE'):
+        """
+        Borrow a connection inside a transaction, committed on success and rolled back on error
+
+        Args:
+            mode: IMMEDIATE for writes (takes the write lock up front),
+                  DEFERRED for a consistent read snapshot over several statements
+        """
+        conn = self.acquire()
+        try:
+            conn.execute(f"BEGIN {mode}")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close all connections; connections still borrowed are closed when released"""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+            self._all = []
+
+    def get_stats(self):
+        """Return pool statistics"""
+        with self._lock:
+            open_connections = len(self._all)
+            idle = self._idle.qsize()
+            return {
+                "max_connections": self.max_connections,
+                "open": open_connections,
+                "idle": idle,
+                "in_use": open_connections - idle,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "wait_time_ms": round(self.wait_time * 1000.0, 2),
+                "timeouts": self.timeouts,
+                "synchronous": self.synchronous
+            }
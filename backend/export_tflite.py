@@ -0,0 +1,158 @@
+"""
+TFLite Export Script
+Converts the Keras classifier to TFLite (optionally quantized) and compares it with the original
+
+Usage:
+    python export_tflite.py --quantize int8 --images ../samples/
+    python export_tflite.py --quantize float16 --output ../fruit_classifier_model_fp16.tflite
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from model_loader import FruitClassifier, TFLiteFruitClassifier
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def read_rss_mb():
+    """Current resident set size of this process in MB (Linux only, 0 elsewhere)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return 0.0
+
+
+def load_sample_images(classifier, image_dir, limit):
+    """Preprocess up to `limit` images from image_dir into one (N, 32, 32, 3) batch"""
+    paths = []
+    for root, _, files in os.walk(image_dir):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    paths = paths[:limit]
+
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            processed = classifier.preprocess_image(f.read())
+        if processed is not None:
+            images.append(processed)
+
+    if not images:
+        return None
+    return np.concatenate(images, axis=0)
+
+
+def convert(model, quantize, calibration_images):
+    """Convert a Keras model to TFLite bytes"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantize == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+
+    elif quantize == 'int8':
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis, ...]]
+
+        # Full integer kernels, float32 input/output so callers need no changes
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    return converter.convert()
+
+
+def time_single_calls(classifier, images, calls):
+    """Median per-image latency in milliseconds for batch-of-one calls"""
+    latencies = []
+    for i in range(calls):
+        batch = images[i % len(images)][np.newaxis, ...]
+        start = time.perf_counter()
+        classifier.run_model(batch)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the fruit classifier to TFLite")
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'fruit_classifier_model.h5'))
+    parser.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    parser.add_argument('--output', help="Output .tflite path (default: next to the model)")
+    parser.add_argument('--quantize', choices=['none', 'float16', 'int8'], default='none')
+    parser.add_argument('--images', help="Directory of sample images for calibration and evaluation")
+    parser.add_argument('--limit', type=int, default=500, help="Maximum number of sample images")
+    parser.add_argument('--calls', type=int, default=200, help="Calls used for latency measurement")
+    args = parser.parse_args()
+
+    output = args.output
+    if not output:
+        suffix = '' if args.quantize == 'none' else f'_{args.quantize}'
+        output = os.path.splitext(args.model)[0] + suffix + '.tflite'
+
+    rss_start = read_rss_mb()
+    keras_classifier = FruitClassifier(args.model, args.labels)
+    if not keras_classifier.load_model():
+        sys.exit(1)
+    keras_rss = read_rss_mb() - rss_start
+
+    images = None
+    if args.images:
+        images = load_sample_images(keras_classifier, args.images, args.limit)
+        if images is None:
+            print(f"ERROR: No usable images found in {args.images}")
+            sys.exit(1)
+        print(f"Loaded {len(images)} sample images")
+    elif args.quantize == 'int8':
+        print("ERROR: int8 quantization needs calibration images (--images)")
+        sys.exit(1)
+    else:
+        print("WARNING: No --images given, evaluating on random inputs (agreement is only indicative)")
+        images = np.random.rand(64, 32, 32, 3).astype('float32')
+
+    print(f"Converting model (quantization: {args.quantize})...")
+    tflite_model = convert(keras_classifier.model, args.quantize, images)
+    with open(output, 'wb') as f:
+        f.write(tflite_model)
+    print(f"Saved TFLite model to {output}")
+
+    rss_start = read_rss_mb()
+    tflite_classifier = TFLiteFruitClassifier(output, args.labels)
+    if not tflite_classifier.load_model():
+        sys.exit(1)
+    tflite_rss = read_rss_mb() - rss_start
+
+    # Top-1 agreement between the two backends
+    keras_top1 = np.argmax(keras_classifier.run_model(images), axis=1)
+    tflite_top1 = np.argmax(tflite_classifier.run_model(images), axis=1)
+    agreement = float(np.mean(keras_top1 == tflite_top1)) * 100.0
+
+    keras_ms = time_single_calls(keras_classifier, images, args.calls)
+    tflite_ms = time_single_calls(tflite_classifier, images, args.calls)
+
+    print("\n" + "=" * 60)
+    print(f"{'':<22}{'Keras':>14}{'TFLite':>14}")
+    print(f"{'File size (MB)':<22}{os.path.getsize(args.model) / 1e6:>14.2f}{os.path.getsize(output) / 1e6:>14.2f}")
+    print(f"{'Load RSS delta (MB)':<22}{keras_rss:>14.1f}{tflite_rss:>14.1f}")
+    print(f"{'Median latency (ms)':<22}{keras_ms:>14.3f}{tflite_ms:>14.3f}")
+    print(f"Top-1 agreement: {agreement:.2f}% on {len(images)} images")
+    print("=" * 60)
+    print("Note: the Keras RSS delta includes importing TensorFlow. With tflite-runtime")
+    print("installed the TFLite backend never imports TensorFlow at all.")
+
+
+if __name__ == '__main__':
+    main()
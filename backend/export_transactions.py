@@ -0,0 +1,277 @@
+"""
+Transaction Export Module
+Streams the transactions table as CSV, NDJSON or Parquet in fixed-size chunks,
+so memory use does not grow with the size of the history
+
+Rows are exported in commit order (commit_seq), not in id order: the
+write-behind queue reserves ids in blocks and commits them later, so a row
+with a lower id can be committed after the export has passed its id.
+Resuming after the last exported commit_seq never skips such a row.
+
+Usage:
+    python export_transactions.py --format csv --output transactions.csv
+    python export_transactions.py --format ndjson --output transactions.ndjson --resume
+    python export_transactions.py --format parquet --output transactions.parquet --after-seq 150000
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+
+# Columns in export order
+EXPORT_COLUMNS = ('id', 'product_name', 'weight_g', 'price_per_kg', 'total_price', 'confidence', 'created_at',
+                  'store_id', 'commit_seq')
+_SEQ_INDEX = EXPORT_COLUMNS.index('commit_seq')
+
+# Rows fetched from SQLite per chunk
+EXPORT_CHUNK_ROWS = 5000
+
+
+def iter_transaction_chunks(database, after_seq=0, limit=None, chunk_rows=EXPORT_CHUNK_ROWS, store_id=None):
+    """
+    Yield lists of transaction row tuples in commit order, chunk_rows at a time
+
+    The export covers the rows committed when it starts: commit_seq follows
+    commit order, so every row up to the current maximum is already on disk
+    and every later one gets a greater commit_seq. Each chunk is then read in
+    its own short query, so a slow or stalled client holds neither a pooled
+    connection nor a read snapshot that would keep the WAL from being
+    checkpointed, and only one chunk is in memory at a time.
+
+    Args:
+        database: ProductDatabase
+        after_seq: Export rows with commit_seq greater than this (resume point)
+        limit: Maximum number of rows (None for all)
+        chunk_rows: Rows per query
+        store_id: Only this store's transactions
+    """
+    with database.pool.connection() as conn:
+        last_seq = conn.execute("SELECT COALESCE(MAX(commit_seq), 0) FROM transactions").fetchone()[0]
+
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM transactions WHERE commit_seq > ? AND commit_seq <= ?"
+    if store_id is not None:
+        sql += " AND store_id = ?"
+    sql += " ORDER BY commit_seq LIMIT ?"
+
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_rows if remaining is None else min(chunk_rows, remaining)
+        params = [after_seq, last_seq] + ([store_id] if store_id is not None else []) + [size]
+        with database.pool.connection() as conn:
+            rows = [tuple(row) for row in conn.execute(sql, params).fetchall()]
+        if not rows:
+            break
+
+        yield rows
+        after_seq = rows[-1][_SEQ_INDEX]
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            break
+
+
+def stream_csv(chunks, header=True):
+    """Encode row chunks as CSV, one bytes block per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header of an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def stream_ndjson(chunks, header=True):
+    """Encode row chunks as newline-delimited JSON objects, one bytes block per chunk"""
+    for rows in chunks:
+        lines = [json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) for row in rows]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _import_pyarrow():
+    """Import pyarrow for the Parquet export; None if it is not installed"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def parquet_available():
+    """True if the optional Parquet export can be used"""
+    return _import_pyarrow() is not None
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the streaming generator"""
+
+    def __init__(self):
+        self.pending = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.pending += data
+        return len(data)
+
+    def take(self):
+        data = bytes(self.pending)
+        self.pending.clear()
+        return data
+
+
+def stream_parquet(chunks, header=True):
+    """
+    Encode row chunks as one Parquet file (Snappy compressed), one row group per chunk
+
+    Raises:
+        RuntimeError: pyarrow is not installed
+    """
+    pa = _import_pyarrow()
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('product_name', pa.string()),
+        ('weight_g', pa.float64()),
+        ('price_per_kg', pa.float64()),
+        ('total_price', pa.float64()),
+        ('confidence', pa.float64()),
+        ('created_at', pa.string()),
+        ('store_id', pa.string()),
+        ('commit_seq', pa.int64()),
+    ])
+
+    sink = _ChunkSink()
+    writer = pa.parquet.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+            yield sink.take()
+    finally:
+        # Footer with the row group index
+        writer.close()
+    yield sink.take()
+
+
+# Export formats: name -> (mimetype, file extension, encoder)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', stream_csv),
+    'ndjson': ('application/x-ndjson', 'ndjson', stream_ndjson),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', stream_parquet),
+}
+
+
+def last_exported_seq(path, export_format):
+    """
+    Last commit_seq already in an existing CSV or NDJSON export (0 if none)
+
+    Only the tail of the file is read. A trailing partial line (interrupted
+    export) is cut off so the file can be appended to.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - 64 * 1024))
+        tail = f.read()
+
+        # Drop an incomplete last line
+        if not tail.endswith(b'\n'):
+            cut = tail.rfind(b'\n') + 1
+            f.truncate(size - (len(tail) - cut))
+            tail = tail[:cut]
+
+    lines = tail.splitlines()
+    for line in reversed(lines):
+        try:
+            if export_format == 'csv':
+                return int(next(csv.reader([line.decode('utf-8')]))[_SEQ_INDEX])
+            return int(json.loads(line)['commit_seq'])
+        except (ValueError, KeyError, IndexError, UnicodeDecodeError):
+            continue
+    return 0
+
+
+def main():
+    from database import ProductDatabase
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Export transactions")
+    parser.add_argument('--db', default=os.environ.get('DB_PATH', os.path.join(base_dir, 'data', 'products.db')))
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--output', help="Output file (default: stdout)")
+    parser.add_argument('--after-seq', type=int, default=0, help="Export transactions with a greater commit_seq")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted CSV/NDJSON export, appending to --output")
+    parser.add_argument('--limit', type=int, help="Maximum number of transactions")
+    parser.add_argument('--store', help="Only this store's transactions")
+    parser.add_argument('--chunk-rows', type=int, default=EXPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    if args.limit is not None and args.limit < 1:
+        print("ERROR: --limit must be a positive integer", file=sys.stderr)
+        sys.exit(1)
+
+    if args.format == 'parquet' and not parquet_available():
+        print("ERROR: Parquet export needs pyarrow (pip install pyarrow)", file=sys.stderr)
+        sys.exit(1)
+    if args.resume and (not args.output or args.format == 'parquet'):
+        print("ERROR: --resume needs --output and the csv or ndjson format", file=sys.stderr)
+        sys.exit(1)
+
+    after_seq = args.after_seq
+    append = False
+    if args.resume:
+        resumed = last_exported_seq(args.output, args.format)
+        append = resumed > 0
+        after_seq = max(after_seq, resumed)
+        print(f"Resuming after commit_seq {after_seq}", file=sys.stderr)
+
+    # Status messages go to stderr, stdout may carry the export itself
+    database = ProductDatabase(args.db, pool_size=1)
+    with contextlib.redirect_stdout(sys.stderr):
+        if not database.connect():
+            sys.exit(1)
+
+    _, _, encoder = EXPORT_FORMATS[args.format]
+    exported = [0, after_seq]
+
+    def counted(chunks):
+        for rows in chunks:
+            exported[0] += len(rows)
+            exported[1] = rows[-1][_SEQ_INDEX]
+            yield rows
+
+    chunks = counted(iter_transaction_chunks(database, after_seq, args.limit, args.chunk_rows, args.store))
+    output = open(args.output, 'ab' if append else 'wb') if args.output else sys.stdout.buffer
+    try:
+        for block in encoder(chunks, header=not append):
+            output.write(block)
+    finally:
+        if args.output:
+            output.close()
+        database.close()
+
+    print(f"Exported {exported[0]} transactions, last commit_seq {exported[1]}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Gunicorn Configuration
+Production entry point: gunicorn --config gunicorn.conf.py app:app
+
+Importing app.py does not initialize it; the hooks below do. The app is
+preloaded once in the master (modules, labels, catalog) in when_ready, before
+the workers are forked, and shared copy-on-write with them. Each worker
+re-creates the fork-unsafe parts (TensorFlow runtime, sqlite connection) in
+post_fork and warms the model with a dummy inference before it accepts
+traffic. Without preload (GUNICORN_PRELOAD=0) each worker initializes
+everything in post_fork. On exit a worker drains its transaction write-behind
+queue.
+
+With a scale configured (SCALE_URL) every open /api/scale/stream holds a
+worker thread, so the workers default to 8 threads (gthread) instead of one.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '8' if os.environ.get('SCALE_URL') else '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '300'))
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Tell app.py how many threads a worker has
+raw_env = [f"GUNICORN_THREADS={threads}"]
+
+# Access log to stdout for Cloud Run logging
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Load the fork-safe part of the app once in the master, before the workers are forked"""
+    if not preload_app:
+        return
+
+    import app
+    if not app.preload_app():
+        server.log.error("Preloading the app failed")
+
+
+def post_fork(server, worker):
+    """Build per-worker model runtime and database connection (everything without preload)"""
+    import app
+    initialized = app.initialize_worker() if preload_app else app.initialize_app()
+    if not initialized:
+        server.log.error(f"Worker {worker.pid} failed to initialize")
+
+
+def worker_exit(server, worker):
+    """Write queued transactions before the worker process exits"""
+    import app
+    app.shutdown_app()
@@ -0,0 +1,230 @@
+"""
+Inference Plan Module
+Joins the classifier labels, weight ranges and catalog prices into one table
+indexed by class_id, compiled at startup and whenever the catalog changes, so
+/api/predict goes from the argmax straight to a priced result
+
+Usage:
+    python inference_plan.py [--db ../data/products.db]   # print the validation report
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+from weight_estimator import GENERIC_WEIGHT_GRAMS, estimate_from_range
+
+
+def load_plan_labels(labels_path):
+    """Classifier labels from model_info.json, in class_id order"""
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['labels']
+
+
+class InferencePlan:
+    """
+    Immutable per-class_id table: label, Polish name, weight range and price per kg
+
+    Classes without a weight range are False in has_weight, missing prices
+    are NaN; validation_report() lists both. Store prices are arrays too, built from the catalog's
+    override layer the first time a store is priced.
+    """
+
+    def __init__(self, labels, weight_database, catalog):
+        """
+        Compile the plan
+
+        Args:
+            labels: Classifier labels, index = class_id
+            weight_database: Dictionary label -> (min, typical, max) grams
+            catalog: CatalogSnapshot the prices come from
+        """
+        self.catalog = catalog
+        self.labels = tuple(labels)
+        self.class_ids = {label: class_id for class_id, label in enumerate(self.labels)}
+
+        count = len(self.labels)
+        self.weights = np.zeros((count, 3), dtype=np.int64)
+        self.has_weight = np.zeros(count, dtype=bool)
+        self.price_per_kg = np.full(count, np.nan)
+        polish_names = [None] * count
+
+        for class_id, label in enumerate(self.labels):
+            weight_range = weight_database.get(label)
+            if weight_range is not None:
+                self.weights[class_id] = weight_range
+                self.has_weight[class_id] = True
+
+            product = catalog.by_name.get(label)
+            if product is not None:
+                self.price_per_kg[class_id] = product['price_per_kg']
+                polish_names[class_id] = product['name_polish']
+
+        self.name_polish = tuple(polish_names)
+        self.has_price = ~np.isnan(self.price_per_kg)
+        self.weights.setflags(write=False)
+        self.has_weight.setflags(write=False)
+        self.price_per_kg.setflags(write=False)
+
+        self._store_prices = {None: self.price_per_kg.tolist()}
+
+        self._unused_weights = sorted(set(weight_database) - set(self.class_ids))
+        self._unused_prices = sorted(set(catalog.by_name) - set(self.class_ids))
+
+    def prices(self, store_id=None):
+        """Price per kg of every class in a store (NaN where there is no price)"""
+        prices = self._store_prices.get(store_id)
+        if prices is None:
+            store_prices = self.price_per_kg.copy()
+            for name, price in self.catalog.store_prices.get(store_id, {}).items():
+                class_id = self.class_ids.get(name)
+                if class_id is not None:
+                    store_prices[class_id] = price
+            prices = store_prices.tolist()
+            # The plan is replaced, never updated, so a racing duplicate build is harmless
+            self._store_prices[store_id] = prices
+        return prices
+
+    def estimate_weight(self, class_id, variation_factor=0.15):
+        """
+        Estimate the weight of one item of a class (the WeightEstimator estimate, looked up by class_id)
+
+        Args:
+            class_id: Classifier output index
+            variation_factor: Random variation around the typical weight
+        """
+        weight_range = self.weights[class_id].tolist() if self.has_weight[class_id] else None
+        return estimate_from_range(self.labels[class_id], weight_range, variation_factor)
+
+    def calculate_price(self, class_id, weight_grams, store_id=None):
+        """Price of a weighed class (same result format as ProductDatabase.calculate_price)"""
+        price_per_kg = self.prices(store_id)[class_id]
+        if price_per_kg != price_per_kg:  # NaN: no catalog price
+            return {"error": f"Product {self.labels[class_id]} not found"}
+
+        weight_kg = weight_grams / 1000
+        return {
+            "product_name": self.labels[class_id],
+            "product_name_polish": self.name_polish[class_id],
+            "weight_grams": weight_grams,
+            "weight_kg": round(weight_kg, 3),
+            "price_per_kg": price_per_kg,
+            "total_price": round(weight_kg * price_per_kg, 2),
+            "currency": "PLN",
+            "store_id": store_id
+        }
+
+    def validation_report(self):
+        """Classes the plan cannot weigh or price, and catalog data no class uses"""
+        return {
+            "classes": len(self.labels),
+            "catalog_version": self.catalog.version,
+            "missing_weight": [self.labels[i] for i in np.flatnonzero(~self.has_weight)],
+            "missing_price": [self.labels[i] for i in np.flatnonzero(~self.has_price)],
+            "unused_weights": self._unused_weights,
+            "unused_prices": self._unused_prices
+        }
+
+
+class PlanCompiler:
+    """Keeps the inference plan in step with the catalog snapshot it was compiled from"""
+
+    def __init__(self, labels, estimator, database):
+        """
+        Args:
+            labels: Classifier labels, index = class_id
+            estimator: WeightEstimator with the weight ranges
+            database: ProductDatabase with the catalog
+        """
+        self.labels = labels
+        self.estimator = estimator
+        self.database = database
+        self.plan = None
+        self.compiles = 0
+        self._lock = threading.Lock()
+
+    def set_labels(self, labels):
+        """Compile the plan for a new label set (a model version with other classes was swapped in)"""
+        with self._lock:
+            self.labels = labels
+            self.plan = InferencePlan(labels, self.estimator.weight_database, self.database.get_catalog())
+            self.compiles += 1
+
+    def get_plan(self):
+        """Current plan; recompiled when the catalog snapshot has been replaced"""
+        catalog = self.database.get_catalog()
+        plan = self.plan
+        if plan is not None and plan.catalog is catalog:
+            return plan
+
+        with self._lock:
+            if self.plan is None or self.plan.catalog is not catalog:
+                self.plan = InferencePlan(self.labels, self.estimator.weight_database, catalog)
+                self.compiles += 1
+            return self.plan
+
+
+# Global plan compiler instance
+compiler = None
+
+
+def initialize_inference_plan(labels_path, estimator, database):
+    """Compile the global inference plan and print its validation report"""
+    global compiler
+    try:
+        compiler = PlanCompiler(load_plan_labels(labels_path), estimator, database)
+        report = compiler.get_plan().validation_report()
+    except Exception as e:
+        print(f"Error compiling inference plan: {str(e)}")
+        return False
+
+    print(f"Inference plan compiled ({report['classes']} classes)")
+    if report['missing_weight']:
+        print(f"WARNING: no weight range for {len(report['missing_weight'])} classes "
+              f"(generic {GENERIC_WEIGHT_GRAMS} g estimate): {', '.join(report['missing_weight'])}")
+    if report['missing_price']:
+        print(f"WARNING: no price for {len(report['missing_price'])} classes: {', '.join(report['missing_price'])}")
+    return True
+
+
+def set_inference_plan_labels(labels):
+    """Recompile the global inference plan for the labels of a newly activated model"""
+    if compiler is not None and list(compiler.labels) != list(labels):
+        compiler.set_labels(labels)
+        print(f"Inference plan recompiled for new model labels ({len(labels)} classes)")
+
+
+def get_inference_plan():
+    """Get the current inference plan (None before initialization)"""
+    return compiler.get_plan() if compiler is not None else None
+
+
+def main():
+    from database import ProductDatabase
+    from weight_estimator import WeightEstimator
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Print the inference plan validation report")
+    parser.add_argument('--db', default=os.environ.get('DB_PATH', os.path.join(base_dir, 'data', 'products.db')))
+    parser.add_argument('--labels', default=os.path.join(base_dir, 'model_info.json'))
+    args = parser.parse_args()
+
+    database = ProductDatabase(args.db, pool_size=1)
+    if not database.connect() or not database.initialize_schema() or not database.populate_default_products():
+        sys.exit(1)
+
+    plan = InferencePlan(load_plan_labels(args.labels), WeightEstimator().weight_database, database.refresh_catalog())
+    database.close()
+
+    report = plan.validation_report()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report['missing_weight'] or report['missing_price']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Metrics Module
+In-process request counters and latency histograms, rendered in the
+Prometheus text exposition format by GET /metrics
+
+Every worker process keeps its own metrics; Prometheus scrapes each worker
+and tells them apart by the worker identity labels.
+"""
+
+import bisect
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (counts per bucket, sum, count)"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Span:
+    """Times one stage: with metrics.stage('preprocess'): ..."""
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    """Stand-in for Span while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(int(value))
+
+
+class Metrics:
+    """Per-process request and stage metrics"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.buckets = buckets
+        self.enabled = True
+        self._lock = threading.Lock()
+
+        self.stage_seconds = {}      # stage -> Histogram
+        self.request_seconds = {}    # (route, method) -> Histogram
+        self.requests = {}           # (route, method, status) -> count
+        self.errors = {}             # (route, method, kind) -> count
+        self.in_flight = {}          # route -> requests being handled
+
+        # Callables returning extra metric families at scrape time (model, cache, DB pool...)
+        self.collectors = []
+
+    def stage(self, name):
+        """Context manager recording the duration of one request stage"""
+        return Span(self, name) if self.enabled else _NO_SPAN
+
+    def observe_stage(self, name, seconds):
+        """Record the duration of one request stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.stage_seconds.get(name)
+            if histogram is None:
+                histogram = self.stage_seconds[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def request_started(self, route):
+        """Count a request as in flight"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.in_flight[route] = self.in_flight.get(route, 0) + 1
+
+    def request_finished(self, route, method, status, seconds):
+        """Record a finished request (status >= 400 also counts as an error)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.in_flight[route] = self.in_flight.get(route, 1) - 1
+
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status >= 400:
+                key = (route, method, 'server' if status >= 500 else 'client')
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+            histogram = self.request_seconds.get((route, method))
+            if histogram is None:
+                histogram = self.request_seconds[(route, method)] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def add_collector(self, collector):
+        """
+        Register a scrape-time collector
+
+        Args:
+            collector: Callable returning a list of (name, type, help, samples) with
+                       samples a list of (labels dict, value)
+        """
+        self.collectors.append(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            families = [
+                ('scale_requests_total', 'counter', 'HTTP requests by route, method and status',
+                 ('route', 'method', 'status'), list(self.requests.items())),
+                ('scale_request_errors_total', 'counter', 'HTTP requests answered with 4xx (client) or 5xx (server)',
+                 ('route', 'method', 'kind'), list(self.errors.items())),
+                ('scale_requests_in_flight', 'gauge', 'Requests being handled by this worker',
+                 ('route',), [((route,), count) for route, count in self.in_flight.items()]),
+            ]
+            histograms = [
+                ('scale_request_duration_seconds', 'Request latency by route and method', ('route', 'method'),
+                 [(key, self._copy(h)) for key, h in self.request_seconds.items()]),
+                ('scale_stage_duration_seconds', 'Latency of the stages inside a request', ('stage',),
+                 [((stage,), self._copy(h)) for stage, h in self.stage_seconds.items()]),
+            ]
+
+        lines = []
+        for name, kind, description, label_names, samples in families:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{_labels(label_names, key)} {_number(value)}' for key, value in sorted(samples)]
+
+        for name, description, label_names, samples in histograms:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+            for key, (counts, total, count) in sorted(samples):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    bucket_labels = _labels(label_names + ('le',), key + (_number(float(bound)),))
+                    lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+                lines.append(f'{name}_sum{_labels(label_names, key)} {_number(total)}')
+                lines.append(f'{name}_count{_labels(label_names, key)} {count}')
+
+        for collector in self.collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, kind, description, samples in collected:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _copy(histogram):
+        return list(histogram.counts), histogram.sum, histogram.count
+
+
+# Global metrics instance (exists from import, so every module can record into it)
+metrics = Metrics()
+
+
+def get_metrics():
+    """Get the global metrics instance"""
+    return metrics
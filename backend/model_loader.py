@@ -5,44 +5,238 @@ Handles loading and using the fruit/vegetable classification model
 
 import json
 import numpy as np
-from tensorflow import keras
 from PIL import Image
 import io
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import get_metrics
+from prediction_cache import PredictionCache, exact_hash, perceptual_hash
+
+
+# Longest a caller waits for its batch before giving up (the batching thread is wedged or gone)
+BATCH_RESULT_TIMEOUT = 60.0
+
+
+class _PendingRequest:
+    """A caller waiting for the batching engine to score its images"""
+
+    def __init__(self, images):
+        self.images = images
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingEngine:
+    """
+    Dynamic micro-batching for model inference
+
+    Preprocessed images submitted from concurrent requests are queued and
+    flushed through the model as one tensor as soon as either max_batch_size
+    images are waiting or the oldest one has waited max_wait_ms.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5):
+        """
+        Initialize the batching engine
+
+        Args:
+            predict_fn: Callable taking a (N, H, W, C) array and returning (N, num_classes) probabilities
+            max_batch_size: Maximum number of images scored in one model call
+            max_wait_ms: Maximum time the first queued image waits for others to join
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        # Checking for a running thread and enqueuing happen together, so no request lands behind the stop sentinel
+        self._state_lock = threading.Lock()
+        self._stopping = False
+
+        # Counters for monitoring
+        self.batches_run = 0
+        self.images_run = 0
+
+    def start(self):
+        """Start the background batching thread"""
+        with self._state_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="batching-engine", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after flushing queued requests"""
+        with self._state_lock:
+            thread = self._thread
+            if thread is None or self._stopping:
+                return
+            self._stopping = True
+            self._queue.put(None)
+
+        thread.join()
+        with self._state_lock:
+            self._thread = None
+
+        # Nothing should be left behind the sentinel, but never leave a caller waiting
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.error = RuntimeError("Batching engine stopped")
+                request.done.set()
+
+    def submit(self, images):
+        """
+        Queue preprocessed images and wait for their probabilities
+
+        Args:
+            images: Array of shape (N, H, W, C) for a single caller
+
+        Returns:
+            Array of shape (N, num_classes) with this caller's probabilities
+        """
+        request = _PendingRequest(images)
+        with self._state_lock:
+            queued = self._thread is not None and not self._stopping
+            if queued:
+                self._queue.put(request)
+        # A classifier retired while this caller held it: score directly instead of waiting forever
+        if not queued:
+            return self.predict_fn(images)
+
+        if not request.done.wait(BATCH_RESULT_TIMEOUT):
+            raise TimeoutError(f"No batch result within {BATCH_RESULT_TIMEOUT:.0f}s")
+
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def get_stats(self):
+        """Return batching statistics"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches_run": self.batches_run,
+            "images_run": self.images_run,
+            "mean_batch_size": round(self.images_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "queue_depth": self._queue.qsize()
+        }
+
+    def _run(self):
+        """Collect queued requests into batches until stopped"""
+        running = True
+        while running:
+            first = self._queue.get()
+            if first is None:
+                break
+
+            pending = [first]
+            count = len(first.images)
+            deadline = time.monotonic() + self.max_wait
+
+            # Keep collecting until the batch is full or the oldest request times out
+            while count < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    running = False
+                    break
+                pending.append(request)
+                count += len(request.images)
+
+            self._flush(pending)
+
+    def _flush(self, pending):
+        """Run one model call for all pending requests and hand out the results"""
+        try:
+            if len(pending) == 1:
+                batch = pending[0].images
+            else:
+                batch = np.concatenate([request.images for request in pending], axis=0)
+
+            probabilities = self.predict_fn(batch)
+            self.batches_run += 1
+            self.images_run += len(batch)
+
+            # Split the batch back into per-caller slices
+            offset = 0
+            for request in pending:
+                size = len(request.images)
+                request.result = probabilities[offset:offset + size]
+                offset += size
+
+        except Exception as e:
+            for request in pending:
+                request.error = e
+
+        finally:
+            for request in pending:
+                request.done.set()
+
+
+# Model input size (width, height) and pixel scale
+INPUT_SIZE = (32, 32)
+_PIXEL_MAX = np.float32(255.0)
+
+# Supported inference paths:
+#   "function" - traced tf.function with a fixed input signature (fastest)
+#   "call"     - direct eager model(x, training=False) call
+#   "predict"  - keras Model.predict (builds a data pipeline on every call)
+INFERENCE_MODES = ("function", "call", "predict")
 
 
 class FruitClassifier:
     """Wrapper class for fruit/vegetable classification model"""
 
-    def __init__(self, model_path, labels_path):
+    def __init__(self, model_path, labels_path, inference_mode="function", version=None):
         """
         Initialize the classifier
 
         Args:
             model_path: Path to the .h5 model file
             labels_path: Path to the model_info.json file
+            inference_mode: One of INFERENCE_MODES
+            version: Model registry version this classifier was loaded from
         """
         self.model_path = model_path
         self.labels_path = labels_path
+        self.inference_mode = inference_mode
+        self.version = version
         self.model = None
         self.labels = None
         self.model_info = None
+        self.batcher = None
+        self.cache = None
+        self._infer = None
+
+        # Predictions currently running on this classifier (a retired model is freed once it drops to 0)
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
 
     def load_model(self):
-        """Load the Keras model and label information"""
+        """Load the model and label information"""
         try:
             # Load the trained model
             print(f"Loading model from {self.model_path}...")
-            self.model = keras.models.load_model(self.model_path)
-            print("Model loaded successfully!")
+            self._load_network()
+            print(f"Model loaded successfully! (inference mode: {self.inference_mode})")
 
-            # Load the labels and model info
-            print(f"Loading labels from {self.labels_path}...")
-            with open(self.labels_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.labels = data['labels']
-                self.model_info = data
-            print(f"Loaded {len(self.labels)} fruit/vegetable categories")
+            # Labels may already be in memory if they were preloaded before fork
+            if self.labels is None:
+                self._load_labels()
 
             return True
 
@@ -50,6 +244,69 @@ class FruitClassifier:
             print(f"Error loading model: {str(e)}")
             return False
 
+    def preload(self):
+        """
+        Load everything that is safe to share across fork()
+
+        Reads the labels and imports the ML framework, but creates no
+        framework runtime state (threads, sessions), which must be built
+        in each worker process by load_model().
+        """
+        try:
+            self._load_labels()
+            self._import_framework()
+            return True
+
+        except Exception as e:
+            print(f"Error preloading model: {str(e)}")
+            return False
+
+    def _load_labels(self):
+        """Load the labels and model info"""
+        print(f"Loading labels from {self.labels_path}...")
+        with open(self.labels_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            self.labels = data['labels']
+            self.model_info = data
+        print(f"Loaded {len(self.labels)} fruit/vegetable categories")
+
+    def _import_framework(self):
+        """Import TensorFlow without running any ops"""
+        import tensorflow  # noqa: F401
+
+    def _load_network(self):
+        """Load the Keras model and build its inference function"""
+        # TensorFlow is imported here so the TFLite backend never pays for it
+        from tensorflow import keras
+
+        self.model = keras.models.load_model(self.model_path)
+        self._infer = self._build_inference_fn()
+
+    def _build_inference_fn(self):
+        """Build the batch -> probabilities function once for the configured mode"""
+        import tensorflow as tf
+
+        model = self.model
+
+        if self.inference_mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode: {self.inference_mode}")
+
+        if self.inference_mode == "predict":
+            return lambda batch: model.predict(batch, verbose=0)
+
+        if self.inference_mode == "call":
+            return lambda batch: model(batch, training=False).numpy()
+
+        # Trace once for any batch size so the graph is never rebuilt per request
+        input_shape = tuple(model.input_shape[1:])
+
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None,) + input_shape, dtype=tf.float32)])
+        def serve(batch):
+            return model(batch, training=False)
+
+        serve.get_concrete_function()
+        return lambda batch: serve(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
     def preprocess_image(self, image_data):
         """
         Preprocess image for model input
@@ -60,34 +317,160 @@ class FruitClassifier:
         Returns:
             Preprocessed numpy array ready for model
         """
-        try:
-            # Convert bytes to PIL Image if needed
-            if isinstance(image_data, bytes):
-                image = Image.open(io.BytesIO(image_data))
-            else:
-                image = image_data
+        batch, errors = self.preprocess_images([image_data])
+        if errors[0] is not None:
+            print(f"Error preprocessing image: {errors[0]}")
+            return None
+        return batch
+
+    def preprocess_images(self, images, out=None):
+        """
+        Preprocess several images into one model input batch in a single pass
+
+        JPEGs are decoded in draft mode, so the decoder only produces the
+        smallest DCT-scaled image (down to 1/8) that still covers 32x32, and
+        normalized pixels are written straight into the batch buffer.
+
+        Args:
+            images: List of raw image data (bytes or PIL Image)
+            out: Optional preallocated float32 array of shape (>= N, 32, 32, 3)
+
+        Returns:
+            Tuple (batch, errors): batch of shape (N, 32, 32, 3) and a list with
+            None for every decoded image or an error message (row left zeroed)
+        """
+        if out is None:
+            out = np.empty((len(images),) + INPUT_SIZE + (3,), dtype=np.float32)
+        batch = out[:len(images)]
+        errors = []
+
+        for i, image_data in enumerate(images):
+            try:
+                # Convert bytes to PIL Image if needed
+                if isinstance(image_data, (bytes, bytearray, memoryview)):
+                    image = Image.open(io.BytesIO(image_data))
+                else:
+                    image = image_data
+
+                # Let the JPEG decoder skip pixels we would throw away anyway
+                image.draft('RGB', INPUT_SIZE)
+
+                # Convert to RGB if needed
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+
+                # Resize to model input size (32x32)
+                image = image.resize(INPUT_SIZE)
+
+                # Normalize pixel values to [0, 1] directly into the batch row
+                np.divide(np.asarray(image), _PIXEL_MAX, out=batch[i], dtype=np.float32)
+                errors.append(None)
+
+            except Exception as e:
+                batch[i] = 0.0
+                errors.append(str(e))
+
+        return batch, errors
+
+    def enable_batching(self, max_batch_size=32, max_wait_ms=5):
+        """
+        Route predictions through a shared micro-batching engine
 
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+        Args:
+            max_batch_size: Maximum number of images per model call
+            max_wait_ms: Maximum time a request waits for a batch to fill
+        """
+        if self.batcher is not None:
+            self.batcher.stop()
+        self.batcher = BatchingEngine(self.run_model, max_batch_size, max_wait_ms)
+        self.batcher.start()
+
+    def disable_batching(self):
+        """Stop the batching engine and go back to one model call per request"""
+        if self.batcher is not None:
+            self.batcher.stop()
+            self.batcher = None
+
+    def enable_cache(self, max_size=256, ttl_seconds=10.0, max_hamming_distance=0):
+        """
+        Cache model outputs for repeated, nearly identical frames
 
-            # Resize to model input size (32x32)
-            image = image.resize((32, 32))
+        Args:
+            max_size: Maximum number of cached frames
+            ttl_seconds: How long a cached result stays valid
+            max_hamming_distance: Perceptual hash bits allowed to differ for a hit
+        """
+        self.cache = PredictionCache(max_size, ttl_seconds, max_hamming_distance)
 
-            # Convert to numpy array
-            img_array = np.array(image)
+    def disable_cache(self):
+        """Drop the prediction cache"""
+        self.cache = None
 
-            # Normalize pixel values to [0, 1]
-            img_array = img_array.astype('float32') / 255.0
+    def unload(self):
+        """Release the model, batching thread and cache (after the classifier has been swapped out)"""
+        self.disable_batching()
+        self.disable_cache()
+        self.model = None
+        self._infer = None
 
-            # Add batch dimension
-            img_array = np.expand_dims(img_array, axis=0)
+    def _enter(self):
+        with self._in_flight_lock:
+            self.in_flight += 1
 
-            return img_array
+    def _exit(self):
+        with self._in_flight_lock:
+            self.in_flight -= 1
 
+    def warm_up(self):
+        """Run one dummy inference so graph tracing and buffer allocation happen before real traffic"""
+        try:
+            self.run_model(np.zeros((1,) + INPUT_SIZE + (3,), dtype='float32'))
+            return True
         except Exception as e:
-            print(f"Error preprocessing image: {str(e)}")
-            return None
+            print(f"Error during warm-up: {str(e)}")
+            return False
+
+    def run_model(self, batch):
+        """
+        Run the model on a preprocessed batch
+
+        Args:
+            batch: Array of shape (N, 32, 32, 3)
+
+        Returns:
+            Array of shape (N, num_classes) with class probabilities
+        """
+        return self._infer(batch)
+
+    def format_predictions(self, probabilities, top_k=3):
+        """
+        Turn one row of class probabilities into the prediction result dictionary
+
+        Args:
+            probabilities: 1-D array of class probabilities
+            top_k: Number of top predictions to return
+
+        Returns:
+            Dictionary with prediction results
+        """
+        # Get top K predictions
+        top_indices = np.argsort(probabilities)[-top_k:][::-1]
+        top_probs = probabilities[top_indices]
+
+        # Format results
+        results = []
+        for idx, prob in zip(top_indices, top_probs):
+            results.append({
+                "label": self.labels[idx],
+                "confidence": float(prob),
+                "class_id": int(idx)
+            })
+
+        return {
+            "success": True,
+            "predictions": results,
+            "top_prediction": results[0] if results else None
+        }
 
     def predict(self, image_data, top_k=3):
         """
@@ -100,54 +483,285 @@ class FruitClassifier:
         Returns:
             Dictionary with prediction results
         """
+        self._enter()
         try:
+            cache = self.cache
+            exact_key = None
+
+            # Byte-identical frames are answered before decoding anything
+            if cache is not None and isinstance(image_data, (bytes, bytearray, memoryview)):
+                exact_key = exact_hash(image_data)
+                probabilities = cache.get_exact(exact_key)
+                if probabilities is not None:
+                    return self.format_predictions(probabilities, top_k)
+
             # Preprocess the image
-            processed_image = self.preprocess_image(image_data)
+            with get_metrics().stage('preprocess'):
+                processed_image = self.preprocess_image(image_data)
             if processed_image is None:
                 return {"error": "Failed to preprocess image"}
 
-            # Make prediction
-            predictions = self.model.predict(processed_image, verbose=0)
+            # Nearly identical frames share the perceptual hash of the model input
+            if cache is not None:
+                phash = perceptual_hash(processed_image[0])
+                probabilities = cache.get_similar(phash, exact_key)
+                if probabilities is not None:
+                    return self.format_predictions(probabilities, top_k)
 
-            # Get top K predictions
-            top_indices = np.argsort(predictions[0])[-top_k:][::-1]
-            top_probs = predictions[0][top_indices]
+            # Make prediction (batched together with concurrent requests if enabled)
+            with get_metrics().stage('inference'):
+                if self.batcher is not None:
+                    predictions = self.batcher.submit(processed_image)
+                else:
+                    predictions = self.run_model(processed_image)
 
-            # Format results
-            results = []
-            for idx, prob in zip(top_indices, top_probs):
-                results.append({
-                    "label": self.labels[idx],
-                    "confidence": float(prob),
-                    "class_id": int(idx)
-                })
+            if cache is not None:
+                cache.put(phash, predictions[0], exact_key)
 
-            return {
-                "success": True,
-                "predictions": results,
-                "top_prediction": results[0] if results else None
-            }
+            return self.format_predictions(predictions[0], top_k)
 
         except Exception as e:
             print(f"Error during prediction: {str(e)}")
             return {"error": str(e)}
 
+        finally:
+            self._exit()
+
+    def predict_batch(self, images, top_k=3):
+        """
+        Predict several images with one forward pass
+
+        Args:
+            images: List of raw image data (bytes or PIL Image)
+            top_k: Number of top predictions to return per image
+
+        Returns:
+            List of prediction result dictionaries in input order; images that
+            fail to decode get an {"error": ...} entry without affecting the others
+        """
+        self._enter()
+        try:
+            return self._predict_batch(images, top_k)
+        finally:
+            self._exit()
+
+    def _predict_batch(self, images, top_k):
+        with get_metrics().stage('preprocess_batch'):
+            batch, errors = self.preprocess_images(images)
+        results = [None if error is None else {"error": f"Failed to preprocess image: {error}"}
+                   for error in errors]
+
+        valid = [i for i, error in enumerate(errors) if error is None]
+        if not valid:
+            return results
+
+        try:
+            inputs = batch if len(valid) == len(images) else batch[valid]
+            with get_metrics().stage('inference_batch'):
+                if self.batcher is not None:
+                    predictions = self.batcher.submit(inputs)
+                else:
+                    predictions = self.run_model(inputs)
+
+            for i, probabilities in zip(valid, predictions):
+                results[i] = self.format_predictions(probabilities, top_k)
+
+        except Exception as e:
+            print(f"Error during batch prediction: {str(e)}")
+            for i in valid:
+                results[i] = {"error": str(e)}
+
+        return results
+
     def get_model_info(self):
-        """Return model information"""
-        return self.model_info if self.model_info else {}
+        """Return model information with the active registry version"""
+        info = dict(self.model_info) if self.model_info else {}
+        info["version"] = self.version
+        info["model_file"] = os.path.basename(self.model_path)
+        return info
+
+
+def _import_tflite_interpreter():
+    """Return the TFLite Interpreter class, preferring the lightweight standalone runtimes"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteFruitClassifier(FruitClassifier):
+    """Classifier backed by a .tflite model running on the TFLite interpreter"""
+
+    def __init__(self, model_path, labels_path, num_threads=None, version=None):
+        """
+        Initialize the classifier
+
+        Args:
+            model_path: Path to the .tflite model file
+            labels_path: Path to the model_info.json file
+            num_threads: Interpreter thread count (None lets TFLite decide)
+            version: Model registry version this classifier was loaded from
+        """
+        super().__init__(model_path, labels_path, inference_mode="tflite", version=version)
+        self.num_threads = num_threads
+        self._lock = threading.Lock()
+        self._input = None
+        self._output = None
+        self._batch_size = None
+        self.model_content = None
+
+    def unload(self):
+        """Release the interpreter and the flatbuffer"""
+        with self._lock:
+            super().unload()
+            self.model_content = None
+
+    def _import_framework(self):
+        """Import the interpreter and read the flatbuffer so forked workers share its pages"""
+        _import_tflite_interpreter()
+        with open(self.model_path, 'rb') as f:
+            self.model_content = f.read()
+
+    def _load_network(self):
+        """Load the .tflite model into an interpreter"""
+        Interpreter = _import_tflite_interpreter()
+
+        if self.model_content is not None:
+            self.model = Interpreter(model_content=self.model_content, num_threads=self.num_threads)
+        else:
+            self.model = Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+        self.model.allocate_tensors()
+        self._input = self.model.get_input_details()[0]
+        self._output = self.model.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self._infer = self._invoke
+
+    def _invoke(self, batch):
+        """Run the interpreter on a float32 batch and return float32 probabilities"""
+        # The interpreter holds mutable tensor buffers, so only one call may run at a time
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.model.resize_tensor_input(self._input['index'], [len(batch)] + list(self._input['shape'][1:]))
+                self.model.allocate_tensors()
+                self._input = self.model.get_input_details()[0]
+                self._output = self.model.get_output_details()[0]
+                self._batch_size = len(batch)
+
+            # Fully quantized models take integer input
+            input_dtype = self._input['dtype']
+            if np.issubdtype(input_dtype, np.integer):
+                scale, zero_point = self._input['quantization']
+                # Pixels outside the calibrated range saturate instead of wrapping around in the cast
+                limits = np.iinfo(input_dtype)
+                batch = np.clip(np.round(batch / scale + zero_point), limits.min, limits.max).astype(input_dtype)
+            elif input_dtype != np.float32:
+                batch = batch.astype(input_dtype)
+
+            self.model.set_tensor(self._input['index'], batch)
+            self.model.invoke()
+            probabilities = self.model.get_tensor(self._output['index'])
+
+            if self._output['dtype'] != np.float32:
+                scale, zero_point = self._output['quantization']
+                return (probabilities.astype(np.float32) - zero_point) * scale
+            return probabilities.copy()
+
+
+def create_classifier(model_path, labels_path, inference_mode="function", version=None):
+    """Create the classifier backend matching the model file type"""
+    if model_path.endswith('.tflite'):
+        return TFLiteFruitClassifier(model_path, labels_path, version=version)
+    return FruitClassifier(model_path, labels_path, inference_mode, version)
+
+
+def configure_classifier(classifier, batching=False, max_batch_size=32, max_wait_ms=5, cache_size=0, cache_ttl=10.0,
+                         cache_hamming=0):
+    """Enable micro-batching and the prediction cache on a loaded classifier"""
+    if batching:
+        classifier.enable_batching(max_batch_size, max_wait_ms)
+        print(f"Micro-batching enabled (max batch {max_batch_size}, max wait {max_wait_ms} ms)")
+
+    if cache_size > 0:
+        classifier.enable_cache(cache_size, cache_ttl, cache_hamming)
+        print(f"Prediction cache enabled ({cache_size} entries, TTL {cache_ttl}s, Hamming <= {cache_hamming})")
 
 
 # Global classifier instance
 classifier = None
+# Makes fetching the classifier and counting the request on it atomic with respect to swaps
+_swap_lock = threading.Lock()
 
 
-def initialize_classifier(model_path, labels_path):
+def initialize_classifier(model_path, labels_path, batching=False, max_batch_size=32, max_wait_ms=5,
+                          inference_mode="function", cache_size=0, cache_ttl=10.0, cache_hamming=0, version=None):
     """Initialize the global classifier instance"""
     global classifier
-    classifier = FruitClassifier(model_path, labels_path)
-    return classifier.load_model()
+
+    # Reuse a classifier preloaded in the gunicorn master, otherwise start fresh
+    if classifier is None or classifier.model is not None or classifier.model_path != model_path:
+        classifier = create_classifier(model_path, labels_path, inference_mode, version)
+    if not classifier.load_model():
+        return False
+
+    configure_classifier(classifier, batching, max_batch_size, max_wait_ms, cache_size, cache_ttl, cache_hamming)
+    return True
+
+
+def preload_classifier(model_path, labels_path, inference_mode="function", version=None):
+    """Preload fork-safe classifier state into the global instance (gunicorn master)"""
+    global classifier
+    classifier = create_classifier(model_path, labels_path, inference_mode, version)
+    return classifier.preload()
+
+
+def swap_classifier(new_classifier):
+    """
+    Make a loaded classifier the global one
+
+    Requests that already hold the old instance (acquire_classifier) finish
+    on it; every later call returns the new one.
+
+    Returns:
+        The previous classifier
+    """
+    global classifier
+    with _swap_lock:
+        old, classifier = classifier, new_classifier
+    return old
 
 
 def get_classifier():
     """Get the global classifier instance"""
     return classifier
+
+
+@contextmanager
+def acquire_classifier():
+    """
+    Hold the global classifier for one request
+
+    The classifier counts the request as in flight from the moment it is
+    fetched, so a model swapped out in between is not released under it.
+
+    Yields:
+        The classifier (None if it is not initialized)
+    """
+    with _swap_lock:
+        current = classifier
+        if current is not None:
+            current._enter()
+    try:
+        yield current
+    finally:
+        if current is not None:
+            current._exit()
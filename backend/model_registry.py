@@ -0,0 +1,557 @@
+"""
+Model Registry Module
+Versioned models on disk and zero-downtime switching between them
+
+Layout: <registry>/<version>/ holds one model file (.h5, .keras or .tflite)
+and its model_info.json; <registry>/ACTIVE names the version every worker
+should serve. The model configured by MODEL_PATH is the version "default".
+
+Usage:
+    python model_registry.py list
+    python model_registry.py add 2025-06-01 ../fruit_classifier_model.h5 ../model_info.json
+    python model_registry.py activate 2025-06-01
+"""
+
+import argparse
+import gc
+import os
+import queue
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+import weakref
+
+from model_loader import configure_classifier, create_classifier, get_classifier, swap_classifier
+
+# Version of the model configured outside the registry (MODEL_PATH)
+DEFAULT_VERSION = 'default'
+
+# Model file types a version directory may hold
+MODEL_EXTENSIONS = ('.h5', '.keras', '.tflite')
+
+# Version names double as directory names
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+# How long a retired model may keep serving in-flight requests before it is released anyway
+RETIRE_TIMEOUT = 30.0
+
+# Shadow predictions waiting for the background thread; more are dropped, not queued
+SHADOW_QUEUE_SIZE = 32
+
+# Shadow queue sentinels: stop and free the candidate, or stop and leave it loaded (it is being promoted)
+_SHADOW_STOP = None
+_SHADOW_PROMOTE = object()
+
+
+class ModelRegistry:
+    """Versioned model + model_info.json pairs in a directory"""
+
+    def __init__(self, root, default_model_path, default_labels_path):
+        """
+        Args:
+            root: Registry directory (may not exist yet)
+            default_model_path: Model served as DEFAULT_VERSION
+            default_labels_path: model_info.json of the default model
+        """
+        self.root = root
+        self.default_model_path = default_model_path
+        self.default_labels_path = default_labels_path
+
+    def resolve(self, version):
+        """
+        Paths of a version
+
+        Returns:
+            Tuple (model_path, labels_path)
+
+        Raises:
+            ValueError: Unknown or incomplete version
+        """
+        if version == DEFAULT_VERSION:
+            return self.default_model_path, self.default_labels_path
+        if not VERSION_PATTERN.match(version or ''):
+            raise ValueError(f"Invalid model version '{version}'")
+
+        directory = os.path.join(self.root, version)
+        if not os.path.isdir(directory):
+            raise ValueError(f"Unknown model version '{version}'")
+
+        models = sorted(name for name in os.listdir(directory) if name.endswith(MODEL_EXTENSIONS))
+        labels_path = os.path.join(directory, 'model_info.json')
+        if len(models) != 1 or not os.path.exists(labels_path):
+            raise ValueError(f"Model version '{version}' needs exactly one model file and a model_info.json")
+        return os.path.join(directory, models[0]), labels_path
+
+    def versions(self):
+        """All usable versions with their model file and size"""
+        names = [DEFAULT_VERSION]
+        if os.path.isdir(self.root):
+            names += sorted(name for name in os.listdir(self.root)
+                            if name != DEFAULT_VERSION and os.path.isdir(os.path.join(self.root, name)))
+
+        versions = []
+        for name in names:
+            try:
+                model_path, _ = self.resolve(name)
+                versions.append({
+                    "version": name,
+                    "model_file": os.path.basename(model_path),
+                    "size_mb": round(os.path.getsize(model_path) / 1e6, 1),
+                    "modified": time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(os.path.getmtime(model_path)))
+                })
+            except (ValueError, OSError):
+                continue
+        return versions
+
+    def read_active(self):
+        """Version named by the ACTIVE file (DEFAULT_VERSION if there is none)"""
+        try:
+            with open(os.path.join(self.root, 'ACTIVE'), 'r') as f:
+                return f.read().strip() or DEFAULT_VERSION
+        except FileNotFoundError:
+            return DEFAULT_VERSION
+
+    def write_active(self, version):
+        """Point ACTIVE at a version (atomic rename, so workers never read a partial file)"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, 'ACTIVE')
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            f.write(version + '\n')
+        os.replace(temporary, path)
+
+    def add(self, version, model_path, labels_path):
+        """Copy a model and its model_info.json into a new version directory"""
+        if version == DEFAULT_VERSION or not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid model version '{version}'")
+        if not model_path.endswith(MODEL_EXTENSIONS):
+            raise ValueError(f"Model file must end with one of {', '.join(MODEL_EXTENSIONS)}")
+
+        directory = os.path.join(self.root, version)
+        if os.path.exists(directory):
+            raise ValueError(f"Model version '{version}' already exists")
+
+        # Copy into a temporary directory first so a half-copied version is never visible
+        temporary = directory + '.tmp'
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+        shutil.copy2(model_path, os.path.join(temporary, 'model' + os.path.splitext(model_path)[1]))
+        shutil.copy2(labels_path, os.path.join(temporary, 'model_info.json'))
+        os.rename(temporary, directory)
+
+
+class ShadowStats:
+    """Agreement between the active model and a shadow candidate on sampled traffic"""
+
+    def __init__(self, version, sample_rate):
+        self.version = version
+        self.sample_rate = sample_rate
+        self.started_at = time.time()
+        self.sampled = 0
+        self.compared = 0
+        self.agreed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency_ms = 0.0
+        self.confusions = {}
+        # Request threads count samples while the shadow thread records results
+        self._lock = threading.Lock()
+
+    def record_sample(self, dropped=False):
+        with self._lock:
+            self.sampled += 1
+            if dropped:
+                self.dropped += 1
+
+    def record_drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record(self, primary_label, candidate_label, latency_ms):
+        with self._lock:
+            self.compared += 1
+            self.latency_ms += latency_ms
+            if primary_label == candidate_label:
+                self.agreed += 1
+            else:
+                key = (primary_label, candidate_label)
+                self.confusions[key] = self.confusions.get(key, 0) + 1
+
+    def to_dict(self):
+        with self._lock:
+            top = sorted(self.confusions.items(), key=lambda item: item[1], reverse=True)[:10]
+            return {
+                "version": self.version,
+                "sample_rate": self.sample_rate,
+                "running_s": round(time.time() - self.started_at, 1),
+                "sampled": self.sampled,
+                "compared": self.compared,
+                "agreement": round(self.agreed / self.compared, 4) if self.compared else None,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "mean_latency_ms": round(self.latency_ms / self.compared, 2) if self.compared else None,
+                "top_disagreements": [{"active": active, "candidate": candidate, "count": count}
+                                      for (active, candidate), count in top]
+            }
+
+
+class ModelManager:
+    """
+    Loads registry versions in the background and swaps the active classifier
+
+    A version is loaded and warmed up on a background thread while the
+    current model keeps serving, then swapped in with one assignment.
+    Requests already running finish on the old model, which is released
+    once its in-flight count reaches zero.
+    """
+
+    def __init__(self, registry, inference_mode="function", classifier_options=None, on_swap=None):
+        """
+        Args:
+            registry: ModelRegistry
+            inference_mode: Inference path for Keras models
+            classifier_options: configure_classifier keyword arguments (batching, cache)
+            on_swap: Called with the new classifier right after every swap
+        """
+        self.registry = registry
+        self.inference_mode = inference_mode
+        self.classifier_options = classifier_options or {}
+        self.on_swap = on_swap
+
+        self._lock = threading.Lock()
+        self.loading_version = None
+        self.last_error = None
+        self.swaps = []
+        self._failed_version = None
+        self._watcher = None
+
+        self.shadow = None
+        self.shadow_stats = None
+        self._shadow_queue = None
+        # Version of the shadow candidate loading in the background; the token tells a cancelled load apart
+        self.shadow_loading_version = None
+        self._shadow_token = None
+
+    @property
+    def active_version(self):
+        classifier = get_classifier()
+        return classifier.version if classifier is not None else None
+
+    def activate(self, version, persist=True):
+        """
+        Start loading a version in the background and swap it in when it is warm
+
+        Args:
+            version: Registry version
+            persist: Point ACTIVE at the version so the other workers follow
+
+        Returns:
+            Dictionary with the loading state, or error
+        """
+        try:
+            paths = self.registry.resolve(version)
+        except ValueError as e:
+            return {"error": str(e)}
+
+        with self._lock:
+            if self.loading_version is not None:
+                return {"error": f"Model version '{self.loading_version}' is still loading"}
+            if version == self.active_version:
+                if persist:
+                    self.registry.write_active(version)
+                return {"success": True, "state": "active", "version": version}
+            self.loading_version = version
+
+        threading.Thread(target=self._load_and_swap, args=(version, paths, persist),
+                         name="model-swap", daemon=True).start()
+        return {"success": True, "state": "loading", "version": version}
+
+    def _load_and_swap(self, version, paths, persist):
+        start = time.time()
+        try:
+            # A shadow candidate of the same version is already loaded and warm
+            with self._lock:
+                shadow = self.shadow
+                if shadow is not None and shadow.version == version:
+                    # Detach the shadow thread without letting it unload the model about to be swapped in
+                    self._detach_shadow(promote=True)
+                else:
+                    shadow = None
+            if shadow is not None:
+                new = shadow
+            else:
+                new = self._load(version, paths)
+            configure_classifier(new, **self.classifier_options)
+
+            old = swap_classifier(new)
+            if self.on_swap is not None:
+                self.on_swap(new)
+            if persist:
+                self.registry.write_active(version)
+
+            load_s = time.time() - start
+            print(f"✓ Model version {version} active (loaded and warmed up in {load_s:.1f}s)")
+            self.last_error = None
+            self._failed_version = None
+        except Exception as e:
+            print(f"ERROR: Failed to activate model version {version}: {str(e)}")
+            self.last_error = f"{version}: {str(e)}"
+            self._failed_version = version
+            return
+        finally:
+            self.loading_version = None
+
+        swap = {"version": version, "previous": old.version if old else None, "load_s": round(load_s, 2),
+                "at": time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())}
+        self.swaps = (self.swaps + [swap])[-10:]
+        if old is not None:
+            # Only a weak reference from here on, so the old model can actually be collected
+            old_ref = weakref.ref(old)
+            del old
+            swap["previous_freed"] = self._retire(old_ref)
+
+    def _load(self, version, paths):
+        """Load and warm up a classifier without touching the active one"""
+        model_path, labels_path = paths
+        print(f"Loading model version {version} in background...")
+        classifier = create_classifier(model_path, labels_path, self.inference_mode, version)
+        if not classifier.load_model():
+            raise RuntimeError("model could not be loaded")
+        if not classifier.warm_up():
+            raise RuntimeError("warm-up inference failed")
+        return classifier
+
+    def _retire(self, old_ref):
+        """Release a swapped-out classifier once its in-flight requests are done; True if its memory was freed"""
+        # Requests count themselves when they fetch the classifier, so none can pick up the old one after the swap
+        old = old_ref()
+        if old is not None:
+            deadline = time.monotonic() + RETIRE_TIMEOUT
+            while old.in_flight > 0 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            old.unload()
+            del old
+
+        gc.collect()
+        return old_ref() is None
+
+    def start_shadow(self, version, sample_rate):
+        """
+        Start loading a candidate version in the background and run it on a sample of /api/predict traffic
+
+        The current shadow keeps running until the candidate is warm and replaces it.
+
+        Returns:
+            Dictionary with the loading state, or error
+        """
+        if not 0.0 < sample_rate <= 1.0:
+            return {"error": "sample_rate must be in (0, 1]"}
+        try:
+            paths = self.registry.resolve(version)
+        except ValueError as e:
+            return {"error": str(e)}
+
+        with self._lock:
+            if self.shadow_loading_version is not None:
+                return {"error": f"Shadow version '{self.shadow_loading_version}' is still loading"}
+            self.shadow_loading_version = version
+            token = self._shadow_token = object()
+
+        threading.Thread(target=self._load_shadow, args=(version, paths, sample_rate, token),
+                         name="model-shadow-load", daemon=True).start()
+        return {"success": True, "state": "loading", "version": version}
+
+    def _load_shadow(self, version, paths, sample_rate, token):
+        try:
+            candidate = self._load(version, paths)
+        except Exception as e:
+            print(f"ERROR: Failed to load shadow model version {version}: {str(e)}")
+            with self._lock:
+                if self._shadow_token is token:
+                    self.last_error = f"shadow {version}: {str(e)}"
+                    self.shadow_loading_version = None
+                    self._shadow_token = None
+            return
+
+        with self._lock:
+            cancelled = self._shadow_token is not token
+            if not cancelled:
+                self._detach_shadow()
+                stats = ShadowStats(version, sample_rate)
+                shadow_queue = queue.Queue(maxsize=SHADOW_QUEUE_SIZE)
+                threading.Thread(target=self._run_shadow, args=(candidate, shadow_queue, stats),
+                                 name="model-shadow", daemon=True).start()
+                self.shadow_stats = stats
+                self.shadow = candidate
+                self._shadow_queue = shadow_queue
+                self.shadow_loading_version = None
+                self._shadow_token = None
+
+        if cancelled:
+            # stop_shadow was called while the candidate loaded
+            candidate.unload()
+            print(f"Shadow model version {version} loaded after shadow mode was stopped, released")
+            return
+        print(f"Shadow mode: model version {version} on {sample_rate:.0%} of predictions")
+
+    def stop_shadow(self, promote=False):
+        """
+        Stop shadow predictions and cancel a shadow load (the statistics are kept until the next start)
+
+        Args:
+            promote: The candidate becomes the active model, so it is not unloaded
+        """
+        with self._lock:
+            self.shadow_loading_version = None
+            self._shadow_token = None
+            self._detach_shadow(promote)
+
+    def _detach_shadow(self, promote=False):
+        """Hand the running shadow its stop sentinel without waiting for it (caller holds _lock)"""
+        shadow_queue = self._shadow_queue
+        self.shadow = None
+        self._shadow_queue = None
+        if shadow_queue is None:
+            return
+
+        sentinel = _SHADOW_PROMOTE if promote else _SHADOW_STOP
+        while True:
+            try:
+                shadow_queue.put_nowait(sentinel)
+                return
+            except queue.Full:
+                pass
+            # Make room by dropping the oldest sampled image; the shadow thread may free a slot meanwhile
+            try:
+                shadow_queue.get_nowait()
+                self.shadow_stats.record_drop()
+            except queue.Empty:
+                pass
+
+    def maybe_shadow(self, image_data, prediction_result):
+        """Queue an image for the shadow candidate if it is sampled; never blocks the request"""
+        stats = self.shadow_stats
+        shadow_queue = self._shadow_queue
+        if shadow_queue is None or random.random() >= stats.sample_rate:
+            return
+
+        try:
+            shadow_queue.put_nowait((bytes(image_data), prediction_result['top_prediction']['label']))
+            stats.record_sample()
+        except queue.Full:
+            stats.record_sample(dropped=True)
+
+    def _run_shadow(self, candidate, shadow_queue, stats):
+        while True:
+            item = shadow_queue.get()
+            if item is _SHADOW_PROMOTE:
+                return
+            if item is _SHADOW_STOP:
+                break
+
+            image_data, primary_label = item
+            start = time.perf_counter()
+            result = candidate.predict(image_data, top_k=1)
+            if "error" in result:
+                stats.record_error()
+                continue
+            stats.record(primary_label, result['top_prediction']['label'], (time.perf_counter() - start) * 1000.0)
+
+        candidate.unload()
+
+    def start_watcher(self, interval):
+        """Poll the ACTIVE file and follow versions activated through another worker"""
+        if self._watcher is None and interval > 0:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                version = self.registry.read_active()
+                if version != self.active_version and version != self._failed_version \
+                        and self.loading_version is None:
+                    print(f"Model registry points at version {version}, switching")
+                    self.activate(version, persist=False)
+            except Exception as e:
+                print(f"Error checking model registry: {str(e)}")
+
+    def get_status(self):
+        """Active version, background load state, recent swaps and shadow statistics"""
+        classifier = get_classifier()
+        return {
+            "active_version": self.active_version,
+            "registry_active": self.registry.read_active(),
+            "in_flight": classifier.in_flight if classifier is not None else 0,
+            "loading_version": self.loading_version,
+            "last_error": self.last_error,
+            "swaps": self.swaps,
+            "shadow": self.shadow_stats.to_dict() if self.shadow_stats is not None else None,
+            "shadow_running": self.shadow is not None,
+            "shadow_loading_version": self.shadow_loading_version,
+            "versions": self.registry.versions()
+        }
+
+
+# Global model manager instance
+manager = None
+
+
+def initialize_model_manager(registry, inference_mode="function", classifier_options=None, on_swap=None):
+    """Initialize the global model manager"""
+    global manager
+    manager = ModelManager(registry, inference_mode, classifier_options, on_swap)
+    return manager
+
+
+def get_model_manager():
+    """Get the global model manager instance"""
+    return manager
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Manage the model registry")
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_DIR', os.path.join(base_dir, 'models')))
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="List versions")
+    add = commands.add_parser('add', help="Copy a model and its model_info.json into the registry")
+    add.add_argument('version')
+    add.add_argument('model_path')
+    add.add_argument('labels_path')
+    activate = commands.add_parser('activate', help="Point ACTIVE at a version (workers switch within seconds)")
+    activate.add_argument('version')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry,
+                             os.environ.get('MODEL_PATH', os.path.join(base_dir, 'fruit_classifier_model.h5')),
+                             os.path.join(base_dir, 'model_info.json'))
+    try:
+        if args.command == 'add':
+            registry.add(args.version, args.model_path, args.labels_path)
+            print(f"Added model version {args.version}")
+        elif args.command == 'activate':
+            registry.resolve(args.version)
+            registry.write_active(args.version)
+            print(f"ACTIVE -> {args.version}")
+        else:
+            active = registry.read_active()
+            for version in registry.versions():
+                marker = '*' if version['version'] == active else ' '
+                print(f"{marker} {version['version']:<24}{version['model_file']:<20}{version['size_mb']:>8.1f} MB  "
+                      f"{version['modified']}")
+    except (ValueError, OSError) as e:
+        print(f"ERROR: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
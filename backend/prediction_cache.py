@@ -0,0 +1,203 @@
+"""
+Prediction Cache Module
+LRU cache of model outputs keyed by a perceptual hash of the 32x32 model input,
+so repeated, nearly identical camera frames skip inference
+
+The perceptual hash is coarse: two different items photographed on the same
+tray can share it and get each other's label. The cache is therefore off
+unless PREDICTION_CACHE_SIZE is set.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Brightness levels per channel encoded in the perceptual hash
+_COLOR_LEVELS = 16
+
+# Raw-bytes hashes remembered per entry (a camera stream produces new bytes for every frame of the same scene)
+MAX_EXACT_KEYS = 16
+
+
+def exact_hash(image_data):
+    """Hash of the raw upload bytes (catches byte-identical frames before decoding)"""
+    return hashlib.blake2b(image_data, digest_size=16).digest()
+
+
+def perceptual_hash(image_array):
+    """
+    Perceptual hash of a preprocessed (32, 32, 3) image
+
+    Every color channel is reduced to 8x8 block means and each block is
+    compared with the channel mean (64 bits per channel). The channel means
+    are appended as thermometer codes, so the Hamming distance between two
+    hashes also grows with the difference in overall color. Noise, JPEG
+    artifacts and tiny shifts between frames leave most bits unchanged.
+    """
+    height, width, channels = image_array.shape
+    blocks = image_array.reshape(8, height // 8, 8, width // 8, channels).mean(axis=(1, 3))
+    means = blocks.mean(axis=(0, 1))
+
+    structure = (blocks > means).transpose(2, 0, 1).ravel()
+    levels = np.round(means * _COLOR_LEVELS)
+    color = np.arange(_COLOR_LEVELS) < levels[:, np.newaxis]
+
+    bits = np.packbits(np.concatenate([structure, color.ravel()]))
+    return int.from_bytes(bits.tobytes(), 'big')
+
+
+class _CacheEntry:
+    """Cached model output for one perceptual hash"""
+
+    __slots__ = ('probabilities', 'expires_at', 'exact_keys')
+
+    def __init__(self, probabilities, expires_at, exact_key):
+        self.probabilities = probabilities
+        self.expires_at = expires_at
+        self.exact_keys = [exact_key] if exact_key is not None else []
+
+
+class PredictionCache:
+    """Bounded LRU cache with TTL eviction and Hamming-distance lookups"""
+
+    def __init__(self, max_size=256, ttl_seconds=10.0, max_hamming_distance=0):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Maximum number of cached frames
+            ttl_seconds: How long an entry stays valid
+            max_hamming_distance: Largest number of differing hash bits still treated as the same frame
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_hamming_distance = max_hamming_distance
+
+        self._entries = OrderedDict()  # perceptual hash -> _CacheEntry, oldest first
+        self._exact_index = {}  # exact bytes hash -> perceptual hash
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_exact(self, exact_key):
+        """Look up a frame by its raw bytes hash; returns probabilities or None"""
+        with self._lock:
+            phash = self._exact_index.get(exact_key)
+            if phash is None:
+                return None
+
+            entry = self._get_live(phash)
+            if entry is None:
+                return None
+
+            self.exact_hits += 1
+            return entry.probabilities
+
+    def get_similar(self, phash, exact_key=None):
+        """
+        Look up a frame by perceptual hash within the Hamming threshold
+
+        Args:
+            phash: Perceptual hash of the model input
+            exact_key: Raw bytes hash of the frame, indexed on a hit so a repeat of it skips decoding
+
+        Returns:
+            Probabilities or None
+        """
+        with self._lock:
+            entry = self._get_live(phash)
+            matched = phash
+
+            if entry is None and self.max_hamming_distance > 0:
+                # Most recently used frames are the most likely match
+                candidates = [key for key in self._entries
+                              if (key ^ phash).bit_count() <= self.max_hamming_distance]
+                for key in reversed(candidates):
+                    entry = self._get_live(key)
+                    if entry is not None:
+                        matched = key
+                        break
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if exact_key is not None and exact_key not in self._exact_index:
+                self._add_exact_key(entry, exact_key, matched)
+            self.similar_hits += 1
+            return entry.probabilities
+
+    def put(self, phash, probabilities, exact_key=None):
+        """Store the model output for a frame"""
+        with self._lock:
+            old = self._entries.pop(phash, None)
+            if old is not None:
+                self._drop_exact_keys(old)
+
+            self._entries[phash] = _CacheEntry(probabilities, time.monotonic() + self.ttl_seconds, exact_key)
+            if exact_key is not None:
+                self._exact_index[exact_key] = phash
+
+            while len(self._entries) > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._drop_exact_keys(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+            self._exact_index.clear()
+
+    def get_stats(self):
+        """Return cache statistics"""
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            lookups = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "max_hamming_distance": self.max_hamming_distance,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def _get_live(self, phash):
+        """Return an unexpired entry and mark it recently used (caller holds the lock)"""
+        entry = self._entries.get(phash)
+        if entry is None:
+            return None
+
+        if entry.expires_at < time.monotonic():
+            del self._entries[phash]
+            self._drop_exact_keys(entry)
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(phash)
+        return entry
+
+    def _add_exact_key(self, entry, exact_key, phash):
+        """Point another raw bytes hash at an entry, forgetting its oldest one past MAX_EXACT_KEYS"""
+        entry.exact_keys.append(exact_key)
+        self._exact_index[exact_key] = phash
+        if len(entry.exact_keys) > MAX_EXACT_KEYS:
+            self._exact_index.pop(entry.exact_keys.pop(0), None)
+
+    def _drop_exact_keys(self, entry):
+        """Remove an entry's raw bytes hashes from the index (caller holds the lock)"""
+        for exact_key in entry.exact_keys:
+            self._exact_index.pop(exact_key, None)
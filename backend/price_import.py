@@ -0,0 +1,274 @@
+"""
+Price List Import Module
+Parses and validates head-office price lists (CSV or JSON) and computes the
+diff against the current catalog before ProductDatabase applies it
+
+CSV columns (header row required): name, price_per_kg, and optionally
+name_polish, category, store. JSON: a list of objects with the same keys, or
+{"prices": [...]}. Rows without a store set the base price, rows with a store
+set that store's price override.
+
+Usage:
+    python price_import.py cennik.csv [--dry-run] [--replace-stores] [--db ../data/products.db]
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+
+# Longest store identifier
+MAX_STORE_ID_LENGTH = 64
+
+
+class PriceEntry:
+    """One row of a price list"""
+
+    __slots__ = ('row', 'name', 'price_per_kg', 'name_polish', 'category', 'store')
+
+    def __init__(self, row, name, price_per_kg, name_polish=None, category=None, store=None):
+        self.row = row
+        self.name = name
+        self.price_per_kg = price_per_kg
+        self.name_polish = name_polish
+        self.category = category
+        self.store = store
+
+
+def load_labels(labels_path):
+    """Set of classifier labels from model_info.json"""
+    with open(labels_path, 'r') as f:
+        return set(json.load(f)['labels'])
+
+
+def _clean(value):
+    """Strip a text field; empty values become None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_price_list(body, list_format):
+    """
+    Parse a price list
+
+    Args:
+        body: bytes or str
+        list_format: 'csv' or 'json'
+
+    Returns:
+        Tuple (entries, errors); errors is a list of messages
+    """
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode('utf-8-sig')
+
+    if list_format == 'json':
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            return [], [f"Invalid JSON: {str(e)}"]
+        records = data.get('prices') if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            return [], ["JSON price list must be a list of objects or {\"prices\": [...]}"]
+        first_row = 1
+    else:
+        reader = csv.DictReader(io.StringIO(body))
+        if not reader.fieldnames or 'name' not in reader.fieldnames or 'price_per_kg' not in reader.fieldnames:
+            return [], ["CSV header must contain the columns name and price_per_kg"]
+        records = list(reader)
+        first_row = 2  # Line 1 is the header
+
+    entries = []
+    errors = []
+    for row, record in enumerate(records, start=first_row):
+        if not isinstance(record, dict):
+            errors.append(f"row {row}: expected an object")
+            continue
+
+        name = _clean(record.get('name'))
+        if name is None:
+            errors.append(f"row {row}: missing name")
+            continue
+
+        try:
+            price = float(record.get('price_per_kg'))
+        except (TypeError, ValueError):
+            errors.append(f"row {row}: invalid price_per_kg for {name}")
+            continue
+        if not math.isfinite(price) or price <= 0:
+            errors.append(f"row {row}: price_per_kg for {name} must be a positive number")
+            continue
+
+        store = _clean(record.get('store'))
+        if store is not None and len(store) > MAX_STORE_ID_LENGTH:
+            errors.append(f"row {row}: store id longer than {MAX_STORE_ID_LENGTH} characters")
+            continue
+
+        entries.append(PriceEntry(row, name, round(price, 2), _clean(record.get('name_polish')),
+                                  _clean(record.get('category')), store))
+
+    return entries, errors
+
+
+def validate_price_list(entries, labels, base_products):
+    """
+    Check a parsed price list against the classifier labels and the current base catalog
+
+    Args:
+        entries: PriceEntry list
+        labels: Set of classifier labels
+        base_products: Dictionary name -> current base product row
+
+    Returns:
+        List of error messages (empty if the list can be applied)
+    """
+    errors = []
+    seen = {}
+    base_names = set(base_products)
+    base_names.update(entry.name for entry in entries if entry.store is None)
+
+    for entry in entries:
+        key = (entry.store, entry.name)
+        if key in seen:
+            scope = f"store {entry.store}" if entry.store else "base catalog"
+            errors.append(f"row {entry.row}: duplicate {entry.name} in {scope} (first on row {seen[key]})")
+            continue
+        seen[key] = entry.row
+
+        if entry.name not in labels:
+            errors.append(f"row {entry.row}: unknown product {entry.name} (not a classifier label)")
+        elif entry.store is None and entry.name not in base_products and entry.name_polish is None:
+            errors.append(f"row {entry.row}: new product {entry.name} needs name_polish")
+        elif entry.store is not None and entry.name not in base_names:
+            errors.append(f"row {entry.row}: store {entry.store} overrides {entry.name}, "
+                          f"which is not in the base catalog")
+
+    return errors
+
+
+def _empty_diff():
+    return {"added": [], "changed": [], "removed": [], "unchanged": 0}
+
+
+def diff_price_list(entries, base_products, store_prices, replace_stores=False):
+    """
+    Compare a validated price list with the current prices
+
+    Args:
+        entries: PriceEntry list
+        base_products: Dictionary name -> current base product row
+        store_prices: Dictionary (store, name) -> current override price for the stores in the list
+        replace_stores: Overrides of listed stores that are missing from the list are removed
+
+    Returns:
+        Tuple (diff, base_rows, store_rows, removed_rows): the report and the rows to write
+    """
+    diff = {"base": _empty_diff(), "stores": {}}
+    base_rows = []
+    store_rows = []
+    removed_rows = []
+    listed = set()
+
+    for entry in entries:
+        if entry.store is None:
+            scope = diff["base"]
+            current = base_products.get(entry.name)
+            old_price = current['price_per_kg'] if current else None
+            changed_fields = current is not None and (
+                (entry.name_polish is not None and entry.name_polish != current['name_polish']) or
+                (entry.category is not None and entry.category != current['category']))
+        else:
+            scope = diff["stores"].setdefault(entry.store, _empty_diff())
+            old_price = store_prices.get((entry.store, entry.name))
+            changed_fields = False
+            listed.add((entry.store, entry.name))
+
+        if old_price is None:
+            scope["added"].append({"name": entry.name, "price_per_kg": entry.price_per_kg})
+        elif old_price != entry.price_per_kg or changed_fields:
+            scope["changed"].append({"name": entry.name, "old_price_per_kg": old_price,
+                                     "new_price_per_kg": entry.price_per_kg})
+        else:
+            scope["unchanged"] += 1
+            continue
+
+        if entry.store is None:
+            name_polish = entry.name_polish or base_products[entry.name]['name_polish']
+            base_rows.append((entry.name, name_polish, entry.category, entry.price_per_kg))
+        else:
+            store_rows.append((entry.store, entry.name, entry.price_per_kg))
+
+    if replace_stores:
+        for (store, name), price in store_prices.items():
+            if (store, name) not in listed:
+                diff["stores"].setdefault(store, _empty_diff())["removed"].append(
+                    {"name": name, "price_per_kg": price})
+                removed_rows.append((store, name))
+
+    return diff, base_rows, store_rows, removed_rows
+
+
+def summarize_diff(diff):
+    """Counts of added / changed / removed / unchanged prices over all scopes"""
+    scopes = [diff["base"]] + list(diff["stores"].values())
+    return {
+        "added": sum(len(scope["added"]) for scope in scopes),
+        "changed": sum(len(scope["changed"]) for scope in scopes),
+        "removed": sum(len(scope["removed"]) for scope in scopes),
+        "unchanged": sum(scope["unchanged"] for scope in scopes),
+        "stores": len(diff["stores"])
+    }
+
+
+def main():
+    from database import ProductDatabase
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Import a price list")
+    parser.add_argument('path', help="CSV or JSON price list")
+    parser.add_argument('--db', default=os.environ.get('DB_PATH', os.path.join(base_dir, 'data', 'products.db')))
+    parser.add_argument('--labels', default=os.path.join(base_dir, 'model_info.json'))
+    parser.add_argument('--replace-stores', action='store_true',
+                        help="Remove overrides of listed stores that are not in the file")
+    parser.add_argument('--dry-run', action='store_true', help="Only validate and show the diff")
+    parser.add_argument('--verbose', action='store_true', help="Print every changed price")
+    args = parser.parse_args()
+
+    list_format = 'json' if args.path.lower().endswith('.json') else 'csv'
+    with open(args.path, 'rb') as f:
+        entries, errors = parse_price_list(f.read(), list_format)
+
+    database = ProductDatabase(args.db, pool_size=1)
+    if not database.connect() or not database.initialize_schema():
+        sys.exit(1)
+
+    # Rows that parsed are still validated, so every problem is listed; nothing is written
+    result = database.import_price_list(entries, load_labels(args.labels), args.replace_stores,
+                                        args.dry_run or bool(errors))
+    errors += result.get("errors", [])
+    database.close()
+
+    if errors:
+        print(f"Price list rejected ({len(errors)} errors):")
+        for error in errors:
+            print(f"  {error}")
+        sys.exit(1)
+
+    summary = result["summary"]
+    action = "Validated (dry run)" if args.dry_run else "Imported"
+    print(f"{action} {len(entries)} prices in {result['elapsed_ms']:.0f} ms: {summary['added']} added, "
+          f"{summary['changed']} changed, {summary['removed']} removed, {summary['unchanged']} unchanged "
+          f"({summary['stores']} stores)")
+
+    if args.verbose:
+        for scope, diff in [("base", result["diff"]["base"])] + sorted(result["diff"]["stores"].items()):
+            for change in diff["changed"]:
+                print(f"  [{scope}] {change['name']}: {change['old_price_per_kg']} -> {change['new_price_per_kg']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Profiler Module
+Time-bounded sampling profiler for a live worker process
+
+A background thread reads the Python stack of every thread with
+sys._current_frames() at a fixed interval and counts identical stacks. The
+result is written as collapsed stacks ("frame;frame;frame count", the input
+format of flamegraph.pl and speedscope) plus, optionally, the top
+tracemalloc allocation sites. Nothing is installed on the request path: when
+no profile is running the profiler costs nothing.
+
+Profiles are saved as <profile_dir>/<id>.json so any gunicorn worker can
+serve a profile taken by another one. Only the newest MAX_SAVED_PROFILES are
+kept. A profile still marked running whose worker has exited is reported as
+interrupted.
+"""
+
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+# Upper limit on the duration of one profile (seconds)
+MAX_PROFILE_SECONDS = 120.0
+MIN_INTERVAL_MS = 1.0
+# Saved profiles kept in the profile directory (older ones are deleted when a new profile starts)
+MAX_SAVED_PROFILES = 20
+
+# Leaf frames of threads that are blocked waiting, not running (file suffix, function)
+IDLE_FRAMES = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'), ('queue.py', 'get'),
+    ('selectors.py', 'select'), ('socket.py', 'accept'), ('socket.py', 'readinto'),
+    ('socketserver.py', 'serve_forever'), ('sync.py', 'wait'), ('arbiter.py', 'sleep'),
+    ('base_events.py', '_run_once'), ('thread.py', '_worker'),
+}
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]+-[0-9]+$')
+
+# Only one profile runs per process at a time
+_lock = threading.Lock()
+_running = None
+
+
+def _frame_label(code, lineno=None):
+    filename = os.path.basename(code.co_filename)
+    if lineno is None:
+        return f"{code.co_name} ({filename})"
+    return f"{code.co_name} ({filename}:{lineno})"
+
+
+def _is_idle(frame):
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def _process_alive(pid):
+    """Whether the process that took a profile still runs (profile directories are local to one host)"""
+    if not isinstance(pid, int):
+        return False
+    if pid == os.getpid() or os.name == 'nt':
+        # On Windows os.kill would terminate the process instead of probing it
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _prune_profiles(profile_dir, keep):
+    """Delete all but the newest `keep` saved profiles, never one that is still being taken"""
+    try:
+        names = [name for name in os.listdir(profile_dir) if name.endswith('.json')]
+    except OSError:
+        return
+    paths = sorted((os.path.join(profile_dir, name) for name in names), key=_mtime, reverse=True)
+    for path in paths[keep:]:
+        profile_id = os.path.basename(path)[:-5]
+        profile = load_profile(profile_dir, profile_id)
+        if profile is not None and profile.get("state") == "running":
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ProfileRun:
+    """One sampling profile of this process"""
+
+    def __init__(self, profile_dir, seconds, interval_ms, with_tracemalloc=False, include_idle=False, top=25):
+        """
+        Args:
+            profile_dir: Directory the result is written to
+            seconds: Profile duration
+            interval_ms: Time between stack samples
+            with_tracemalloc: Also record the top allocation sites
+            include_idle: Keep samples of threads blocked in waits (select, queue.get, ...)
+            top: Number of allocation sites to report
+        """
+        self.id = f"{os.getpid()}-{int(time.time() * 1000)}"
+        self.path = os.path.join(profile_dir, f"{self.id}.json")
+        self.profile_dir = profile_dir
+        self.seconds = seconds
+        self.interval = interval_ms / 1000.0
+        self.with_tracemalloc = with_tracemalloc
+        self.include_idle = include_idle
+        self.top = top
+
+        self.stacks = {}
+        self.samples = 0
+        self.idle_samples = 0
+        self.sampling_time = 0.0
+        self.started_at = time.time()
+        self.stopped = threading.Event()
+        self._started_tracemalloc = False
+
+    def summary(self, state):
+        return {
+            "id": self.id,
+            "pid": os.getpid(),
+            "state": state,
+            "started": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started_at)),
+            "seconds": self.seconds,
+            "interval_ms": self.interval * 1000.0,
+            "tracemalloc": self.with_tracemalloc
+        }
+
+    def run(self):
+        """Sample until the duration is over, then write the result"""
+        if self.with_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._started_tracemalloc = True
+
+        try:
+            self._sample()
+            allocations = self._allocations() if self.with_tracemalloc else None
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+        result = self.summary("done")
+        result.update({
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "sampling_overhead_ms": round(self.sampling_time * 1000.0, 1),
+            "collapsed": self.collapsed(),
+            "allocations": allocations
+        })
+        self._write(result)
+        return result
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {}
+        labels = {}
+        stop_at = time.perf_counter() + self.seconds
+        next_at = time.perf_counter()
+
+        while next_at < stop_at and not self.stopped.is_set():
+            start = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not self.include_idle and _is_idle(frame):
+                    self.idle_samples += 1
+                    continue
+
+                name = names.get(ident)
+                if name is None:
+                    names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    name = names.get(ident, str(ident))
+
+                # Leaf gets its line number; callers are labelled per function
+                parts = [_frame_label(frame.f_code, frame.f_lineno)]
+                frame = frame.f_back
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    parts.append(label)
+                    frame = frame.f_back
+                parts.append(f"thread:{name}")
+
+                key = ';'.join(reversed(parts))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+            self.sampling_time += time.perf_counter() - start
+
+            next_at += self.interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                self.stopped.wait(delay)
+
+    def _allocations(self):
+        """Top allocation sites still alive at the end of the profile"""
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        allocations = []
+        for stat in snapshot.statistics('traceback')[:self.top]:
+            allocations.append({
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+                "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+            })
+        return allocations
+
+    def collapsed(self):
+        """Collapsed stacks, most frequent first"""
+        ordered = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)
+        return ''.join(f"{stack} {count}\n" for stack, count in ordered)
+
+    def _write(self, result):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(result, f)
+        os.replace(temporary, self.path)
+
+
+def start_profile(profile_dir, seconds=10.0, interval_ms=10.0, with_tracemalloc=False, include_idle=False,
+                  top=25):
+    """
+    Start a sampling profile of this process in a background thread
+
+    The caller does not wait for the result: blocking a request thread (on a
+    sync gunicorn worker, the whole worker) would leave the profile with
+    nothing but idle time. The result is read back with load_profile.
+
+    Args:
+        profile_dir: Directory profiles are saved in
+        seconds: Duration (at most MAX_PROFILE_SECONDS)
+        interval_ms: Sampling interval (at least MIN_INTERVAL_MS)
+        with_tracemalloc: Also report the top allocation sites (slows the process while it runs)
+        include_idle: Keep samples of blocked threads
+        top: Number of allocation sites
+
+    Returns:
+        Profile summary, or dictionary with error
+    """
+    global _running
+
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        return {"error": f"seconds must be in (0, {MAX_PROFILE_SECONDS:g}]"}
+    if not (math.isfinite(interval_ms) and interval_ms >= MIN_INTERVAL_MS):
+        return {"error": f"interval_ms must be a finite number of at least {MIN_INTERVAL_MS:g}"}
+
+    with _lock:
+        if _running is not None:
+            return {"error": f"Profile {_running.id} is already running in this worker"}
+        run = _running = ProfileRun(profile_dir, seconds, interval_ms, with_tracemalloc, include_idle, top)
+
+    def target():
+        global _running
+        try:
+            run.run()
+        except Exception as e:
+            print(f"Error during profile {run.id}: {str(e)}")
+            # Readers must not wait for a result that will never come
+            try:
+                run._write(dict(run.summary("failed"), error=str(e)))
+            except OSError:
+                pass
+        finally:
+            _running = None
+
+    _prune_profiles(profile_dir, MAX_SAVED_PROFILES - 1)
+    # Record the running state on disk so every worker can answer for this profile
+    try:
+        run._write(run.summary("running"))
+    except Exception as e:
+        # Nothing is running: later profiles must not be refused as "already running"
+        _running = None
+        return {"error": f"Profile could not be written to {run.profile_dir}: {str(e)}"}
+    threading.Thread(target=target, name="profiler", daemon=True).start()
+    return run.summary("running")
+
+
+def stop_profile():
+    """End the running profile early (its result is still written); False if none is running"""
+    run = _running
+    if run is None:
+        return False
+    run.stopped.set()
+    return True
+
+
+def load_profile(profile_dir, profile_id):
+    """Saved profile by id, or None; state "interrupted" when its worker exited while taking it"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(profile_dir, f"{profile_id}.json")) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if profile.get("state") == "running" and not _process_alive(profile.get("pid")):
+        profile["state"] = "interrupted"
+    return profile
+
+
+def list_profiles(profile_dir):
+    """Summaries of the saved profiles, newest first"""
+    profiles = []
+    if not os.path.isdir(profile_dir):
+        return profiles
+    for name in sorted(os.listdir(profile_dir), reverse=True):
+        if name.endswith('.json'):
+            profile = load_profile(profile_dir, name[:-5])
+            if profile is not None:
+                profiles.append({key: profile.get(key) for key in
+                                 ("id", "pid", "state", "started", "seconds", "samples", "tracemalloc")})
+    return profiles
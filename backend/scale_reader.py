@@ -0,0 +1,586 @@
+"""
+Scale Reader Module
+Live weight from a load cell indicator over a serial port or TCP
+
+A background thread reads the indicator's continuous output, one reading per
+line: either the common "ST,GS,+00123.4  g" format (ST stable, US unstable,
+OL overload) or a plain number with an optional g / kg unit. A reading counts
+as stable once the weight has stayed within a tolerance for a time window and
+the indicator does not report it as unstable. Live readings are published at
+most every LIVE_INTERVAL; stable weights are published as soon as they settle.
+
+Only one process can own a serial port, so gunicorn workers elect an owner
+with a file lock (flock; byte-range locking through msvcrt on Windows). The
+owner publishes readings into a small shared memory slot (a seqlock over an
+mmap), and every worker reads the latest reading from memory, without any
+I/O on the request path. If the owner exits, another worker takes the lock
+within a second.
+
+A simulator for local testing: python scale_reader.py simulate --port 4001
+"""
+
+import argparse
+import mmap
+import os
+import random
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: lock the first byte of the lock file instead of flock
+    fcntl = None
+    import msvcrt
+
+# Stability detection defaults
+STABLE_SECONDS = 0.5
+STABLE_TOLERANCE_GRAMS = 1.0
+# Readings closer to zero than this are reported as an empty scale
+ZERO_GRAMS = 2.0
+RESOLUTION_GRAMS = 0.1
+
+# Live (not yet stable) readings are published at most this often (seconds)
+LIVE_INTERVAL = 0.1
+# A reading older than this is not used for pricing (seconds)
+STALE_SECONDS = 2.0
+
+READ_TIMEOUT = 1.0
+RECONNECT_MIN = 0.5
+RECONNECT_MAX = 10.0
+# How often a worker that does not own the scale looks for new readings and retries the lock
+FOLLOW_INTERVAL = 0.05
+LOCK_RETRY_INTERVAL = 1.0
+
+# Shared slot: seq, grams, stable grams, heartbeat (time of the last reading), connected, stable
+SLOT_FORMAT = '<QdddBB'
+SLOT_SIZE = 64
+_SEQ = struct.Struct('<Q')
+_HEARTBEAT = struct.Struct('<d')
+_HEARTBEAT_OFFSET = 24
+
+# Optional status and net/gross headers ("ST,GS,"), signed value, optional unit
+LINE_PATTERN = re.compile(r'^(?:(?P<header>[A-Z]{2}),(?:[A-Z]{2},)?)?\s*'
+                          r'(?P<value>[+-]?\s*\d+(?:\.\d+)?)\s*(?P<unit>kg|g)?$', re.IGNORECASE)
+
+
+def parse_reading(line):
+    """
+    Parse one indicator line
+
+    Args:
+        line: Line as bytes or str ("ST,GS,+00123.4  g", "US,NT,-0.002kg", "123.4", ...)
+
+    Returns:
+        Tuple (grams, device_stable) with device_stable None if the line has no
+        status, or None for overload and unparseable lines
+    """
+    if isinstance(line, (bytes, bytearray)):
+        line = line.decode('ascii', errors='replace')
+    match = LINE_PATTERN.match(line.strip())
+    if match is None:
+        return None
+
+    header = (match.group('header') or '').upper()
+    if header == 'OL':
+        return None
+    grams = float(match.group('value').replace(' ', ''))
+    if (match.group('unit') or 'g').lower() == 'kg':
+        grams *= 1000.0
+    return grams, {'ST': True, 'US': False}.get(header)
+
+
+class StabilityDetector:
+    """Decides when a series of readings has settled"""
+
+    def __init__(self, window=STABLE_SECONDS, tolerance=STABLE_TOLERANCE_GRAMS, zero=ZERO_GRAMS,
+                 resolution=RESOLUTION_GRAMS):
+        """
+        Args:
+            window: Seconds the weight must stay within the tolerance
+            tolerance: Allowed spread (grams) inside the window
+            zero: Stable weights below this are reported as 0
+            resolution: Stable weights are rounded to this step
+        """
+        self.window = window
+        self.tolerance = tolerance
+        self.zero = zero
+        self.resolution = resolution
+        self.samples = deque()
+
+    def add(self, timestamp, grams, device_stable=None):
+        """
+        Add a reading
+
+        Returns:
+            Stable weight in grams, or None while the weight is still moving
+        """
+        samples = self.samples
+        samples.append((timestamp, grams))
+        # Keep one sample at or before the start of the window, so its full span is known
+        while len(samples) > 1 and samples[1][0] <= timestamp - self.window:
+            samples.popleft()
+
+        if device_stable is False or samples[0][0] > timestamp - self.window:
+            return None
+        values = [value for _, value in samples]
+        if max(values) - min(values) > self.tolerance:
+            return None
+
+        values.sort()
+        stable = values[len(values) // 2]
+        if abs(stable) < self.zero:
+            return 0.0
+        return round(round(stable / self.resolution) * self.resolution, 3)
+
+    def reset(self):
+        self.samples.clear()
+
+
+class _TcpConnection:
+    """Line reader over a TCP socket (tcp://host:port)"""
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(timeout)
+        self.buffer = b''
+
+    def readline(self):
+        """Next line, None on read timeout; raises ConnectionError when the peer closes"""
+        while b'\n' not in self.buffer:
+            try:
+                chunk = self.sock.recv(4096)
+            except socket.timeout:
+                return None
+            if not chunk:
+                raise ConnectionError("Scale closed the connection")
+            # A device that never sends a newline must not grow the buffer forever
+            self.buffer = (self.buffer + chunk)[-4096:]
+        line, _, self.buffer = self.buffer.partition(b'\n')
+        return line
+
+    def close(self):
+        self.sock.close()
+
+
+class _SerialConnection:
+    """Line reader over a serial port (serial:///dev/ttyUSB0?baud=9600), needs pyserial"""
+
+    def __init__(self, port, baudrate, timeout):
+        try:
+            import serial
+        except ImportError:
+            raise RuntimeError("Serial scales need pyserial (pip install pyserial)")
+        self.port = serial.Serial(port, baudrate=baudrate, timeout=timeout)
+        self.buffer = b''
+
+    def readline(self):
+        """Next line, None on read timeout"""
+        self.buffer += self.port.read_until(b'\n')
+        if not self.buffer.endswith(b'\n'):
+            self.buffer = self.buffer[-4096:]
+            return None
+        line, self.buffer = self.buffer, b''
+        return line
+
+    def close(self):
+        self.port.close()
+
+
+def open_connection(url, timeout=READ_TIMEOUT):
+    """
+    Open a line reader for a scale URL
+
+    Args:
+        url: tcp://host:port or serial:///dev/ttyUSB0?baud=9600
+
+    Returns:
+        Connection with readline() and close()
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'tcp':
+        if not parsed.hostname or not parsed.port:
+            raise ValueError(f"Scale URL needs a host and port: {url}")
+        return _TcpConnection(parsed.hostname, parsed.port, timeout)
+    if parsed.scheme == 'serial':
+        baudrate = int(parse_qs(parsed.query).get('baud', ['9600'])[0])
+        return _SerialConnection(parsed.path, baudrate, timeout)
+    raise ValueError(f"Unsupported scale URL (use tcp:// or serial://): {url}")
+
+
+class SharedReading:
+    """Latest reading in a shared memory slot, written by one process and read by all"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: File backing the slot (preferably on tmpfs, e.g. /dev/shm)
+        """
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < SLOT_SIZE:
+                os.ftruncate(fd, SLOT_SIZE)
+            self.map = mmap.mmap(fd, SLOT_SIZE)
+        finally:
+            os.close(fd)
+
+    def seq(self):
+        return _SEQ.unpack_from(self.map, 0)[0]
+
+    def write(self, grams, stable_grams, heartbeat, connected, stable):
+        """Publish a reading (odd sequence number while the slot is being written)"""
+        seq = self.seq()
+        _SEQ.pack_into(self.map, 0, seq + 1)
+        struct.pack_into(SLOT_FORMAT, self.map, 0, seq + 1, grams, stable_grams, heartbeat, connected, stable)
+        _SEQ.pack_into(self.map, 0, seq + 2)
+
+    def touch(self, heartbeat):
+        """Record that the scale is still sending, without publishing a new reading"""
+        _HEARTBEAT.pack_into(self.map, _HEARTBEAT_OFFSET, heartbeat)
+
+    def read(self):
+        """Consistent copy of the slot: (seq, grams, stable grams, heartbeat, connected, stable)"""
+        for _ in range(1000):
+            values = struct.unpack_from(SLOT_FORMAT, self.map, 0)
+            if not values[0] & 1 and self.seq() == values[0]:
+                return values
+        return values
+
+
+class ScaleReader:
+    """Reads a scale in a background thread and keeps the latest stable weight in memory"""
+
+    def __init__(self, url, shared_path, window=STABLE_SECONDS, tolerance=STABLE_TOLERANCE_GRAMS):
+        """
+        Args:
+            url: Scale URL (tcp://host:port or serial:///dev/ttyUSB0?baud=9600)
+            shared_path: Shared memory file of the latest reading (one per scale)
+            window: Seconds the weight must stay within the tolerance to count as stable
+            tolerance: Allowed spread in grams
+        """
+        self.url = url
+        self.shared = SharedReading(shared_path)
+        self.lock_path = f"{shared_path}.lock"
+        self.detector = StabilityDetector(window, tolerance)
+
+        self.owner = False
+        self.readings = 0
+        self.stable_readings = 0
+        self.parse_errors = 0
+        self.reconnects = 0
+
+        self._stop = threading.Event()
+        self._changed = threading.Condition()
+        self._seen_seq = self.shared.seq()
+        self._lock_file = None
+        self._thread = None
+
+    def start(self):
+        """Start the background thread (after fork: every worker runs its own)"""
+        self._thread = threading.Thread(target=self._run, name="scale-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=READ_TIMEOUT + 1.0)
+
+    def get_reading(self):
+        """
+        Latest reading from memory (no I/O)
+
+        Returns:
+            Dictionary with connected, grams, stable, stable_grams, age (seconds since the last reading) and seq
+        """
+        seq, grams, stable_grams, heartbeat, connected, stable = self.shared.read()
+        age = time.time() - heartbeat if heartbeat else None
+        return {
+            "connected": bool(connected) and age is not None and age <= STALE_SECONDS,
+            "grams": round(grams, 1),
+            "stable": bool(stable),
+            "stable_grams": stable_grams if stable else None,
+            "age": round(age, 3) if age is not None else None,
+            "seq": seq // 2
+        }
+
+    def stable_weight(self):
+        """Current stable weight in grams, or None if the scale is moving, empty, stale or disconnected"""
+        seq, grams, stable_grams, heartbeat, connected, stable = self.shared.read()
+        if not (connected and stable and stable_grams > 0) or time.time() - heartbeat > STALE_SECONDS:
+            return None
+        return stable_grams
+
+    def wait_for_update(self, seq, timeout):
+        """
+        Block until a reading newer than seq is published (or the timeout passes)
+
+        Returns:
+            The latest reading
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._seen_seq // 2 != seq or self._stop.is_set(), timeout)
+        return self.get_reading()
+
+    def _notify(self):
+        seq = self.shared.seq()
+        if seq != self._seen_seq:
+            with self._changed:
+                self._seen_seq = seq
+                self._changed.notify_all()
+
+    def _try_lock(self):
+        lock_file = open(self.lock_path, 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until the process exits, then another worker takes over
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        next_lock_try = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_lock_try:
+                next_lock_try = now + LOCK_RETRY_INTERVAL
+                if self._try_lock():
+                    self.owner = True
+                    print(f"✓ Scale reader: process {os.getpid()} owns {self.url}")
+                    self._read_scale()
+                    return
+            # Another worker owns the scale: follow its readings
+            self._notify()
+            self._stop.wait(FOLLOW_INTERVAL)
+
+    def _publish(self, grams, stable_grams, connected):
+        self.shared.write(grams, stable_grams if stable_grams is not None else 0.0, time.time(), connected,
+                          stable_grams is not None)
+        self._notify()
+
+    def _read_scale(self):
+        delay = RECONNECT_MIN
+        while not self._stop.is_set():
+            try:
+                connection = open_connection(self.url)
+            except Exception as e:
+                if delay == RECONNECT_MIN:
+                    print(f"WARNING: Cannot connect to scale {self.url}: {str(e)}")
+                self._publish(0.0, None, False)
+                self._stop.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+
+            print(f"✓ Scale connected: {self.url}")
+            delay = RECONNECT_MIN
+            self.detector.reset()
+            try:
+                self._read_lines(connection)
+            except Exception as e:
+                print(f"WARNING: Scale connection lost: {str(e)}")
+                self.reconnects += 1
+            finally:
+                connection.close()
+                self._publish(0.0, None, False)
+
+    def _read_lines(self, connection):
+        published_stable = None
+        published_at = 0.0
+        while not self._stop.is_set():
+            line = connection.readline()
+            if line is None:
+                continue
+            reading = parse_reading(line)
+            if reading is None:
+                self.parse_errors += 1
+                continue
+
+            now = time.monotonic()
+            grams, device_stable = reading
+            self.readings += 1
+            stable_grams = self.detector.add(now, grams, device_stable)
+
+            # Debounce: publish settled weights at once, moving readings at most every LIVE_INTERVAL
+            if stable_grams is not None:
+                if published_stable is not None and abs(stable_grams - published_stable) < self.detector.tolerance:
+                    self.shared.touch(time.time())
+                    continue
+                self.stable_readings += 1
+            elif published_stable is None and now - published_at < LIVE_INTERVAL:
+                self.shared.touch(time.time())
+                continue
+
+            self._publish(grams if stable_grams is None else stable_grams, stable_grams, True)
+            published_stable = stable_grams
+            published_at = now
+
+    def get_stats(self):
+        return {
+            "url": self.url,
+            "owner": self.owner,
+            "pid": os.getpid(),
+            "readings": self.readings,
+            "stable_readings": self.stable_readings,
+            "parse_errors": self.parse_errors,
+            "reconnects": self.reconnects
+        }
+
+
+class Simulator:
+    """
+    Load cell indicator simulator: items are put on the scale, the reading
+    rings down to their weight, stays there, then the scale is emptied
+
+    Each TCP client gets the same "ST,GS,+00123.4  g" stream.
+    """
+
+    def __init__(self, rate=20.0, weights=None, hold=3.0, empty=1.5, settle=0.8, noise=0.2, seed=None):
+        """
+        Args:
+            rate: Readings per second
+            weights: Item weights in grams to cycle through (random 50-1500 g if None)
+            hold: Seconds an item stays on the scale after settling
+            empty: Seconds the scale stays empty between items
+            settle: Seconds the reading rings before it settles
+            noise: Sensor noise (grams, standard deviation)
+        """
+        self.rate = rate
+        self.weights = list(weights) if weights else None
+        self.hold = hold
+        self.empty = empty
+        self.settle = settle
+        self.noise = noise
+        self.random = random.Random(seed)
+        # (weight, time placed, time settled) of every item put on the scale
+        self.events = []
+        self.started = time.time()
+
+    def _target(self, index):
+        if self.weights:
+            return self.weights[index % len(self.weights)]
+        return round(self.random.uniform(50, 1500), 1)
+
+    def value(self, now):
+        """(grams, settled) at a time"""
+        period = self.empty + self.settle + self.hold
+        elapsed = now - self.started
+        index = int(elapsed // period)
+        phase = elapsed - index * period
+        noise = self.random.gauss(0, self.noise)
+        if phase < self.empty:
+            return noise, True
+
+        target = self._target(index)
+        placed_at = self.started + index * period + self.empty
+        if not self.events or self.events[-1][1] != placed_at:
+            self.events.append((target, placed_at, placed_at + self.settle))
+        since = phase - self.empty
+        if since < self.settle:
+            # Damped oscillation of the load cell after the item lands
+            ring = target * 0.25 * (1 - since / self.settle) ** 2
+            return target + ring * (1 if int(since * 12) % 2 else -1) + noise, False
+        return target + noise, True
+
+    @staticmethod
+    def format(grams, settled):
+        return f"{'ST' if settled else 'US'},GS,{grams:+09.1f}  g\r\n"
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve the stream on a TCP port until interrupted"""
+        simulator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                interval = 1.0 / simulator.rate
+                next_at = time.monotonic()
+                try:
+                    while True:
+                        grams, settled = simulator.value(time.time())
+                        self.request.sendall(simulator.format(grams, settled).encode('ascii'))
+                        next_at += interval
+                        time.sleep(max(0.0, next_at - time.monotonic()))
+                except OSError:
+                    pass
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        return server
+
+
+# Global scale reader instance (None when no scale is configured)
+scale_reader = None
+
+
+def initialize_scale_reader(url, shared_path, window=STABLE_SECONDS, tolerance=STABLE_TOLERANCE_GRAMS):
+    """Create the global scale reader and start its thread"""
+    global scale_reader
+    try:
+        scale_reader = ScaleReader(url, shared_path, window, tolerance)
+        scale_reader.start()
+        return True
+    except Exception as e:
+        print(f"Error initializing scale reader: {str(e)}")
+        return False
+
+
+def get_scale_reader():
+    """Get the global scale reader"""
+    return scale_reader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale reader tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    simulate = commands.add_parser('simulate', help="Serve a simulated scale over TCP")
+    simulate.add_argument('--port', type=int, default=4001)
+    simulate.add_argument('--rate', type=float, default=20.0, help="Readings per second")
+    simulate.add_argument('--weights', help="Comma-separated item weights in grams (default random)")
+    simulate.add_argument('--hold', type=float, default=3.0, help="Seconds an item stays on the scale")
+
+    read = commands.add_parser('read', help="Print stable readings of a scale")
+    read.add_argument('url', help="tcp://host:port or serial:///dev/ttyUSB0?baud=9600")
+
+    args = parser.parse_args()
+    if args.command == 'simulate':
+        weights = [float(value) for value in args.weights.split(',')] if args.weights else None
+        server = Simulator(args.rate, weights, args.hold).serve(args.port)
+        print(f"Simulated scale on tcp://127.0.0.1:{args.port} ({args.rate:g} readings/s)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+        return
+
+    detector = StabilityDetector()
+    connection = open_connection(args.url)
+    last = None
+    try:
+        while True:
+            line = connection.readline()
+            reading = parse_reading(line) if line is not None else None
+            if reading is None:
+                continue
+            stable = detector.add(time.monotonic(), *reading)
+            if stable is not None and stable != last:
+                print(f"{time.strftime('%H:%M:%S')} stable {stable:.1f} g")
+            last = stable
+    except KeyboardInterrupt:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
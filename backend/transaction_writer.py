@@ -0,0 +1,336 @@
+"""
+Transaction Writer Module
+Write-behind queue that group-commits checkout transactions in the background
+"""
+
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from db_pool import PoolTimeout
+
+# Durability levels: answer once the row is queued, or only once it is committed to disk
+DURABILITY_ENQUEUE = 'enqueue'
+DURABILITY_COMMIT = 'commit'
+DURABILITY_LEVELS = (DURABILITY_ENQUEUE, DURABILITY_COMMIT)
+
+# Transaction IDs reserved from the database at a time
+ID_BLOCK_SIZE = 1024
+
+# Seconds between retries of a failed flush of already acknowledged rows
+RETRY_DELAY = 0.5
+# Attempts at writing an acknowledged row before it is moved to the dead-letter file
+MAX_ATTEMPTS = 5
+# Longest a DURABILITY_COMMIT caller waits for its row to be committed (seconds)
+COMMIT_WAIT_TIMEOUT = 30.0
+
+_COLUMNS = ('id', 'product_name', 'weight_g', 'price_per_kg', 'total_price', 'confidence', 'created_at', 'store_id')
+# commit_seq is set here rather than by the insert trigger, which would update every row a second time
+_INSERT_SQL = f'''
+    INSERT INTO transactions ({', '.join(_COLUMNS)}, commit_seq)
+    VALUES ({', '.join('?' * len(_COLUMNS))}, (SELECT COALESCE(MAX(commit_seq), 0) + 1 FROM transactions))
+'''
+
+
+class CommitTimeout(PoolTimeout):
+    """The writer did not commit a row in time (answered with 503 like an exhausted pool); it stays queued"""
+
+
+class _PendingTransaction:
+    """A transaction row waiting in the write-behind queue"""
+
+    __slots__ = ('row', 'done', 'error', 'attempts')
+
+    def __init__(self, row, wait):
+        self.row = row
+        self.done = threading.Event() if wait else None
+        self.error = None
+        self.attempts = 0
+
+
+class TransactionWriter:
+    """
+    Group commit for the transactions table
+
+    Requests put their row on a queue and a background thread writes
+    everything queued with one executemany in one transaction (one fsync)
+    as soon as max_batch_rows rows are waiting or the oldest has waited
+    max_wait_ms. IDs are handed out immediately from blocks reserved in
+    sqlite_sequence, so callers get their transaction_id even when they do
+    not wait for the commit, and several worker processes never collide.
+    Because of that, id order is not commit order: a row can be committed
+    after rows with higher ids from another process or a later batch.
+    Readers that must not miss rows (the export) follow commit_seq, which the
+    INSERT assigns inside the committing transaction, instead of the id.
+
+    If a batch fails, its rows are written one by one so a single bad row
+    does not hold up the others. Acknowledged rows that keep failing are
+    retried MAX_ATTEMPTS times and then appended to a dead-letter file.
+    """
+
+    def __init__(self, pool, max_batch_rows=256, max_wait_ms=2, durability=DURABILITY_COMMIT, dead_letter_path=None):
+        """
+        Initialize the writer
+
+        Args:
+            pool: ConnectionPool of the database
+            max_batch_rows: Maximum number of rows written in one transaction
+            max_wait_ms: Maximum time the first queued row waits for others to join
+            durability: DURABILITY_ENQUEUE (ack after enqueue) or DURABILITY_COMMIT (ack after commit)
+            dead_letter_path: JSON lines file for rows that could not be written (default: next to the database)
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability level '{durability}', expected one of {DURABILITY_LEVELS}")
+
+        self.pool = pool
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self.durability = durability
+        self.dead_letter_path = dead_letter_path or f"{pool.db_path}.dead-letter.jsonl"
+
+        self._queue = queue.Queue()
+        self._thread = None
+        # Checking for a running writer and enqueuing happen together, so no row lands behind the stop sentinel
+        self._state_lock = threading.Lock()
+        self._stopping = False
+        self._id_lock = threading.Lock()
+        self._next_id = 0
+        self._last_id = -1
+
+        # Counters for monitoring
+        self.enqueued = 0
+        self.rows_written = 0
+        self.batches_written = 0
+        self.flush_failures = 0
+        self.dead_lettered = 0
+        self.commit_timeouts = 0
+        self.max_queue_depth = 0
+        self.flush_time = 0.0
+
+    def start(self):
+        """Start the background writer thread"""
+        with self._state_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="transaction-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the background thread after writing everything still queued"""
+        with self._state_lock:
+            thread = self._thread
+            if thread is None or self._stopping:
+                return
+            self._stopping = True
+            self._queue.put(None)
+
+        thread.join()
+        with self._state_lock:
+            self._thread = None
+
+    def submit(self, product_name, weight_g, price_per_kg, total_price, confidence=None, store_id=None):
+        """
+        Queue a transaction
+
+        Returns:
+            Dictionary with success and transaction_id, or error. With
+            DURABILITY_COMMIT it returns only after the row is committed;
+            once the writer is stopping the row is written directly.
+
+        Raises:
+            CommitTimeout: DURABILITY_COMMIT and the row was not committed within COMMIT_WAIT_TIMEOUT
+        """
+        transaction_id = self._allocate_id()
+        # Same format as CURRENT_TIMESTAMP, taken at checkout time rather than at flush time
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        row = (transaction_id, product_name, weight_g, price_per_kg, total_price, confidence, created_at, store_id)
+
+        wait = self.durability == DURABILITY_COMMIT
+        pending = _PendingTransaction(row, wait)
+        with self._state_lock:
+            queued = self._thread is not None and not self._stopping
+            if queued:
+                self._queue.put(pending)
+                self.enqueued += 1
+                self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+        if not queued:
+            try:
+                self._write([pending])
+            except Exception as e:
+                print(f"Error writing transaction: {str(e)}")
+                return {"error": str(e)}
+        elif wait:
+            if not pending.done.wait(COMMIT_WAIT_TIMEOUT):
+                self.commit_timeouts += 1
+                raise CommitTimeout(f"Transaction {transaction_id} was not committed within "
+                                    f"{COMMIT_WAIT_TIMEOUT:g}s; it is still queued and may be written later")
+            if pending.error is not None:
+                return {"error": str(pending.error)}
+
+        return {"success": True, "transaction_id": transaction_id, "durability": self.durability}
+
+    def get_stats(self):
+        """Return queue and flush statistics"""
+        return {
+            "durability": self.durability,
+            "max_batch_rows": self.max_batch_rows,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "enqueued": self.enqueued,
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "mean_batch_rows": round(self.rows_written / self.batches_written, 2) if self.batches_written else 0.0,
+            "mean_flush_ms": round(self.flush_time * 1000.0 / self.batches_written, 3) if self.batches_written else 0.0,
+            "flush_failures": self.flush_failures,
+            "dead_lettered": self.dead_lettered,
+            "commit_timeouts": self.commit_timeouts
+        }
+
+    def _allocate_id(self):
+        """Next transaction ID, reserving a new block from the database when the current one is used up"""
+        with self._id_lock:
+            if self._next_id > self._last_id:
+                self._reserve_ids()
+            transaction_id = self._next_id
+            self._next_id += 1
+            return transaction_id
+
+    def _reserve_ids(self):
+        """
+        Move the AUTOINCREMENT counter forward by ID_BLOCK_SIZE (caller holds _id_lock)
+
+        Other processes and plain INSERTs continue after the reserved block.
+        IDs of a block that is not used up before shutdown are skipped.
+        """
+        with self.pool.transaction() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+            start = max(row[0] if row else 0, max_id) + 1
+            last = start + ID_BLOCK_SIZE - 1
+
+            if row is None:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('transactions', ?)", (last,))
+            else:
+                conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'transactions'", (last,))
+
+        self._next_id = start
+        self._last_id = last
+
+    def _run(self):
+        """Collect queued rows into batches until stopped, then drain the queue"""
+        running = True
+        retry = []
+        while running:
+            first = retry.pop(0) if retry else self._queue.get()
+            if first is None:
+                break
+
+            pending = [first] + retry
+            retry = []
+            deadline = time.monotonic() + self.max_wait
+
+            # Keep collecting until the batch is full or the oldest row times out
+            while len(pending) < self.max_batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                pending.append(item)
+
+            retry = self._flush(pending)
+            if retry:
+                time.sleep(RETRY_DELAY)
+
+        # Drain whatever is still queued (or failed) before the process exits
+        remaining = retry
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                remaining.append(item)
+
+        # No more retries on shutdown: what still fails goes to the dead-letter file
+        for start in range(0, len(remaining), self.max_batch_rows):
+            for item in self._flush(remaining[start:start + self.max_batch_rows]):
+                self._dead_letter(item)
+
+    def _flush(self, pending):
+        """
+        Write pending rows in one transaction, or row by row if that fails
+
+        Returns:
+            Rows that were already acknowledged and must be retried (empty on success)
+        """
+        try:
+            self._write(pending)
+            return []
+        except Exception as e:
+            self.flush_failures += 1
+            print(f"Error writing {len(pending)} transactions: {str(e)}")
+            if len(pending) == 1:
+                return self._failed(pending[0], e)
+
+        # One bad row must not fail or hold up the rest of the batch
+        retry = []
+        for item in pending:
+            try:
+                self._write([item])
+            except Exception as e:
+                retry += self._failed(item, e)
+        return retry
+
+    def _write(self, pending):
+        """Insert rows in one transaction and release callers waiting for the commit"""
+        start = time.perf_counter()
+        with self.pool.transaction() as conn:
+            conn.executemany(_INSERT_SQL, [item.row for item in pending])
+
+        self.flush_time += time.perf_counter() - start
+        self.batches_written += 1
+        self.rows_written += len(pending)
+        for item in pending:
+            if item.done is not None:
+                item.done.set()
+
+    def _failed(self, item, error):
+        """
+        Handle a row that could not be written
+
+        Returns:
+            [item] if it should be retried, else []
+        """
+        item.error = error
+        # The waiting caller gets the error and was never told the row is saved
+        if item.done is not None:
+            item.done.set()
+            return []
+
+        item.attempts += 1
+        if item.attempts < MAX_ATTEMPTS:
+            return [item]
+        self._dead_letter(item)
+        return []
+
+    def _dead_letter(self, item):
+        """Append an acknowledged row that could not be written to the dead-letter file"""
+        self.dead_lettered += 1
+        line = json.dumps({"row": dict(zip(_COLUMNS, item.row)), "error": str(item.error),
+                           "attempts": item.attempts})
+        try:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            print(f"ERROR: transaction {item.row[0]} could not be written, moved to {self.dead_letter_path}")
+        except OSError as e:
+            print(f"ERROR: transaction could not be written or dead-lettered ({str(e)}): {line}")
@@ -0,0 +1,429 @@
+"""
+Vision Weight Module
+Deterministic weight estimate from the camera frame
+
+The item is segmented from the empty-tray background with a per-pixel colour
+test: a pixel is foreground when its chromaticity differs from the calibrated
+background, or when it is much brighter or darker. A pixel that keeps the
+background's chromaticity and is only somewhat darker is treated as a
+shadow, not as the item. The mask area is then mapped to grams per product:
+volume, and so weight, grows with area^1.5. Each curve is anchored so that
+the product's typical area gives the typical weight of the (min, typical,
+max) table, and the result is clamped to [min, max].
+
+Typical areas come from reference weighings (a frame of an item with a known
+weight). A weighed product gets its own curve. Other products share the
+camera scale of all references, i.e. the same density per unit of volume.
+
+Everything is vectorized NumPy on a 160x120 frame, which the JPEG decoder
+produces directly in draft mode, so one estimate takes a few milliseconds
+and the same frame always gives the same weight.
+"""
+
+import contextlib
+import io
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: lock the first byte of the lock file instead of flock
+    fcntl = None
+    import msvcrt
+
+# Working resolution of the mask (every frame and the background are decoded to it)
+FRAME_SIZE = (160, 120)
+
+# Foreground test against the background (chromaticity L1 distance, brightness ratio)
+CHROMA_THRESHOLD = 0.08
+BRIGHTER_RATIO = 1.15
+SHADOW_MIN_RATIO = 0.5
+
+# Below this share of the frame the tray counts as empty
+MIN_AREA_FRACTION = 0.002
+
+# How often calibration written by another worker is picked up (seconds)
+RELOAD_INTERVAL = 1.0
+
+CALIBRATION_FILE = 'calibration.json'
+BACKGROUND_FILE = 'background.npy'
+LOCK_FILE = 'calibration.lock'
+
+
+def decode_frame(image_data, size=FRAME_SIZE):
+    """
+    Decode an image to the working resolution
+
+    JPEGs are decoded in draft mode (DCT scaling down to 1/8), so the decoder
+    never produces the full-size pixels. The result also serves as classifier input.
+
+    Args:
+        image_data: Raw image data (bytes or PIL Image)
+        size: Output (width, height)
+
+    Returns:
+        RGB PIL Image of the given size
+    """
+    if isinstance(image_data, (bytes, bytearray, memoryview)):
+        image = Image.open(io.BytesIO(image_data))
+    else:
+        image = image_data
+    image.draft('RGB', size)
+    image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.size != size:
+        image = image.resize(size, Image.BILINEAR)
+    return image
+
+
+def _opening(mask):
+    """Remove specks and one-pixel bridges (erode, then dilate with a 3x3 cross)"""
+    eroded = mask.copy()
+    eroded[1:, :] &= mask[:-1, :]
+    eroded[:-1, :] &= mask[1:, :]
+    eroded[:, 1:] &= mask[:, :-1]
+    eroded[:, :-1] &= mask[:, 1:]
+    eroded[0, :] = eroded[-1, :] = False
+    eroded[:, 0] = eroded[:, -1] = False
+
+    dilated = eroded.copy()
+    dilated[1:, :] |= eroded[:-1, :]
+    dilated[:-1, :] |= eroded[1:, :]
+    dilated[:, 1:] |= eroded[:, :-1]
+    dilated[:, :-1] |= eroded[:, 1:]
+    return dilated
+
+
+class VisionWeightEstimator:
+    """Estimates weight from the item's area in the frame"""
+
+    def __init__(self, weight_database, calibration_dir):
+        """
+        Args:
+            weight_database: Product name -> (min, typical, max) grams
+            calibration_dir: Directory of the background frame and reference weighings
+        """
+        self.weight_database = weight_database
+        self.calibration_dir = calibration_dir
+        self._lock = threading.Lock()
+
+        # Replaced as a whole, so a request never sees half a calibration
+        self._state = None
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self.load()
+
+    @property
+    def calibrated(self):
+        """Whether a background and at least one reference weighing are known"""
+        self.maybe_reload()
+        state = self._state
+        return state is not None and state["scale"] is not None
+
+    def load(self):
+        """Read the calibration from disk; returns False if there is none"""
+        path = os.path.join(self.calibration_dir, CALIBRATION_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+            with open(path) as f:
+                calibration = json.load(f)
+            background = np.load(os.path.join(self.calibration_dir, BACKGROUND_FILE))
+        except (OSError, ValueError) as e:
+            if os.path.exists(path):
+                print(f"WARNING: Could not read weight calibration: {str(e)}")
+            return False
+
+        self._state = self._build_state(background, calibration.get("references", []),
+                                        calibration.get("background_frames", 1))
+        self._loaded_mtime = mtime
+        return True
+
+    def maybe_reload(self):
+        """Pick up calibration saved by another worker (checks the file at most once per second)"""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(os.path.join(self.calibration_dir, CALIBRATION_FILE))
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            self.load()
+
+    def _build_state(self, background, references, background_frames):
+        background = background.astype(np.float32)
+        brightness = background.sum(axis=2) + 1.0
+
+        # Typical area per product: geometric mean over its reference weighings
+        logs = {}
+        for reference in references:
+            weight_range = self.weight_database.get(reference["product"])
+            if weight_range is None:
+                # Kept on disk, so the reference counts again if the product comes back
+                print(f"WARNING: Skipping weight reference for {reference['product']}: no weight data")
+                continue
+            typical = weight_range[1]
+            # Area the same item would cover at the typical weight (area ~ weight^(2/3))
+            typical_area = reference["area_fraction"] * (typical / reference["weight_grams"]) ** (2.0 / 3.0)
+            logs.setdefault(reference["product"], []).append(math.log(typical_area))
+        typical_areas = {product: math.exp(sum(values) / len(values)) for product, values in logs.items()}
+
+        # Camera scale shared by products without a reference: typical area / typical weight^(2/3)
+        scale = None
+        if typical_areas:
+            scale = math.exp(sum(math.log(area) - 2.0 / 3.0 * math.log(self.weight_database[product][1])
+                                 for product, area in typical_areas.items()) / len(typical_areas))
+
+        return {
+            "background": background,
+            "brightness": brightness,
+            "chroma": background / brightness[:, :, None],
+            "background_frames": background_frames,
+            "references": references,
+            "typical_areas": typical_areas,
+            "scale": scale
+        }
+
+    @contextlib.contextmanager
+    def _calibration_lock(self):
+        """
+        Hold the calibration for a change, across threads and worker processes
+
+        Yields the calibration as saved on disk (reloaded under the lock), so a
+        change made by another worker is never overwritten.
+        """
+        os.makedirs(self.calibration_dir, exist_ok=True)
+        with self._lock, open(os.path.join(self.calibration_dir, LOCK_FILE), 'a+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                self.load()
+                yield self._state
+            finally:
+                if fcntl is None:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _save(self, background, references, background_frames):
+        os.makedirs(self.calibration_dir, exist_ok=True)
+        temporary = os.path.join(self.calibration_dir, f"{BACKGROUND_FILE}.tmp.npy")
+        np.save(temporary, background)
+        os.replace(temporary, os.path.join(self.calibration_dir, BACKGROUND_FILE))
+
+        path = os.path.join(self.calibration_dir, CALIBRATION_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump({"background_frames": background_frames, "references": references}, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+        self._loaded_mtime = os.path.getmtime(path)
+
+    def calibrate_background(self, frames):
+        """
+        Set the empty-tray background (per-pixel median of the frames)
+
+        Args:
+            frames: List of raw images (bytes or PIL Image) of the empty tray
+
+        Returns:
+            Calibration status, or dictionary with error
+        """
+        if not frames:
+            return {"error": "No background frames"}
+        try:
+            stack = np.stack([np.asarray(decode_frame(frame)) for frame in frames])
+        except Exception as e:
+            return {"error": f"Could not decode background frame: {str(e)}"}
+        background = np.median(stack, axis=0).astype(np.uint8)
+
+        with self._calibration_lock() as state:
+            # Reference areas were measured against the old background; they stay valid for the same camera
+            references = state["references"] if state is not None else []
+            self._save(background, references, len(frames))
+            self._state = self._build_state(background, references, len(frames))
+
+        print(f"✓ Weight calibration: background from {len(frames)} frame(s)")
+        return self.get_status()
+
+    def add_reference(self, image_data, product_name, weight_grams):
+        """
+        Record a reference weighing: a frame of one item and its true weight
+
+        Args:
+            image_data: Raw image (bytes or PIL Image)
+            product_name: Product on the tray
+            weight_grams: Weight measured on a real scale
+
+        Returns:
+            The measured reference, or dictionary with error
+        """
+        if product_name not in self.weight_database:
+            return {"error": f"No weight data for {product_name}"}
+        if not weight_grams > 0:
+            return {"error": "weight_grams must be positive"}
+
+        with self._calibration_lock() as state:
+            if state is None:
+                return {"error": "Calibrate the empty-tray background first"}
+            try:
+                mask = self.segment(np.asarray(decode_frame(image_data)), state)
+            except Exception as e:
+                return {"error": f"Could not decode frame: {str(e)}"}
+
+            area_fraction = float(mask.mean())
+            if area_fraction < MIN_AREA_FRACTION:
+                return {"error": "No item found on the tray"}
+
+            reference = {"product": product_name, "weight_grams": float(weight_grams),
+                         "area_fraction": round(area_fraction, 6)}
+            references = state["references"] + [reference]
+            self._save(state["background"].astype(np.uint8), references, state["background_frames"])
+            self._state = self._build_state(state["background"], references, state["background_frames"])
+
+        print(f"✓ Weight calibration: reference {product_name} {weight_grams:g} g "
+              f"({area_fraction * 100:.2f}% of the frame)")
+        return reference
+
+    def clear_references(self):
+        """Forget all reference weighings (keeps the background)"""
+        with self._calibration_lock() as state:
+            if state is None:
+                return self.get_status()
+            self._save(state["background"].astype(np.uint8), [], state["background_frames"])
+            self._state = self._build_state(state["background"], [], state["background_frames"])
+        return self.get_status()
+
+    @staticmethod
+    def segment(frame, state):
+        """
+        Foreground mask of an RGB frame
+
+        Args:
+            frame: uint8 array of shape (height, width, 3) at the background's resolution
+            state: Calibration state
+
+        Returns:
+            Boolean array of shape (height, width)
+        """
+        pixels = frame.astype(np.float32)
+        brightness = pixels.sum(axis=2) + 1.0
+        chroma_distance = np.abs(pixels / brightness[:, :, None] - state["chroma"]).sum(axis=2)
+        ratio = brightness / state["brightness"]
+
+        mask = chroma_distance > CHROMA_THRESHOLD
+        mask |= ratio > BRIGHTER_RATIO
+        mask |= ratio < SHADOW_MIN_RATIO
+        return _opening(mask)
+
+    def curve(self, product_name):
+        """
+        Area-to-weight curve parameters of a product
+
+        Returns:
+            Tuple (typical area fraction, min, typical, max grams), or None without data
+        """
+        state = self._state
+        weight_range = self.weight_database.get(product_name)
+        if state is None or state["scale"] is None or weight_range is None:
+            return None
+        typical_area = state["typical_areas"].get(product_name)
+        if typical_area is None:
+            typical_area = state["scale"] * weight_range[1] ** (2.0 / 3.0)
+        return (typical_area,) + tuple(weight_range)
+
+    def estimate(self, frame, product_name):
+        """
+        Estimate the weight of the item in a frame (same result format as WeightEstimator.estimate_weight)
+
+        Args:
+            frame: RGB PIL Image or uint8 array at FRAME_SIZE (see decode_frame)
+            product_name: Classified product
+
+        Returns:
+            Weight dictionary, or None when uncalibrated, the product is unknown or the tray is empty
+        """
+        self.maybe_reload()
+        state = self._state
+        curve = self.curve(product_name)
+        if curve is None:
+            return None
+
+        pixels = np.asarray(frame)
+        if pixels.shape != state["background"].shape:
+            return None
+        mask = self.segment(pixels, state)
+        area_fraction = float(mask.mean())
+        if area_fraction < MIN_AREA_FRACTION:
+            return None
+
+        typical_area, min_weight, typical_weight, max_weight = curve
+        estimated_weight = typical_weight * (area_fraction / typical_area) ** 1.5
+
+        confidence = "high"
+        note = "Estimated from the item's area in the frame"
+        if estimated_weight < min_weight or estimated_weight > max_weight:
+            estimated_weight = min(max(estimated_weight, min_weight), max_weight)
+            confidence = "medium"
+            note = "Item size outside the usual range, weight clamped"
+        # An item cut by the frame edge is larger than it looks
+        if mask[0, :].any() or mask[-1, :].any() or mask[:, 0].any() or mask[:, -1].any():
+            confidence = "low"
+            note = "Item touches the frame edge, weight may be underestimated"
+
+        return {
+            "weight_grams": round(estimated_weight, 1),
+            "weight_kg": round(estimated_weight / 1000, 3),
+            "min_weight": min_weight,
+            "max_weight": max_weight,
+            "typical_weight": typical_weight,
+            "confidence": confidence,
+            "note": note,
+            "method": "vision",
+            "area_fraction": round(area_fraction, 5)
+        }
+
+    def get_status(self):
+        """Calibration summary"""
+        self.maybe_reload()
+        state = self._state
+        if state is None:
+            return {"calibrated": False, "background": False, "references": []}
+        return {
+            "calibrated": state["scale"] is not None,
+            "background": True,
+            "background_frames": state["background_frames"],
+            "frame_size": list(FRAME_SIZE),
+            "references": state["references"],
+            "products_with_reference": sorted(state["typical_areas"]),
+            "scale": state["scale"]
+        }
+
+
+# Global vision weight estimator instance
+vision_weight = None
+
+
+def initialize_vision_weight(weight_database, calibration_dir):
+    """Initialize the global vision weight estimator"""
+    global vision_weight
+    try:
+        vision_weight = VisionWeightEstimator(weight_database, calibration_dir)
+        return True
+    except Exception as e:
+        print(f"Error initializing vision weight estimator: {str(e)}")
+        return False
+
+
+def get_vision_weight():
+    """Get the global vision weight estimator"""
+    return vision_weight
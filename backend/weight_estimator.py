@@ -6,6 +6,52 @@ Uses rule-based approach with average weights per category
 
 import random
 
+# Estimate used for products without a weight range
+GENERIC_WEIGHT_GRAMS = 150
+
+
+def estimate_from_range(fruit_name, weight_range, variation_factor=0.15):
+    """
+    Estimate the weight of one item from its weight range
+
+    Shared by WeightEstimator and the inference plan, so both give the same estimate.
+
+    Args:
+        fruit_name: Name of the fruit/vegetable
+        weight_range: (min_weight, typical_weight, max_weight) in grams, or None if unknown
+        variation_factor: Random variation factor (default 15%)
+
+    Returns:
+        Dictionary with estimated weight in grams
+    """
+    if weight_range is None:
+        # If not found, return a generic estimate
+        return {
+            "weight_grams": GENERIC_WEIGHT_GRAMS,
+            "weight_kg": GENERIC_WEIGHT_GRAMS / 1000,
+            "confidence": "low",
+            "note": f"No specific data for {fruit_name}, using generic estimate"
+        }
+
+    min_weight, typical_weight, max_weight = weight_range
+
+    # Add some random variation around typical weight (more realistic)
+    variation = random.uniform(-variation_factor, variation_factor)
+    estimated_weight = typical_weight * (1 + variation)
+
+    # Clamp to min/max range
+    estimated_weight = max(min_weight, min(estimated_weight, max_weight))
+
+    return {
+        "weight_grams": round(estimated_weight, 1),
+        "weight_kg": round(estimated_weight / 1000, 3),
+        "min_weight": min_weight,
+        "max_weight": max_weight,
+        "typical_weight": typical_weight,
+        "confidence": "medium",
+        "note": f"Estimated based on typical {fruit_name} weight"
+    }
+
 
 class WeightEstimator:
     """Estimates weight of fruits and vegetables"""
@@ -172,34 +218,7 @@ class WeightEstimator:
             Dictionary with estimated weight in grams
         """
         try:
-            # Get weight range from database
-            if fruit_name not in self.weight_database:
-                # If not found, return a generic estimate
-                return {
-                    "weight_grams": 150,
-                    "weight_kg": 0.15,
-                    "confidence": "low",
-                    "note": f"No specific data for {fruit_name}, using generic estimate"
-                }
-
-            min_weight, typical_weight, max_weight = self.weight_database[fruit_name]
-
-            # Add some random variation around typical weight (more realistic)
-            variation = random.uniform(-variation_factor, variation_factor)
-            estimated_weight = typical_weight * (1 + variation)
-
-            # Clamp to min/max range
-            estimated_weight = max(min_weight, min(estimated_weight, max_weight))
-
-            return {
-                "weight_grams": round(estimated_weight, 1),
-                "weight_kg": round(estimated_weight / 1000, 3),
-                "min_weight": min_weight,
-                "max_weight": max_weight,
-                "typical_weight": typical_weight,
-                "confidence": "medium",
-                "note": f"Estimated based on typical {fruit_name} weight"
-            }
+            return estimate_from_range(fruit_name, self.weight_database.get(fruit_name), variation_factor)
 
         except Exception as e:
             return {
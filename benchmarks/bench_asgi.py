@@ -0,0 +1,86 @@
+"""
+ASGI vs Gunicorn Load Test
+Runs the same closed-loop /api/predict load against the gunicorn sync config
+and the uvicorn ASGI entry point with the same number of worker processes
+
+Usage:
+    python benchmarks/bench_asgi.py [--workers 2] [--concurrency 32] [--duration 20]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_preprocess import synthetic_frame  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+from loadgen import run_closed_loop  # noqa: E402
+
+
+def wait_until_ready(port, workers, timeout=300):
+    """Poll /api/health until enough consecutive answers report a ready model"""
+    deadline = time.perf_counter() + timeout
+    ready_answers = 0
+    while time.perf_counter() < deadline and ready_answers < workers * 4:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=5) as response:
+                ready_answers = ready_answers + 1 if json.load(response).get('state') == 'ready' else 0
+        except OSError:
+            ready_answers = 0
+        time.sleep(0.1)
+    return ready_answers >= workers * 4
+
+
+def server_command(kind, port, workers):
+    """Command line for one of the two servers"""
+    if kind == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--no-access-log']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gunicorn and ASGI serving under load")
+    parser.add_argument('--workers', type=int, default=2, help="Worker processes for both servers")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    frame = synthetic_frame(1280, 720)
+    counter = iter(range(10 ** 9))
+
+    def make_request():
+        # A unique trailing byte keeps the prediction cache from answering
+        body = frame + next(counter).to_bytes(8, 'big')
+        return 'POST', '/api/predict', body, {'Content-Type': 'image/jpeg'}
+
+    print(f"\n{args.workers} workers, {args.concurrency} clients, {args.duration:.0f}s\n")
+    print(f"{'server':<10}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    for kind in ('gunicorn', 'uvicorn'):
+        port = free_port()
+        env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(args.workers), PREDICTION_CACHE_SIZE='0',
+                   DB_PATH=os.path.join(tempfile.mkdtemp(), 'products.db'))
+        server = subprocess.Popen(server_command(kind, port, args.workers), cwd=BACKEND_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_until_ready(port, args.workers):
+                print(f"{kind:<10} did not become ready")
+                continue
+            stats = run_closed_loop('127.0.0.1', port, make_request, args.concurrency, args.duration)
+            print(f"{kind:<10}{stats['throughput']:>9.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                  f"{stats['p99_ms']:>10.1f}  {stats['statuses']}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Micro-batching Benchmark
+Measures predictions/sec of FruitClassifier for different batch sizes and wait times
+
+Usage:
+    python benchmarks/bench_batching.py [--clients 16] [--duration 5]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from model_loader import FruitClassifier  # noqa: E402
+
+
+def run_clients(score_fn, clients, duration):
+    """Hammer score_fn from several threads and return predictions/sec"""
+    image = np.random.rand(1, 32, 32, 3).astype('float32')
+    counts = [0] * clients
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        while time.perf_counter() < stop_at:
+            score_fn(image)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return sum(counts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched inference")
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'fruit_classifier_model.h5'))
+    parser.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    parser.add_argument('--clients', type=int, default=16, help="Concurrent request threads")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per configuration")
+    parser.add_argument('--batch-sizes', default='1,4,8,16,32')
+    parser.add_argument('--wait-ms', default='1,5,10')
+    args = parser.parse_args()
+
+    classifier = FruitClassifier(args.model, args.labels)
+    if not classifier.load_model():
+        sys.exit(1)
+
+    # Warm up the model before timing anything
+    classifier.run_model(np.zeros((1, 32, 32, 3), dtype='float32'))
+
+    print(f"\n{args.clients} client threads, {args.duration:.0f}s per configuration\n")
+    baseline = run_clients(classifier.run_model, args.clients, args.duration)
+    print(f"{'no batching':<28}{baseline:>10.1f} pred/s")
+
+    for wait_ms in [float(w) for w in args.wait_ms.split(',')]:
+        for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+            classifier.enable_batching(batch_size, wait_ms)
+            throughput = run_clients(classifier.batcher.submit, args.clients, args.duration)
+            stats = classifier.batcher.get_stats()
+            classifier.disable_batching()
+
+            label = f"batch={batch_size} wait={wait_ms:g}ms"
+            print(f"{label:<28}{throughput:>10.1f} pred/s  "
+                  f"x{throughput / baseline:.2f}  (mean batch {stats['mean_batch_size']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Database Concurrency Stress Test
+Many writer threads (optionally in several processes, like gunicorn workers) record
+transactions at the same time. Reports transactions/sec and errors for the old single
+shared connection (rollback journal, commit per insert) and the WAL connection pool.
+
+Usage:
+    python benchmarks/bench_db_concurrency.py [--writers 8] [--processes 2] [--duration 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from database import ProductDatabase  # noqa: E402
+
+
+class LegacyDatabase:
+    """The previous add_transaction: one shared connection, rollback journal, commit per insert"""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+
+    def add_transaction(self, product_name, weight_g, price_per_kg, total_price, confidence=None):
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                INSERT INTO transactions (product_name, weight_g, price_per_kg, total_price, confidence)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (product_name, weight_g, price_per_kg, total_price, confidence))
+
+            self.conn.commit()
+            return {"success": True, "transaction_id": cursor.lastrowid}
+
+        except Exception as e:
+            return {"error": str(e)}
+
+
+def open_database(mode, db_path, pool_size):
+    """Database object for one process"""
+    if mode == 'legacy':
+        return LegacyDatabase(db_path)
+
+    db = ProductDatabase(db_path, pool_size=pool_size)
+    db.connect()
+    return db
+
+
+def run_writers(mode, db_path, writers, duration, pool_size, results):
+    """Run `writers` threads against one database object and put (ok, errors, lock_errors) on results"""
+    db = open_database(mode, db_path, pool_size)
+    ok = [0] * writers
+    errors = [0] * writers
+    lock_errors = [0] * writers
+    stop_at = time.perf_counter() + duration
+
+    def writer(index):
+        while time.perf_counter() < stop_at:
+            result = db.add_transaction("Apple Red 1", 180.0, 5.5, 0.99, 0.93)
+            if "error" in result:
+                errors[index] += 1
+                if "locked" in result["error"]:
+                    lock_errors[index] += 1
+            else:
+                ok[index] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results.put((sum(ok), sum(errors), sum(lock_errors)))
+
+
+def run_mode(mode, writers, processes, duration, pool_size):
+    """Stress one implementation on a fresh database; returns (tx/sec, errors, lock errors)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'stress.db')
+
+        # Schema is created once, in the journal mode under test
+        setup = ProductDatabase(db_path, pool_size=1)
+        setup.connect()
+        setup.initialize_schema()
+        setup.close()
+        if mode == 'legacy':
+            conn = sqlite3.connect(db_path)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+
+        context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+        results = context.Queue()
+        workers = [context.Process(target=run_writers, args=(mode, db_path, writers, duration, pool_size, results))
+                   for _ in range(processes)]
+
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        totals = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        ok = sum(t[0] for t in totals)
+        conn = sqlite3.connect(db_path)
+        stored = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        conn.close()
+        if stored != ok:
+            print(f"WARNING: {mode}: {ok} acknowledged but {stored} rows stored")
+
+        return ok / elapsed, sum(t[1] for t in totals), sum(t[2] for t in totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent transaction writes")
+    parser.add_argument('--writers', type=int, default=8, help="Writer threads per process")
+    parser.add_argument('--processes', type=int, default=2, help="Processes (gunicorn workers)")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per implementation")
+    parser.add_argument('--pool-size', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"\n{args.processes} process(es) x {args.writers} writer threads, {args.duration:.0f}s each\n")
+    print(f"{'':<22}{'tx/sec':>10}{'errors':>10}{'locked':>10}")
+    for mode in ('legacy', 'pool'):
+        throughput, errors, lock_errors = run_mode(mode, args.writers, args.processes, args.duration, args.pool_size)
+        label = 'shared connection' if mode == 'legacy' else 'WAL pool'
+        print(f"{label:<22}{throughput:>10.1f}{errors:>10}{lock_errors:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Transaction Export Benchmark
+Exports a large synthetic transactions table in every format and reports
+rows/sec and the peak RSS of the exporting process, next to the old approach
+of loading everything into a list of dicts and serializing one JSON blob.
+
+Usage:
+    python benchmarks/bench_export.py [--rows 5000000] [--legacy-rows 1000000] [--dir /data]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, 'benchmarks'))
+
+from bench_transactions_query import generate  # noqa: E402
+from database import ProductDatabase  # noqa: E402
+from export_transactions import parquet_available  # noqa: E402
+
+# The previous way of pulling the whole table for the accounting sync: the old
+# get_recent_transactions query with a huge limit, then one JSON body
+LEGACY_EXPORT = '''
+import json, sqlite3, sys
+conn = sqlite3.connect(sys.argv[1])
+conn.row_factory = sqlite3.Row
+rows = conn.execute("SELECT * FROM transactions ORDER BY created_at DESC LIMIT ?", (int(sys.argv[2]),)).fetchall()
+transactions = [dict(row) for row in rows]
+body = json.dumps({"transactions": transactions, "count": len(transactions)})
+'''
+
+
+def run_child(args):
+    """Run a Python child process in backend/; returns (seconds, peak RSS in MB)"""
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable] + args, cwd=BACKEND_DIR,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(child.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status != 0:
+        raise RuntimeError(f"Child process failed: {args}")
+    return elapsed, usage.ru_maxrss / 1024.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming transaction export")
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=1_000_000,
+                        help="Rows for the old list-of-dicts export (it needs several GB at 5M)")
+    parser.add_argument('--dir', help="Directory for the test database (default: system temp dir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db_path = os.path.join(tmp, 'export.db')
+        db = ProductDatabase(db_path, pool_size=1)
+        db.connect()
+        print(f"Generating {args.rows:,} transactions...")
+        generate(db, args.rows)
+        # Same schema as a live database (indexes, rollups, store_id column)
+        db.initialize_schema()
+        db.close()
+
+        formats = ['csv', 'ndjson'] + (['parquet'] if parquet_available() else [])
+        print(f"\n{'':<30}{'rows':>12}{'rows/sec':>12}{'peak RSS MB':>14}{'output MB':>12}")
+
+        for export_format in formats:
+            output = os.path.join(tmp, f'export.{export_format}')
+            elapsed, rss = run_child(['export_transactions.py', '--db', db_path, '--format', export_format,
+                                      '--output', output])
+            size = os.path.getsize(output) / 1e6
+            os.remove(output)
+            print(f"{'stream ' + export_format:<30}{args.rows:>12,}{args.rows / elapsed:>12,.0f}{rss:>14.1f}{size:>12.1f}")
+
+        legacy_rows = min(args.legacy_rows, args.rows)
+        elapsed, rss = run_child(['-c', LEGACY_EXPORT, db_path, str(legacy_rows)])
+        print(f"{'old query + json':<30}{legacy_rows:>12,}{legacy_rows / elapsed:>12,.0f}{rss:>14.1f}")
+
+        if not parquet_available():
+            print("\n(parquet skipped: pyarrow is not installed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Gunicorn Preload Benchmark
+Compares memory per worker and first-request latency with and without preload_app
+
+Usage:
+    python benchmarks/bench_gunicorn.py [--workers 2]
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_startup import build_request, free_port, sample_jpeg  # noqa: E402
+
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+
+
+def read_memory_kb(pid):
+    """Return (rss, pss) of a process in kB from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1])
+    return values.get('Rss:', 0), values.get('Pss:', 0)
+
+
+def child_pids(pid):
+    """PIDs of the direct children of a process"""
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_for_port(port, timeout):
+    """Block until something accepts connections on the port"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.02)
+    return False
+
+
+def run(preload, workers, image, settle):
+    """Start gunicorn and return (first predict latency s, [(rss, pss) per worker])"""
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD='1' if preload else '0',
+               DB_PATH=os.path.join(tempfile.mkdtemp(), 'products.db'))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app'],
+                              cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port, 300):
+            raise RuntimeError("gunicorn did not start")
+
+        # First customer: the request is sent as soon as the port accepts connections
+        start = time.perf_counter()
+        url = f'http://127.0.0.1:{port}/api/predict'
+        with urllib.request.urlopen(build_request('POST', url, image), timeout=300) as response:
+            response.read()
+        first_request = time.perf_counter() - start
+
+        # Let every worker finish loading before reading memory
+        time.sleep(settle)
+        memory = [read_memory_kb(pid) for pid in child_pids(server.pid)]
+        return first_request, memory
+
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gunicorn preload_app")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--settle', type=float, default=10.0, help="Seconds to wait before reading memory")
+    args = parser.parse_args()
+
+    image = sample_jpeg()
+
+    print(f"\n{'mode':<12}{'first predict (s)':>20}{'RSS/worker (MB)':>18}{'PSS/worker (MB)':>18}")
+    for preload in (False, True):
+        first_request, memory = run(preload, args.workers, image, args.settle)
+        rss = sum(m[0] for m in memory) / len(memory) / 1024.0
+        pss = sum(m[1] for m in memory) / len(memory) / 1024.0
+        mode = 'preload' if preload else 'no preload'
+        print(f"{mode:<12}{first_request:>20.2f}{rss:>18.1f}{pss:>18.1f}")
+
+    print("\nPSS splits shared pages between processes, so it shows the copy-on-write savings.")
+
+
+if __name__ == '__main__':
+    main()
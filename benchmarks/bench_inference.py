@@ -0,0 +1,64 @@
+"""
+Inference Path Benchmark
+Compares per-call latency of the classifier's inference modes and checks they agree
+
+Usage:
+    python benchmarks/bench_inference.py [--calls 200] [--batch-size 1]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from model_loader import FruitClassifier, INFERENCE_MODES  # noqa: E402
+
+
+def time_calls(run_model, batch, calls):
+    """Return per-call latencies in milliseconds"""
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        run_model(batch)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classifier inference paths")
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'fruit_classifier_model.h5'))
+    parser.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=1)
+    args = parser.parse_args()
+
+    batch = np.random.rand(args.batch_size, 32, 32, 3).astype('float32')
+    reference = None
+
+    print(f"\n{'mode':<12}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max |diff|':>14}{'top-1 ok':>10}")
+    # Model.predict is today's path, so it is the reference for agreement
+    for mode in ["predict"] + [m for m in INFERENCE_MODES if m != "predict"]:
+        classifier = FruitClassifier(args.model, args.labels, inference_mode=mode)
+        if not classifier.load_model():
+            sys.exit(1)
+
+        # Warm up (first call traces / builds the graph)
+        probabilities = classifier.run_model(batch)
+        latencies = time_calls(classifier.run_model, batch, args.calls)
+
+        if reference is None:
+            reference = probabilities
+        max_diff = float(np.max(np.abs(probabilities - reference)))
+        same_top1 = bool(np.all(np.argmax(probabilities, axis=1) == np.argmax(reference, axis=1)))
+
+        print(f"{mode:<12}{latencies.mean():>10.3f}{np.percentile(latencies, 50):>10.3f}"
+              f"{np.percentile(latencies, 99):>10.3f}{max_diff:>14.2e}{str(same_top1):>10}")
+
+
+if __name__ == '__main__':
+    main()
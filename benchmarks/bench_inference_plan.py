@@ -0,0 +1,95 @@
+"""
+Inference Plan Benchmark
+Times the step after the model: turning a classifier result into weight and
+price, through the old string-keyed lookups (weight dictionary + catalog by
+name) and through the compiled per-class_id plan, for the base catalog and a
+store with price overrides. Also reports the plan compile time.
+
+Usage:
+    python benchmarks/bench_inference_plan.py [--calls 100000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from database import ProductDatabase  # noqa: E402
+from inference_plan import InferencePlan, load_plan_labels  # noqa: E402
+from price_import import PriceEntry  # noqa: E402
+from weight_estimator import WeightEstimator  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark argmax -> priced result")
+    parser.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    parser.add_argument('--calls', type=int, default=100_000)
+    args = parser.parse_args()
+
+    labels = load_plan_labels(args.labels)
+    estimator = WeightEstimator()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ProductDatabase(os.path.join(tmp, 'plan.db'), pool_size=1)
+        db.connect()
+        db.initialize_schema()
+        db.populate_default_products()
+        db.refresh_catalog()
+        # One store overriding every product it can
+        db.import_price_list([PriceEntry(0, name, 9.99, store='store-1') for name in db.catalog.by_name
+                              if name in labels], set(labels))
+        catalog = db.get_catalog()
+
+        start = time.perf_counter()
+        for _ in range(100):
+            plan = InferencePlan(labels, estimator.weight_database, catalog)
+        compile_ms = (time.perf_counter() - start) * 10.0
+        plan.prices('store-1')
+
+        # Argmax results spread over every class, including those without weight or price
+        class_ids = np.random.default_rng(0).integers(0, len(labels), args.calls).tolist()
+
+        def old_path(class_id, store_id):
+            label = labels[class_id]
+            weight = estimator.estimate_weight(label)
+            return db.calculate_price(label, weight['weight_grams'], store_id)
+
+        def plan_path(class_id, store_id):
+            weight = plan.estimate_weight(class_id)
+            return plan.calculate_price(class_id, weight['weight_grams'], store_id)
+
+        # Both paths must give the same prices (weights are random, so compare per-kg prices)
+        for class_id in range(len(labels)):
+            for store_id in (None, 'store-1'):
+                old = db.calculate_price(labels[class_id], 100, store_id)
+                new = plan.calculate_price(class_id, 100, store_id)
+                assert old == new, (labels[class_id], store_id, old, new)
+
+        print(f"\n{len(labels)} classes, plan compiled in {compile_ms:.3f} ms")
+        report = plan.validation_report()
+        print(f"missing weight: {len(report['missing_weight'])}, missing price: {len(report['missing_price'])}\n")
+        print(f"{'':<28}{'us/result':>10}")
+
+        for label, fn, store_id in [("old lookups, base", old_path, None), ("plan, base", plan_path, None),
+                                    ("old lookups, store", old_path, 'store-1'),
+                                    ("plan, store", plan_path, 'store-1')]:
+            # Best of 5 runs, the machine is shared
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                for class_id in class_ids:
+                    fn(class_id, store_id)
+                timings.append(time.perf_counter() - start)
+            print(f"{label:<28}{min(timings) / args.calls * 1e6:>10.2f}")
+
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
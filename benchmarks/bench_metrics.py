@@ -0,0 +1,102 @@
+"""
+Metrics Overhead Benchmark
+Measures what the request metrics cost: the raw price of a stage span and of
+the request hooks, then /api/predict and /api/calculate_price end to end with
+metrics switched on and off in alternating rounds (best round of each). On a
+busy machine the on/off difference is within noise, so the overhead is also
+estimated from the span and hook cost times the spans each route records.
+Also reports how long rendering /metrics takes.
+
+Usage:
+    python benchmarks/bench_metrics.py [--requests 200] [--rounds 7]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every request must reach the model, so the prediction cache is switched off
+os.environ['PREDICTION_CACHE_SIZE'] = '0'
+os.environ['MODEL_LOAD_BACKGROUND'] = '0'
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(), 'products.db'))
+
+import app as scale_app  # noqa: E402
+from bench_preprocess import synthetic_frame  # noqa: E402
+from metrics import Metrics, get_metrics  # noqa: E402
+
+
+def per_call_us(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request metrics overhead")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per round")
+    parser.add_argument('--rounds', type=int, default=7, help="Alternating on/off rounds")
+    args = parser.parse_args()
+
+    if not scale_app.wait_for_model():
+        print("ERROR: Model failed to load")
+        sys.exit(1)
+    client = scale_app.app.test_client()
+
+    standalone = Metrics()
+
+    def span():
+        with standalone.stage('preprocess'):
+            pass
+
+    def request_hooks():
+        standalone.request_started('/api/predict')
+        standalone.request_finished('/api/predict', 'POST', 200, 0.004)
+
+    span_us = per_call_us(span, 200_000)
+    hooks_us = per_call_us(request_hooks, 200_000)
+    print(f"\n{'':<30}{'us/call':>10}")
+    print(f"{'stage span':<30}{span_us:>10.2f}")
+    print(f"{'request start + finish':<30}{hooks_us:>10.2f}")
+
+    jpeg = synthetic_frame(640, 480)
+    # (name, request, stage spans it records)
+    endpoints = [
+        ('/api/predict (640x480)', lambda: client.post('/api/predict', data=jpeg, content_type='image/jpeg'), 6),
+        ('/api/calculate_price', lambda: client.post('/api/calculate_price',
+                                                     json={'product_name': 'Apple Braeburn', 'weight_grams': 250}), 1),
+    ]
+
+    metrics = get_metrics()
+    print(f"\n{args.rounds} alternating rounds of {args.requests} requests, best round\n")
+    print(f"{'endpoint':<26}{'off ms':>10}{'on ms':>10}{'measured':>10}{'estimated':>11}")
+    for name, call, spans in endpoints:
+        for _ in range(20):
+            assert call().status_code == 200
+        best = {False: float('inf'), True: float('inf')}
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                metrics.enabled = enabled
+                start = time.perf_counter()
+                for _ in range(args.requests):
+                    call()
+                best[enabled] = min(best[enabled], (time.perf_counter() - start) / args.requests)
+        metrics.enabled = True
+        overhead = (best[True] - best[False]) / best[False] * 100.0
+        estimated = (hooks_us + spans * span_us) / (best[False] * 1e6) * 100.0
+        print(f"{name:<26}{best[False] * 1000:>10.3f}{best[True] * 1000:>10.3f}{overhead:>9.2f}%{estimated:>10.2f}%")
+
+    start = time.perf_counter()
+    text = metrics.render()
+    render_ms = (time.perf_counter() - start) * 1000.0
+    print(f"\n/metrics render: {render_ms:.2f} ms, {len(text.splitlines())} lines")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Model Hot-Swap Benchmark
+Registers the model twice (versions v1 and v2) in a temporary registry and
+keeps client threads predicting while the versions are swapped back and
+forth. Reports failed requests, latency before and during the swaps, RSS
+after each swap and whether the retired model was freed.
+
+Usage:
+    python benchmarks/bench_model_swap.py [--clients 4] [--swaps 4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from model_loader import acquire_classifier, get_classifier, initialize_classifier  # noqa: E402
+from model_registry import ModelManager, ModelRegistry  # noqa: E402
+
+
+def rss_mb():
+    """Resident set size of this process"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def jpeg(seed):
+    image = Image.fromarray(np.random.default_rng(seed).integers(0, 255, (240, 320, 3), dtype=np.uint8))
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zero-downtime model swaps")
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'fruit_classifier_model.h5'))
+    parser.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    parser.add_argument('--clients', type=int, default=4, help="Threads predicting during the swaps")
+    parser.add_argument('--swaps', type=int, default=4)
+    parser.add_argument('--settle', type=float, default=3.0, help="Seconds of traffic between swaps")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(tmp, args.model, args.labels)
+        registry.add('v1', args.model, args.labels)
+        registry.add('v2', args.model, args.labels)
+        model_path, labels_path = registry.resolve('v1')
+        if not initialize_classifier(model_path, labels_path, version='v1'):
+            sys.exit(1)
+        get_classifier().warm_up()
+        manager = ModelManager(registry)
+
+        images = [jpeg(seed) for seed in range(8)]
+        latencies = []  # (finished at, seconds)
+        errors = [0]
+        stop = threading.Event()
+
+        def client(index):
+            i = index
+            while not stop.is_set():
+                start = time.perf_counter()
+                # Same access pattern as the request handlers: hold the global classifier per request
+                with acquire_classifier() as classifier:
+                    result = classifier.predict(images[i % len(images)], top_k=5)
+                end = time.perf_counter()
+                if "error" in result:
+                    errors[0] += 1
+                latencies.append((end, end - start))
+                i += 1
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+
+        time.sleep(args.settle)
+        steady_until = time.perf_counter()
+        print(f"\n{args.clients} client threads, RSS before swaps {rss_mb():.0f} MB\n")
+        print(f"{'swap':<14}{'load s':>8}{'old freed':>11}{'RSS MB':>9}")
+
+        windows = []
+        for n in range(args.swaps):
+            version = 'v2' if n % 2 == 0 else 'v1'
+            started = time.perf_counter()
+            manager.activate(version)
+            # Wait for the swap and the retirement of the previous model
+            while len(manager.swaps) <= n or 'previous_freed' not in manager.swaps[-1]:
+                time.sleep(0.05)
+            windows.append((started, time.perf_counter()))
+            swap = manager.swaps[-1]
+            print(f"{swap['previous'] + ' -> ' + version:<14}{swap['load_s']:>8.2f}"
+                  f"{str(swap['previous_freed']):>11}{rss_mb():>9.0f}")
+            time.sleep(args.settle)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    steady = [seconds * 1000 for end, seconds in latencies if end <= steady_until]
+    during = [seconds * 1000 for end, seconds in latencies
+              if any(start <= end <= finish for start, finish in windows)]
+    print(f"\n{len(latencies)} predictions, {errors[0]} failed")
+    print(f"{'':<16}{'count':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    print(f"{'steady':<16}{len(steady):>8}{percentile(steady, 50):>9.1f}{percentile(steady, 99):>9.1f}")
+    print(f"{'during swaps':<16}{len(during):>8}{percentile(during, 50):>9.1f}{percentile(during, 99):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
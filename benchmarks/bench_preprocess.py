@@ -0,0 +1,95 @@
+"""
+Preprocessing Benchmark
+Compares the original full-decode preprocessing with draft-mode batch preprocessing
+on synthetic 1080p and 4K camera frames
+
+Usage:
+    python benchmarks/bench_preprocess.py [--repeats 20] [--batch-size 8]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from model_loader import FruitClassifier  # noqa: E402
+
+FRAME_SIZES = {
+    '1080p': (1920, 1080),
+    '4K': (3840, 2160),
+}
+
+
+def synthetic_frame(width, height, seed=0):
+    """JPEG bytes of a camera-like frame: a round colored object on a textured background"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[...] = [190, 185, 175]
+    frame += rng.normal(0, 6, frame.shape)
+
+    radius = min(width, height) * 0.3
+    inside = (x - width / 2) ** 2 + (y - height / 2) ** 2 < radius ** 2
+    shade = 1.0 - ((x - width / 2) / width)[..., None] * 0.6
+    frame[inside] = ([200, 60, 40] * shade)[inside]
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(frame, 0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def legacy_preprocess(image_data):
+    """The original preprocessing path: full decode, several intermediate arrays"""
+    image = Image.open(io.BytesIO(image_data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.resize((32, 32))
+    img_array = np.array(image)
+    img_array = img_array.astype('float32') / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def time_ms(fn, repeats):
+    """Median wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing")
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=8)
+    args = parser.parse_args()
+
+    classifier = FruitClassifier(None, None)
+    buffer = np.empty((args.batch_size, 32, 32, 3), dtype=np.float32)
+
+    print(f"\n{'frame':<8}{'JPEG KB':>9}{'legacy ms':>12}{'draft ms':>11}{'batch ms/img':>14}"
+          f"{'speedup':>9}{'mean |diff|':>13}")
+    for name, (width, height) in FRAME_SIZES.items():
+        frames = [synthetic_frame(width, height, seed) for seed in range(args.batch_size)]
+
+        legacy = time_ms(lambda: legacy_preprocess(frames[0]), args.repeats)
+        single = time_ms(lambda: classifier.preprocess_image(frames[0]), args.repeats)
+        batched = time_ms(lambda: classifier.preprocess_images(frames, out=buffer), args.repeats) / len(frames)
+
+        # Draft decoding uses DCT scaling, so pixels differ slightly from a full decode
+        diff = float(np.mean(np.abs(legacy_preprocess(frames[0]) - classifier.preprocess_image(frames[0]))))
+
+        print(f"{name:<8}{len(frames[0]) / 1024:>9.0f}{legacy:>12.2f}{single:>11.2f}{batched:>14.2f}"
+              f"{legacy / batched:>8.1f}x{diff:>13.4f}")
+
+
+if __name__ == '__main__':
+    main()
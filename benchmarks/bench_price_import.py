@@ -0,0 +1,109 @@
+"""
+Price List Import Benchmark
+Imports a base price list plus overrides for many stores (10k+ rows), then
+re-imports it with changed prices while reader threads keep pricing products.
+Reports import time and checks that no reader ever saw a half-applied list.
+
+Usage:
+    python benchmarks/bench_price_import.py [--stores 100] [--readers 4]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from database import ProductDatabase  # noqa: E402
+from price_import import load_labels, parse_price_list  # noqa: E402
+
+
+def price_list_csv(labels, stores, generation):
+    """CSV with every label in the base catalog and in each store; prices encode the generation"""
+    lines = ["name,price_per_kg,name_polish,category,store"]
+    for i, label in enumerate(labels):
+        lines.append(f"{label},{10 + i % 50 + generation / 100:.2f},{label} PL,Owoce,")
+    for store in range(stores):
+        for i, label in enumerate(labels):
+            lines.append(f"{label},{20 + (i + store) % 50 + generation / 100:.2f},,,store-{store:04d}")
+    return "\n".join(lines).encode('utf-8')
+
+
+def import_list(db, labels, body):
+    """Parse and import a CSV price list; returns (result, parse ms, rows)"""
+    start = time.perf_counter()
+    entries, errors = parse_price_list(body, 'csv')
+    parse_ms = (time.perf_counter() - start) * 1000.0
+    if errors:
+        raise RuntimeError(errors[:5])
+    return db.import_price_list(entries, labels), parse_ms, len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk price-list import")
+    parser.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    parser.add_argument('--stores', type=int, default=100)
+    parser.add_argument('--readers', type=int, default=4, help="Threads pricing products during the import")
+    args = parser.parse_args()
+
+    label_set = load_labels(args.labels)
+    with open(args.labels) as f:
+        labels = json.load(f)['labels']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ProductDatabase(os.path.join(tmp, 'prices.db'))
+        db.connect()
+        db.initialize_schema()
+        db.populate_default_products()
+        db.refresh_catalog()
+
+        print(f"\n{len(labels)} products x (1 base + {args.stores} stores)\n")
+        print(f"{'':<26}{'rows':>8}{'parse ms':>10}{'import ms':>11}{'added':>8}{'changed':>9}")
+
+        result, parse_ms, rows = import_list(db, label_set, price_list_csv(labels, args.stores, 0))
+        summary = result["summary"]
+        print(f"{'initial import':<26}{rows:>8}{parse_ms:>10.1f}{result['elapsed_ms']:>11.1f}"
+              f"{summary['added']:>8}{summary['changed']:>9}")
+
+        # Readers check that every snapshot they see has all base prices from one generation
+        stop = threading.Event()
+        mixed = [0]
+        checks = [0]
+
+        def reader():
+            while not stop.is_set():
+                catalog = db.get_catalog()
+                generations = {round(product['price_per_kg'] * 100) % 100 for product in catalog.products
+                               if product['name'] in label_set}
+                if len(generations) > 1:
+                    mixed[0] += 1
+                db.calculate_price(labels[checks[0] % len(labels)], 250)
+                checks[0] += 1
+                # Request-like pacing instead of a busy loop that would starve the importer of the GIL
+                time.sleep(0.001)
+
+        threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+
+        for generation in range(1, 6):
+            result, parse_ms, rows = import_list(db, label_set, price_list_csv(labels, args.stores, generation))
+            summary = result["summary"]
+            print(f"{f'update {generation} (live readers)':<26}{rows:>8}{parse_ms:>10.1f}"
+                  f"{result['elapsed_ms']:>11.1f}{summary['added']:>8}{summary['changed']:>9}")
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+        db.close()
+
+    print(f"\n{checks[0]} catalog reads during updates, {mixed[0]} saw a half-applied price list")
+
+
+if __name__ == '__main__':
+    main()
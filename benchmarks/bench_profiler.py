@@ -0,0 +1,91 @@
+"""
+Sampling Profiler Overhead Benchmark
+Times /api/predict with the profiler off, sampling every 10 ms and 1 ms, and
+sampling with tracemalloc on. With the profiler off no code runs on the
+request path, so "off" is the baseline.
+
+Usage:
+    python benchmarks/bench_profiler.py [--requests 300] [--rounds 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every request must reach the model, so the prediction cache is switched off
+os.environ['PREDICTION_CACHE_SIZE'] = '0'
+os.environ['MODEL_LOAD_BACKGROUND'] = '0'
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(), 'products.db'))
+
+import app as scale_app  # noqa: E402
+from bench_preprocess import synthetic_frame  # noqa: E402
+from profiler import load_profile, start_profile, stop_profile  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sampling profiler overhead")
+    parser.add_argument('--requests', type=int, default=300, help="Requests per configuration")
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    if not scale_app.wait_for_model():
+        print("ERROR: Model failed to load")
+        sys.exit(1)
+    client = scale_app.app.test_client()
+    jpeg = synthetic_frame(640, 480)
+    for _ in range(20):
+        client.post('/api/predict', data=jpeg, content_type='image/jpeg')
+
+    profile_dir = tempfile.mkdtemp()
+    configs = [("off", None), ("sampling 10 ms", (10.0, False)), ("sampling 1 ms", (1.0, False)),
+               ("10 ms + tracemalloc", (10.0, True))]
+
+    def run_round(config):
+        """Seconds per request, and the profile result (None when off)"""
+        result = {}
+        profile_id = None
+        if config is not None:
+            interval_ms, with_tracemalloc = config
+            # Long enough to cover the round; stopped when the round is done
+            profile_id = start_profile(profile_dir, 60, interval_ms, with_tracemalloc)["id"]
+            time.sleep(0.1)
+
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.post('/api/predict', data=jpeg, content_type='image/jpeg')
+        elapsed = time.perf_counter() - start
+
+        if profile_id is not None:
+            stop_profile()
+            while result.get("state") not in ("done", "failed"):
+                time.sleep(0.05)
+                result = load_profile(profile_dir, profile_id) or {}
+        return elapsed / args.requests, elapsed, result
+
+    # Configurations alternate within each round, so drift of a shared machine hits all of them alike
+    best = {name: (float('inf'), None) for name, _ in configs}
+    for _ in range(args.rounds):
+        for name, config in configs:
+            per_request, elapsed, result = run_round(config)
+            if per_request < best[name][0]:
+                best[name] = (per_request, elapsed, result)
+
+    print(f"\n/api/predict, best of {args.rounds} alternating rounds of {args.requests} requests")
+    print("sampler CPU: time spent taking samples, as a share of the profiled time\n")
+    print(f"{'profiler':<22}{'ms/request':>12}{'overhead':>10}{'samples':>9}{'sampler CPU':>13}")
+    baseline = best["off"][0]
+    for name, _ in configs:
+        per_request, elapsed, result = best[name]
+        samples = result.get("samples", 0) if result else 0
+        sampler = result["sampling_overhead_ms"] / (elapsed * 1000.0) * 100 if result else 0.0
+        print(f"{name:<22}{per_request * 1000:>12.3f}{(per_request - baseline) / baseline * 100:>9.1f}%"
+              f"{samples:>9}{sampler:>12.2f}%")
+
+if __name__ == '__main__':
+    main()
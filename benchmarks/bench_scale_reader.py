@@ -0,0 +1,241 @@
+"""
+Scale Reader Benchmark
+Stable-weight detection and live push latency against the simulated scale
+
+1. Detection: a reader owning the simulated scale plus a follower reading the
+   shared slot. For every item put on the scale it reports the time from the
+   moment the load cell settles to the stable weight being published, the
+   weight error, and stable weights published while the reading was still
+   ringing (should be none).
+2. Request path: what reading the weight costs a request (shared memory read)
+   compared with asking the scale over TCP at request time.
+3. Push: gunicorn (threaded) and uvicorn with several workers and SSE clients
+   on /api/scale/stream. Reports the delay from the load cell settling to
+   the stable weight arriving at the browser, whichever worker serves it.
+
+Usage:
+    python benchmarks/bench_scale_reader.py [--items 8] [--clients 4] [--workers 2] [--skip-servers]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_asgi import wait_until_ready  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+from scale_reader import STABLE_TOLERANCE_GRAMS, ScaleReader, Simulator, open_connection  # noqa: E402
+
+# Simulated item cycle (seconds): empty tray, ringing after the item lands, item at rest
+EMPTY, SETTLE, HOLD = 1.0, 0.8, 1.5
+
+
+def start_simulator(items):
+    weights = [round(w, 1) for w in np.random.default_rng(3).uniform(50, 1500, items)]
+    simulator = Simulator(rate=50, weights=weights, hold=HOLD, empty=EMPTY, settle=SETTLE, seed=5)
+    port = free_port()
+    server = simulator.serve(port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return simulator, server, port
+
+
+def match_items(simulator, arrivals):
+    """
+    Pair stable weights with the items that were on the scale
+
+    Args:
+        arrivals: List of (time received, stable grams) for non-zero stable weights
+
+    Returns:
+        Tuple (latencies ms, errors g, spurious count)
+    """
+    latencies, errors, spurious = [], [], 0
+    seen = set()
+    for received, grams in arrivals:
+        item = None
+        for index, (weight, placed, settled) in enumerate(simulator.events):
+            if placed <= received <= settled + HOLD + 0.5:
+                item = index
+        if item is None:
+            spurious += 1
+            continue
+        weight, placed, settled = simulator.events[item]
+        if received < settled or abs(grams - weight) > STABLE_TOLERANCE_GRAMS:
+            spurious += 1
+            continue
+        if item not in seen:
+            seen.add(item)
+            latencies.append((received - settled) * 1000.0)
+            errors.append(abs(grams - weight))
+    return latencies, errors, spurious
+
+
+def percentile_text(values):
+    if not values:
+        return "-"
+    return f"{np.median(values):.0f} / {np.percentile(values, 95):.0f}"
+
+
+def bench_detection(items):
+    simulator, server, port = start_simulator(items)
+    shared_path = os.path.join(tempfile.mkdtemp(), 'scale-reading')
+    owner = ScaleReader(f'tcp://127.0.0.1:{port}', shared_path)
+    follower = ScaleReader(f'tcp://127.0.0.1:{port}', shared_path)
+    owner.start()
+    follower.start()
+
+    arrivals = {'owner': [], 'follower': []}
+
+    def collect(name, reader, stop_at):
+        seq = -1
+        while time.time() < stop_at:
+            reading = reader.wait_for_update(seq, 0.5)
+            if reading['seq'] != seq and reading['stable'] and reading['stable_grams'] > 0:
+                arrivals[name].append((time.time(), reading['stable_grams']))
+            seq = reading['seq']
+
+    stop_at = time.time() + items * (EMPTY + SETTLE + HOLD) + 0.5
+    threads = [threading.Thread(target=collect, args=(name, reader, stop_at))
+               for name, reader in (('owner', owner), ('follower', follower))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"\nStable-weight detection, {len(simulator.events)} items (ring-down {SETTLE:g}s, window 0.5s)\n")
+    print(f"{'process':<10}{'settle → published ms p50 / p95':>34}{'max error g':>13}{'spurious':>10}")
+    for name in ('owner', 'follower'):
+        latencies, errors, spurious = match_items(simulator, arrivals[name])
+        print(f"{name:<10}{percentile_text(latencies):>34}{max(errors, default=0):>13.2f}{spurious:>10}")
+
+    stats = owner.get_stats()
+    print(f"\nowner read {stats['readings']} readings, published {stats['stable_readings']} stable weights "
+          f"(including empty), {stats['parse_errors']} parse errors")
+
+    # Request path: memory read versus a request-time read from the scale
+    calls = 100_000
+    start = time.perf_counter()
+    for _ in range(calls):
+        follower.stable_weight()
+    memory_us = (time.perf_counter() - start) / calls * 1e6
+
+    samples = []
+    for _ in range(20):
+        start = time.perf_counter()
+        connection = open_connection(f'tcp://127.0.0.1:{port}')
+        connection.readline()
+        connection.close()
+        samples.append((time.perf_counter() - start) * 1e6)
+    print(f"\nRequest path: shared-memory reading {memory_us:.2f} us, "
+          f"request-time TCP read from the scale {np.median(samples):.0f} us (median)")
+
+    owner.stop()
+    follower.stop()
+    server.shutdown()
+
+
+def read_stream(port, stop_at, arrivals):
+    """Minimal SSE client: records (time, stable grams) of each new stable reading"""
+    sock = socket.create_connection(('127.0.0.1', port), timeout=2)
+    sock.sendall(b"GET /api/scale/stream HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n")
+    buffer = b''
+    seen = set()
+    try:
+        while time.time() < stop_at:
+            try:
+                chunk = sock.recv(65536)
+            except socket.timeout:
+                continue
+            if not chunk:
+                break
+            received = time.time()
+            buffer += chunk
+            while b'\n' in buffer:
+                line, _, buffer = buffer.partition(b'\n')
+                if not line.startswith(b'data: '):
+                    continue
+                reading = json.loads(line[6:])
+                if reading['stable'] and reading['stable_grams'] and reading['seq'] not in seen:
+                    seen.add(reading['seq'])
+                    arrivals.append((received, reading['stable_grams']))
+    finally:
+        sock.close()
+
+
+def bench_push(kind, items, clients, workers):
+    simulator, server, scale_port = start_simulator(items)
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(clients + 2),
+               DB_PATH=os.path.join(tempfile.mkdtemp(), 'products.db'), MODEL_REGISTRY_POLL='0',
+               SCALE_URL=f'tcp://127.0.0.1:{scale_port}',
+               SCALE_SHARED_PATH=os.path.join(tempfile.mkdtemp(), 'scale-reading'),
+               SCALE_STREAM_SECONDS=str(items * (EMPTY + SETTLE + HOLD) + 10))
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(workers), '--no-access-log']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(port, workers):
+            print(f"{kind:<10} did not become ready")
+            return
+        # Restart the item cycle now that the server is up
+        simulator.started = time.time()
+        simulator.events.clear()
+
+        stop_at = time.time() + items * (EMPTY + SETTLE + HOLD)
+        arrivals = [[] for _ in range(clients)]
+        threads = [threading.Thread(target=read_stream, args=(port, stop_at, arrivals[i])) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies, errors, spurious = [], [], 0
+        for client_arrivals in arrivals:
+            client_latencies, client_errors, client_spurious = match_items(simulator, client_arrivals)
+            latencies += client_latencies
+            errors += client_errors
+            spurious += client_spurious
+        print(f"{kind:<10}{len(latencies):>10}{percentile_text(latencies):>34}{max(errors, default=0):>13.2f}"
+              f"{spurious:>10}")
+    finally:
+        process.terminate()
+        process.wait()
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scale reader")
+    parser.add_argument('--items', type=int, default=8, help="Items put on the simulated scale")
+    parser.add_argument('--clients', type=int, default=4, help="SSE clients per server")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--skip-servers', action='store_true', help="Only the in-process detection benchmark")
+    args = parser.parse_args()
+
+    bench_detection(args.items)
+    if args.skip_servers:
+        return
+
+    print(f"\nPush over /api/scale/stream, {args.workers} workers, {args.clients} clients\n")
+    print(f"{'server':<10}{'received':>10}{'settle → browser ms p50 / p95':>34}{'max error g':>13}{'spurious':>10}")
+    for kind in ('gunicorn', 'uvicorn'):
+        bench_push(kind, args.items, args.clients, args.workers)
+
+
+if __name__ == '__main__':
+    main()
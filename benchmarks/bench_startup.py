@@ -0,0 +1,107 @@
+"""
+Startup Benchmark
+Measures time-to-first-byte of each endpoint from a cold server start,
+with the model loaded synchronously (old behaviour) and in the background
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 3]
+"""
+
+import argparse
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+
+ENDPOINTS = [
+    ('GET', '/api/health'),
+    ('GET', '/api/products'),
+    ('GET', '/'),
+    ('POST', '/api/predict'),
+]
+
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def sample_jpeg():
+    """A small JPEG frame for /api/predict"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), (200, 40, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def build_request(method, url, image):
+    """Build a urllib request, using a multipart upload for /api/predict"""
+    if method == 'GET':
+        return urllib.request.Request(url)
+
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+            f'Content-Type: image/jpeg\r\n\r\n').encode() + image + f'\r\n--{boundary}--\r\n'.encode()
+    return urllib.request.Request(url, data=body, method='POST',
+                                  headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+
+def time_to_first_byte(method, path, background, image, timeout=300):
+    """Start a fresh server and return seconds until `path` first answers 200"""
+    port = free_port()
+    env = dict(os.environ, MODEL_LOAD_BACKGROUND='1' if background else '0',
+               DB_PATH=os.path.join(tempfile.mkdtemp(), 'products.db'))
+    # Initialized before serving, like the gunicorn hooks do
+    command = [sys.executable, '-c',
+               f"import app; app.initialize_app(); app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f'http://127.0.0.1:{port}{path}'
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(build_request(method, url, image), timeout=timeout) as response:
+                    response.read(1)
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.02)
+        return float('nan')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time-to-first-byte per endpoint")
+    parser.add_argument('--runs', type=int, default=3, help="Cold starts per endpoint and mode")
+    args = parser.parse_args()
+
+    image = sample_jpeg()
+
+    print(f"\n{'endpoint':<24}{'synchronous load (s)':>22}{'background load (s)':>22}")
+    for method, path in ENDPOINTS:
+        results = []
+        for background in (False, True):
+            times = [time_to_first_byte(method, path, background, image) for _ in range(args.runs)]
+            results.append(sorted(times)[len(times) // 2])
+        print(f"{method + ' ' + path:<24}{results[0]:>22.2f}{results[1]:>22.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Sales Analytics Benchmark
+For growing synthetic histories: time to backfill the rollups, /api/stats query
+latency from the rollups versus an ad-hoc GROUP BY over raw transactions, and
+the cost the rollup triggers add to every recorded transaction.
+
+Usage:
+    python benchmarks/bench_stats.py [--rows 100000,1000000,10000000] [--dir /data]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'benchmarks'))
+
+from analytics import SalesAnalytics  # noqa: E402
+from bench_transactions_query import generate  # noqa: E402
+from database import ProductDatabase  # noqa: E402
+
+AD_HOC_TOP_PRODUCTS = '''
+    SELECT product_name, SUM(total_price) AS revenue, SUM(weight_g), COUNT(*), AVG(confidence)
+    FROM transactions GROUP BY product_name ORDER BY revenue DESC LIMIT 10
+'''
+
+
+def median_ms(fn, repeat):
+    """Median wall time of fn() in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return sorted(timings)[len(timings) // 2]
+
+
+def insert_rate(db, count):
+    """Single-threaded transaction inserts per second, one commit each like add_transaction"""
+    start = time.perf_counter()
+    for i in range(count):
+        with db.pool.transaction() as conn:
+            conn.execute('''
+                INSERT INTO transactions (product_name, weight_g, price_per_kg, total_price, confidence)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (f"Product {i % 118}", 250.0, 6.0, 1.5, 0.9))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sales rollups")
+    parser.add_argument('--rows', default='100000,1000000,10000000', help="History sizes to test")
+    parser.add_argument('--dir', help="Directory for the test database (default: system temp dir)")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per rollup query")
+    parser.add_argument('--inserts', type=int, default=5000, help="Transactions used to measure trigger cost")
+    args = parser.parse_args()
+
+    print(f"\n{'rows':>12}{'backfill s':>12}{'ad-hoc ms':>12}{'top ms':>10}{'categ. ms':>11}"
+          f"{'march ms':>10}{'hourly ms':>11}{'tx/s raw':>10}{'tx/s rollup':>13}")
+
+    for rows in [int(r) for r in args.rows.split(',')]:
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            db = ProductDatabase(os.path.join(tmp, 'stats.db'), pool_size=2)
+            db.connect()
+            generate(db, rows)
+
+            with db.pool.connection() as conn:
+                ad_hoc_ms = median_ms(lambda: conn.execute(AD_HOC_TOP_PRODUCTS).fetchall(), 3)
+            raw_rate = insert_rate(db, args.inserts)
+
+            # Indexes, rollup tables and triggers, with the rollups backfilled from history
+            start = time.perf_counter()
+            with db.pool.transaction() as conn:
+                db._apply_migrations(conn)
+            migrate_s = time.perf_counter() - start
+            db.refresh_catalog()
+            rollup_rate = insert_rate(db, args.inserts)
+
+            analytics = SalesAnalytics(db)
+            top_ms = median_ms(lambda: analytics.top_products(10), args.repeat)
+            category_ms = median_ms(lambda: analytics.revenue_by_category(), args.repeat)
+            march_ms = median_ms(lambda: analytics.top_products(10, 'revenue', '2025-03-01', '2025-04-01'),
+                                 args.repeat)
+            hourly_ms = median_ms(lambda: analytics.hourly('2025-03-15'), args.repeat)
+            db.close()
+
+        print(f"{rows:>12,}{migrate_s:>12.1f}{ad_hoc_ms:>12.1f}{top_ms:>10.3f}{category_ms:>11.3f}"
+              f"{march_ms:>10.3f}{hourly_ms:>11.3f}{raw_rate:>10.0f}{rollup_rate:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
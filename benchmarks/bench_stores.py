@@ -0,0 +1,117 @@
+"""
+Multi-Store Price Lookup Benchmark
+Builds catalogs with a growing number of stores, each overriding the price of
+every product, and times calculate_price through the layered in-memory index
+(base store and overridden store), API key resolution, and the per-request
+SQL join the index replaces. Lookup time should not grow with the number of
+stores.
+
+Usage:
+    python benchmarks/bench_stores.py [--stores 0,10,100,500] [--lookups 200000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from database import ProductDatabase, hash_api_key  # noqa: E402
+from price_import import PriceEntry  # noqa: E402
+
+# What a lookup would cost without the in-memory layers
+STORE_PRICE_SQL = '''
+    SELECT p.name, p.name_polish, COALESCE(s.price_per_kg, p.price_per_kg)
+    FROM products p LEFT JOIN store_prices s ON s.product_name = p.name AND s.store_id = ?
+    WHERE p.name = ?
+'''
+
+
+def build_database(path, labels, stores):
+    """Database with every label in the base catalog and a price override for each label in each store"""
+    db = ProductDatabase(path, pool_size=2)
+    db.connect()
+    db.initialize_schema()
+
+    entries = [PriceEntry(0, label, 10 + i % 50, f"{label} PL", "Owoce") for i, label in enumerate(labels)]
+    for store in range(stores):
+        entries += [PriceEntry(0, label, 20 + (i + store) % 50, store=f"store-{store:04d}")
+                    for i, label in enumerate(labels)]
+    result = db.import_price_list(entries, set(labels))
+    if "errors" in result:
+        raise RuntimeError(result["errors"][:5])
+
+    # Stores with API keys ("key-<n>"), inserted directly instead of one register_store call each
+    with db.pool.transaction() as conn:
+        conn.executemany("INSERT INTO stores (store_id, name, api_key_hash) VALUES (?, ?, ?)",
+                         [(f"store-{store:04d}", f"Sklep {store}", hash_api_key(f"key-{store}"))
+                          for store in range(stores)])
+    return db
+
+
+def per_call_us(fn, args):
+    """Mean wall time of fn(*a) over all argument tuples, in microseconds"""
+    start = time.perf_counter()
+    for a in args:
+        fn(*a)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-store price lookups")
+    parser.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    parser.add_argument('--stores', default='0,10,100,500', help="Store counts to test")
+    parser.add_argument('--lookups', type=int, default=200_000, help="calculate_price calls per measurement")
+    parser.add_argument('--sql-lookups', type=int, default=20_000, help="SQL join lookups per measurement")
+    args = parser.parse_args()
+
+    with open(args.labels) as f:
+        labels = json.load(f)['labels']
+    rng = random.Random(42)
+
+    print(f"\n{len(labels)} products, every store overrides every price\n")
+    print(f"{'stores':>7}{'overrides':>11}{'refresh ms':>12}{'snapshot MB':>13}{'base us':>10}"
+          f"{'store us':>10}{'api key us':>12}{'SQL join us':>13}")
+
+    for stores in [int(n) for n in args.stores.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = build_database(os.path.join(tmp, 'stores.db'), labels, stores)
+
+            start = time.perf_counter()
+            db.refresh_catalog()
+            refresh_ms = (time.perf_counter() - start) * 1000.0
+
+            tracemalloc.start()
+            catalog = db.refresh_catalog()
+            snapshot_mb = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+
+            store_ids = [f"store-{store:04d}" for store in range(stores)] or [None]
+            products = [rng.choice(labels) for _ in range(args.lookups)]
+            base_us = per_call_us(db.calculate_price, [(name, 250, None) for name in products])
+            store_us = per_call_us(db.calculate_price,
+                                   [(name, 250, rng.choice(store_ids)) for name in products])
+
+            keys = [f"key-{rng.randrange(stores)}" for _ in range(args.lookups // 10)] if stores else []
+            key_us = per_call_us(catalog.store_for_api_key, [(key,) for key in keys]) if keys else 0.0
+
+            with db.pool.connection() as conn:
+                pairs = [(rng.choice(store_ids), rng.choice(labels)) for _ in range(args.sql_lookups)]
+                sql_us = per_call_us(lambda store_id, name: conn.execute(STORE_PRICE_SQL, (store_id, name)).fetchone(),
+                                     pairs)
+
+            overrides = sum(len(prices) for prices in catalog.store_prices.values())
+            db.close()
+
+        print(f"{stores:>7}{overrides:>11,}{refresh_ms:>12.1f}{snapshot_mb:>13.1f}{base_us:>10.2f}"
+              f"{store_us:>10.2f}{key_us:>12.2f}{sql_us:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Transaction History Query Benchmark
+Generates a large synthetic transactions table, times the old unindexed
+/api/transactions query, applies the schema migrations (indexes), then times
+keyset-paginated and filtered pages. Every query plan is checked: the script
+exits with status 1 if any page query needs a full scan or a sort.
+
+Usage:
+    python benchmarks/bench_transactions_query.py [--rows 10000000] [--dir /data]
+    python benchmarks/bench_transactions_query.py --rows 10000 --check-only
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from database import ProductDatabase  # noqa: E402
+
+# One year of history
+SPAN_SECONDS = 365 * 24 * 3600
+
+
+def generate(db, rows):
+    """Fill the transactions table with `rows` synthetic checkouts spread over one year"""
+    with db.pool.transaction() as conn:
+        db._create_tables(conn)
+        db._insert_default_products(conn, [
+            (f"Product {i}", f"Produkt {i}", "Owoce", 5.0 + i % 20) for i in range(118)
+        ])
+
+    # Generated inside SQLite: much faster than binding 10M rows from Python
+    with db.pool.transaction() as conn:
+        conn.execute('''
+            WITH RECURSIVE seq(x) AS (SELECT 0 UNION ALL SELECT x + 1 FROM seq WHERE x + 1 < ?)
+            INSERT INTO transactions (product_name, weight_g, price_per_kg, total_price, confidence, created_at)
+            SELECT 'Product ' || (x * 7919 % 118),
+                   100 + x % 900,
+                   5.0 + x % 20,
+                   (100 + x % 900) / 1000.0 * (5.0 + x % 20),
+                   (x * 37 % 1000) / 1000.0,
+                   datetime('2025-01-01', '+' || (x * ? / ?) || ' seconds')
+            FROM seq
+        ''', (rows, SPAN_SECONDS, rows))
+
+
+def explain(db, sql, params):
+    """Query plan details of one query"""
+    with db.pool.connection() as conn:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def time_query(db, sql, params, repeat):
+    """Median wall time of a query in milliseconds"""
+    timings = []
+    with db.pool.connection() as conn:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - start) * 1000.0)
+    return sorted(timings)[len(timings) // 2]
+
+
+def page_cursor(db, pages, **filters):
+    """Cursor after walking `pages` pages of 50 rows"""
+    cursor = None
+    for _ in range(pages):
+        _, cursor = db.get_transactions_page(50, cursor=cursor, **filters)
+    return cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transaction history queries")
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--dir', help="Directory for the test database (default: system temp dir)")
+    parser.add_argument('--repeat', type=int, default=20, help="Runs per query")
+    parser.add_argument('--check-only', action='store_true', help="Only check the query plans")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db = ProductDatabase(os.path.join(tmp, 'history.db'), pool_size=2)
+        db.connect()
+
+        print(f"Generating {args.rows:,} transactions...")
+        start = time.perf_counter()
+        generate(db, args.rows)
+        print(f"  {time.perf_counter() - start:.1f}s")
+
+        if not args.check_only:
+            legacy_sql = "SELECT * FROM transactions ORDER BY created_at DESC LIMIT ?"
+            legacy_ms = time_query(db, legacy_sql, (10,), max(1, args.repeat // 10))
+            print(f"Old query without indexes: {legacy_ms:.1f} ms")
+
+        print("Applying schema migrations...")
+        start = time.perf_counter()
+        with db.pool.transaction() as conn:
+            db._apply_migrations(conn)
+        print(f"  {time.perf_counter() - start:.1f}s")
+
+        deep = page_cursor(db, 100)
+        queries = [
+            ("latest page", {}),
+            ("page 101 (cursor)", {'cursor': deep}),
+            ("one product", {'product_name': 'Product 42'}),
+            ("one product, page 21", {'product_name': 'Product 42',
+                                      'cursor': page_cursor(db, 20, product_name='Product 42')}),
+            ("March", {'start': '2025-03-01', 'end': '2025-04-01'}),
+            ("March, one product", {'start': '2025-03-01', 'end': '2025-04-01', 'product_name': 'Product 42'}),
+            ("confidence >= 0.9", {'min_confidence': 0.9}),
+            ("one store", {'store_id': 'store-0001'}),
+            ("one store, March", {'store_id': 'store-0001', 'start': '2025-03-01', 'end': '2025-04-01'}),
+            ("all filters", {'start': '2025-03-01', 'end': '2025-04-01', 'product_name': 'Product 42',
+                             'min_confidence': 0.5}),
+        ]
+
+        failures = 0
+        print(f"\n{'':<24}{'ms/page':>10}  plan")
+        for label, filters in queries:
+            sql, params = db.build_transactions_query(51, **filters)
+            plan = explain(db, sql, params)
+            plan_text = '; '.join(plan)
+
+            # Every page must be an index scan that already delivers rows in order
+            ok = all('USING INDEX' in step or 'USING COVERING INDEX' in step for step in plan) and \
+                'TEMP B-TREE' not in plan_text
+            failures += not ok
+
+            timing = '' if args.check_only else f"{time_query(db, sql, params, args.repeat):>10.3f}"
+            print(f"{label:<24}{timing:>10}  {'OK  ' if ok else 'FAIL'} {plan_text}")
+
+        db.close()
+
+    if failures:
+        print(f"\n{failures} query plan(s) do not use an index")
+        sys.exit(1)
+    print("\nAll query plans use an index without sorting")
+
+
+if __name__ == '__main__':
+    main()
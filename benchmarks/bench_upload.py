@@ -0,0 +1,85 @@
+"""
+Upload Format Benchmark
+Compares the raw binary /api/predict upload with base64 JSON and multipart:
+request size, body parse time and end-to-end latency
+
+Usage:
+    python benchmarks/bench_upload.py [--requests 50]
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Every request must reach the model, so the prediction cache is switched off
+os.environ['PREDICTION_CACHE_SIZE'] = '0'
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(), 'products.db'))
+
+import app as scale_app  # noqa: E402
+from bench_preprocess import FRAME_SIZES, synthetic_frame  # noqa: E402
+
+
+def request_variants(jpeg):
+    """(name, request kwargs factory, body size) for each upload format"""
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+    json_body = json.dumps({'image': data_url})
+
+    return [
+        ('raw', lambda: {'data': jpeg, 'content_type': 'image/jpeg'}, len(jpeg)),
+        ('multipart', lambda: {'data': {'image': (io.BytesIO(jpeg), 'frame.jpg')},
+                               'content_type': 'multipart/form-data'}, len(jpeg)),
+        ('base64 JSON', lambda: {'data': json_body, 'content_type': 'application/json'}, len(json_body)),
+    ]
+
+
+def median_ms(samples):
+    return float(np.median(samples)) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/predict upload formats")
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    if not scale_app.wait_for_model():
+        print("ERROR: Model failed to load")
+        sys.exit(1)
+    client = scale_app.app.test_client()
+
+    for frame_name, (width, height) in FRAME_SIZES.items():
+        jpeg = synthetic_frame(width, height)
+        print(f"\n{frame_name} frame ({len(jpeg) / 1024:.0f} KB JPEG)")
+        print(f"{'format':<14}{'body KB':>10}{'parse ms':>10}{'end-to-end ms':>15}")
+
+        for name, make_kwargs, size in request_variants(jpeg):
+            parse_times = []
+            for _ in range(args.requests):
+                with scale_app.app.test_request_context('/api/predict', method='POST', **make_kwargs()):
+                    start = time.perf_counter()
+                    image_data, error = scale_app.read_image_from_request()
+                    parse_times.append(time.perf_counter() - start)
+                    assert error is None and len(image_data) == len(jpeg)
+
+            latencies = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = client.post('/api/predict', **make_kwargs())
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.get_json()
+
+            print(f"{name:<14}{size / 1024:>10.0f}{median_ms(parse_times):>10.2f}{median_ms(latencies):>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Vision Weight Benchmark
+Latency and accuracy of the frame-based weight estimate
+
+Latency: decode to the mask resolution plus segmentation and the weight
+curve, on synthetic 480p, 1080p and 4K frames (median of repeats). In vision
+mode the classifier takes the decoded frame instead of the JPEG, so the cost
+added to /api/predict is compared with the classifier's own preprocessing.
+
+Accuracy: synthetic scenes of items with a known weight on a textured tray,
+each with a random shape, position, lighting and a cast shadow. The item's
+true area follows area ~ weight^(2/3) with a different density per product.
+Compared are the random table estimate (what /api/predict returned before),
+vision weighing calibrated with one apple reference, and vision weighing with
+one reference per product. Reports mean absolute percentage error.
+
+Usage:
+    python benchmarks/bench_vision_weight.py [--items 40] [--repeats 30]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from model_loader import FruitClassifier  # noqa: E402
+from vision_weight import VisionWeightEstimator, decode_frame  # noqa: E402
+from weight_estimator import WeightEstimator  # noqa: E402
+
+FRAME_SIZES = {
+    '480p': (640, 480),
+    '1080p': (1920, 1080),
+    '4K': (3840, 2160),
+}
+
+TRAY_COLOR = (190, 185, 175)
+# Share of the frame covered by a typical 180 g apple
+APPLE_AREA = 0.08
+
+# product -> (RGB colour, aspect ratio, relative area per gram^(2/3) against an apple)
+PRODUCTS = {
+    "Apple Braeburn": ((200, 50, 40), 1.0, 1.0),
+    "Orange": ((235, 140, 30), 1.0, 0.95),
+    "Lemon": ((235, 215, 60), 1.3, 1.02),
+    "Kiwi": ((130, 100, 60), 1.25, 0.9),
+    "Avocado": ((60, 90, 40), 1.35, 0.92),
+    "Banana": ((230, 205, 70), 3.0, 1.25),
+}
+
+
+def tray(width, height, seed):
+    """Float frame of the empty tray: fixed texture plus per-frame sensor noise"""
+    texture = np.random.default_rng(12345)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[...] = TRAY_COLOR
+    # Uneven lighting and a fixed fabric-like texture
+    frame *= (1.0 - 0.08 * (x / width) + 0.04 * (y / height))[..., None]
+    frame += texture.normal(0, 4, (height, width, 1))
+    frame += np.random.default_rng(seed).normal(0, 5, frame.shape)
+    return frame
+
+
+def to_jpeg(frame):
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(frame, 0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def scene(width, height, product, weight_grams, seed):
+    """JPEG of one item of the product with the given true weight, and its true area fraction"""
+    rng = np.random.default_rng(seed)
+    color, aspect, area_factor = PRODUCTS[product]
+    area_fraction = APPLE_AREA * area_factor * (weight_grams / 180.0) ** (2.0 / 3.0)
+
+    # Ellipse of that area with a random orientation and a little shape noise
+    aspect *= rng.uniform(0.9, 1.1)
+    area_px = area_fraction * width * height
+    a = np.sqrt(area_px * aspect / np.pi)
+    b = area_px / (np.pi * a)
+    angle = rng.uniform(0, np.pi)
+    cx = rng.uniform(0.35, 0.65) * width
+    cy = rng.uniform(0.35, 0.65) * height
+
+    frame = tray(width, height, seed)
+    y, x = np.mgrid[0:height, 0:width]
+
+    def ellipse(ox, oy):
+        u = (x - ox) * np.cos(angle) + (y - oy) * np.sin(angle)
+        v = -(x - ox) * np.sin(angle) + (y - oy) * np.cos(angle)
+        return (u / a) ** 2 + (v / b) ** 2
+
+    # Soft shadow cast down and to the right (darker tray, same colour)
+    shadow = ellipse(cx + 0.12 * b, cy + 0.15 * b) < 1.1
+    frame[shadow] *= rng.uniform(0.65, 0.8)
+
+    r2 = ellipse(cx, cy)
+    inside = r2 < 1.0
+    # Round-object shading: bright centre, darker rim, plus a global exposure change
+    shade = (1.05 - 0.35 * r2)[..., None] * rng.uniform(0.85, 1.1)
+    frame[inside] = (np.array(color, dtype=np.float32) * shade)[inside]
+    frame[inside] += rng.normal(0, 6, (int(inside.sum()), 3))
+    return to_jpeg(frame), area_fraction
+
+
+def median_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(samples))
+
+
+def mape(estimates, truths):
+    estimates = np.asarray(estimates, dtype=np.float64)
+    truths = np.asarray(truths, dtype=np.float64)
+    return float(np.mean(np.abs(estimates - truths) / truths) * 100.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vision weight estimation")
+    parser.add_argument('--items', type=int, default=40, help="Test items per product")
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--width', type=int, default=1280, help="Frame width of the accuracy scenes")
+    parser.add_argument('--height', type=int, default=720)
+    args = parser.parse_args()
+
+    table = WeightEstimator()
+    weights = table.weight_database
+    width, height = args.width, args.height
+
+    single = VisionWeightEstimator(weights, tempfile.mkdtemp())
+    per_product = VisionWeightEstimator(weights, tempfile.mkdtemp())
+    backgrounds = [to_jpeg(tray(width, height, seed)) for seed in range(5)]
+    for vision in (single, per_product):
+        assert "error" not in vision.calibrate_background(backgrounds)
+
+    # Reference weighings at the typical weight (seed range kept apart from the test items)
+    reference_seed = 10_000
+    for product in PRODUCTS:
+        typical = weights[product][1]
+        jpeg, _ = scene(width, height, product, typical, reference_seed)
+        reference_seed += 1
+        assert "error" not in per_product.add_reference(jpeg, product, typical)
+        if product == "Apple Braeburn":
+            assert "error" not in single.add_reference(jpeg, product, typical)
+
+    print(f"\nAccuracy on {args.items} items per product ({width}x{height}), mean absolute % error\n")
+    print(f"{'product':<18}{'table (random)':>16}{'vision 1 ref':>14}{'vision per-product':>20}{'area err %':>12}")
+    all_truth, all_table, all_single, all_per_product = [], [], [], []
+    rng = np.random.default_rng(7)
+    seed = 0
+    for product in PRODUCTS:
+        low, _, high = weights[product]
+        truth, table_est, single_est, product_est, area_errors = [], [], [], [], []
+        for _ in range(args.items):
+            weight = rng.uniform(low, high)
+            jpeg, area_fraction = scene(width, height, product, weight, seed)
+            seed += 1
+            frame = decode_frame(jpeg)
+
+            first = per_product.estimate(frame, product)
+            assert first == per_product.estimate(decode_frame(jpeg), product), "estimate is not deterministic"
+            truth.append(weight)
+            table_est.append(table.estimate_weight(product)['weight_grams'])
+            single_est.append(single.estimate(frame, product)['weight_grams'])
+            product_est.append(first['weight_grams'])
+            area_errors.append(abs(first['area_fraction'] - area_fraction) / area_fraction)
+
+        print(f"{product:<18}{mape(table_est, truth):>15.1f}%{mape(single_est, truth):>13.1f}%"
+              f"{mape(product_est, truth):>19.1f}%{np.mean(area_errors) * 100:>11.1f}%")
+        all_truth += truth
+        all_table += table_est
+        all_single += single_est
+        all_per_product += product_est
+    print(f"{'all':<18}{mape(all_table, all_truth):>15.1f}%{mape(all_single, all_truth):>13.1f}%"
+          f"{mape(all_per_product, all_truth):>19.1f}%")
+
+    print(f"\nLatency, median of {args.repeats} (ms)\n")
+    classifier = FruitClassifier(None, None)
+    print(f"{'frame':<8}{'JPEG KB':>9}{'decode':>9}{'estimate':>10}{'vision path':>13}{'table path':>12}{'added':>8}")
+    for name, (frame_width, frame_height) in FRAME_SIZES.items():
+        vision = VisionWeightEstimator(weights, tempfile.mkdtemp())
+        vision.calibrate_background([to_jpeg(tray(frame_width, frame_height, 0))])
+        jpeg, _ = scene(frame_width, frame_height, "Apple Braeburn", 180, 1)
+        vision.add_reference(jpeg, "Apple Braeburn", 180)
+        frame = decode_frame(jpeg)
+
+        decode = median_ms(lambda: decode_frame(jpeg), args.repeats)
+        estimate = median_ms(lambda: vision.estimate(frame, "Apple Braeburn"), args.repeats)
+
+        def vision_path():
+            decoded = decode_frame(jpeg)
+            classifier.preprocess_images([decoded])
+            vision.estimate(decoded, "Apple Braeburn")
+
+        vision_ms = median_ms(vision_path, args.repeats)
+        table_ms = median_ms(lambda: classifier.preprocess_images([jpeg]), args.repeats)
+        print(f"{name:<8}{len(jpeg) / 1024:>9.0f}{decode:>9.2f}{estimate:>10.2f}{vision_ms:>13.2f}{table_ms:>12.2f}"
+              f"{vision_ms - table_ms:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Transaction Write-Behind Benchmark
+Compares one commit per transaction with the group-commit queue at both durability
+levels: transactions/sec and per-call latency seen by the request threads.
+
+Usage:
+    python benchmarks/bench_write_behind.py [--threads 16] [--duration 5] [--synchronous FULL] [--dir /data]
+
+Use --dir on the real disk: on tmpfs an fsync costs nothing and group commit gains little.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from database import ProductDatabase  # noqa: E402
+
+
+def run(db, threads, duration):
+    """Record transactions from several threads; returns (tx/sec, latencies in ms, errors, ids)"""
+    latencies = [[] for _ in range(threads)]
+    ids = [[] for _ in range(threads)]
+    errors = [0] * threads
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            result = db.add_transaction("Apple Red 1", 180.0, 5.5, 0.99, 0.93)
+            latencies[index].append((time.perf_counter() - start) * 1000.0)
+            if "error" in result:
+                errors[index] += 1
+            else:
+                ids[index].append(result["transaction_id"])
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = np.concatenate([np.array(l) for l in latencies])
+    all_ids = [i for per_thread in ids for i in per_thread]
+    return len(all_ids) / elapsed, all_latencies, sum(errors), all_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark group-committed transaction logging")
+    parser.add_argument('--threads', type=int, default=16, help="Concurrent request threads")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per configuration")
+    parser.add_argument('--synchronous', default='FULL', help="PRAGMA synchronous for all configurations")
+    parser.add_argument('--max-rows', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2)
+    parser.add_argument('--dir', help="Directory for the test database (default: system temp dir)")
+    args = parser.parse_args()
+
+    configurations = [('commit per transaction', None), ('write-behind commit', 'commit'),
+                      ('write-behind enqueue', 'enqueue')]
+
+    print(f"\n{args.threads} threads, {args.duration:.0f}s per configuration, synchronous={args.synchronous}\n")
+    print(f"{'':<26}{'tx/sec':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}  write-behind stats")
+
+    for label, durability in configurations:
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            db = ProductDatabase(os.path.join(tmp, 'bench.db'), pool_size=args.threads,
+                                 synchronous=args.synchronous)
+            db.connect()
+            db.initialize_schema()
+            if durability:
+                db.enable_write_behind(args.max_rows, args.max_wait_ms, durability)
+
+            throughput, latencies, errors, ids = run(db, args.threads, args.duration)
+            stats = db.writer.get_stats() if db.writer else None
+            # Drain on shutdown: every acknowledged ID must be in the table afterwards
+            db.disable_write_behind()
+
+            with db.pool.connection() as conn:
+                stored = {row[0] for row in conn.execute("SELECT id FROM transactions")}
+            db.close()
+
+            missing = len(set(ids) - stored)
+            duplicates = len(ids) - len(set(ids))
+            details = ''
+            if stats:
+                details = f"mean batch {stats['mean_batch_rows']}, max depth {stats['max_queue_depth']}"
+            print(f"{label:<26}{throughput:>10.1f}{np.percentile(latencies, 50):>10.2f}"
+                  f"{np.percentile(latencies, 99):>10.2f}{errors:>8}  {details}")
+            if missing or duplicates:
+                print(f"  WARNING: {missing} acknowledged IDs missing, {duplicates} duplicate IDs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Closed-Loop Load Generator
+Each client thread keeps one HTTP keep-alive connection and sends its next
+request as soon as the previous answer arrives
+"""
+
+import http.client
+import threading
+import time
+
+import numpy as np
+
+
+def run_closed_loop(host, port, make_request, concurrency, duration, timeout=60):
+    """
+    Drive a server with `concurrency` clients for `duration` seconds
+
+    Args:
+        host, port: Server address
+        make_request: Callable returning (method, path, body, headers) for the next request
+        concurrency: Number of client threads
+        duration: Seconds to run
+        timeout: Per-request socket timeout
+
+    Returns:
+        Dictionary with throughput, latency percentiles (ms) and status counts
+    """
+    latencies = [[] for _ in range(concurrency)]
+    statuses = [{} for _ in range(concurrency)]
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        while time.perf_counter() < stop_at:
+            method, path, body, headers = make_request()
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = 'error'
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=timeout)
+            latencies[index].append(time.perf_counter() - start)
+            statuses[index][status] = statuses[index].get(status, 0) + 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = np.array([value for client_latencies in latencies for value in client_latencies]) * 1000.0
+    status_counts = {}
+    for client_statuses in statuses:
+        for status, count in client_statuses.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+
+    ok = status_counts.get('200', 0)
+    return {
+        "requests": int(len(all_latencies)),
+        "ok": ok,
+        "throughput": round(ok / elapsed, 2),
+        "p50_ms": round(float(np.percentile(all_latencies, 50)), 2) if len(all_latencies) else None,
+        "p95_ms": round(float(np.percentile(all_latencies, 95)), 2) if len(all_latencies) else None,
+        "p99_ms": round(float(np.percentile(all_latencies, 99)), 2) if len(all_latencies) else None,
+        "statuses": status_counts
+    }
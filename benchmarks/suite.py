@@ -0,0 +1,336 @@
+"""
+Benchmark Suite
+Offline microbenchmarks (preprocessing, inference at batch sizes 1..64,
+weight estimation, price lookup) and a closed-loop load test of
+/api/predict, /api/calculate_price and /api/transaction against a local
+gunicorn server. Writes one JSON report (throughput, p50/p95/p99, RSS) and
+compares it with a stored baseline, flagging regressions.
+
+Usage:
+    python benchmarks/suite.py run --model model.h5 --out report.json [--baseline benchmarks/baseline.json]
+    python benchmarks/suite.py run --model model.h5 --save-baseline      # record the reference numbers
+    python benchmarks/suite.py compare benchmarks/baseline.json report.json
+    python benchmarks/suite.py run --quick --skip-load                    # smoke run
+
+Exit code 1 when the comparison finds a regression, so CI can gate on it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_asgi import wait_until_ready  # noqa: E402
+from bench_preprocess import synthetic_frame  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+from loadgen import run_closed_loop  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+# Camera frame sizes sent by scales in the field
+FRAME_SIZES = {'480p': (640, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+# Allowed change (%) before a metric counts as a regression; tails are noisier than medians
+TOLERANCE = {"throughput": 10.0, "p50_ms": 10.0, "p95_ms": 15.0, "p99_ms": 25.0, "rss_mb": 10.0}
+# Metrics where a larger value is better
+HIGHER_IS_BETTER = {"throughput"}
+
+
+def rss_mb(pid='self'):
+    """Resident set size of a process"""
+    with open(f'/proc/{pid}/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def tree_rss_mb(pid):
+    """RSS of a process and all its descendants (gunicorn master + workers)"""
+    total = 0.0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            total += rss_mb(current)
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pending += [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+    return total
+
+
+def summarize(latencies, elapsed, items=1):
+    """Report entry from per-call latencies in seconds (items: units of work per call)"""
+    ms = np.array(latencies) * 1000.0
+    return {
+        "calls": len(latencies),
+        "throughput": round(len(latencies) * items / elapsed, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 6),
+        "p95_ms": round(float(np.percentile(ms, 95)), 6),
+        "p99_ms": round(float(np.percentile(ms, 99)), 6),
+        "rss_mb": round(rss_mb(), 1)
+    }
+
+
+def measure(fn, inputs, seconds, items=1):
+    """Call fn on inputs in turn for about `seconds` (at least 5 calls) and summarize"""
+    latencies = []
+    start = time.perf_counter()
+    stop_at = start + seconds
+    i = 0
+    while time.perf_counter() < stop_at or len(latencies) < 5:
+        value = inputs[i % len(inputs)]
+        call_start = time.perf_counter()
+        fn(value)
+        latencies.append(time.perf_counter() - call_start)
+        i += 1
+    return summarize(latencies, time.perf_counter() - start, items)
+
+
+def run_microbenchmarks(args, results):
+    """Preprocessing, inference, weight and price inside this process"""
+    from database import ProductDatabase
+    from inference_plan import InferencePlan, load_plan_labels
+    from model_loader import FruitClassifier
+    from weight_estimator import WeightEstimator
+
+    classifier = FruitClassifier(args.model, args.labels)
+    if not classifier.load_model():
+        sys.exit(1)
+    classifier.warm_up()
+
+    for name, (width, height) in FRAME_SIZES.items():
+        frames = [synthetic_frame(width, height, seed) for seed in range(4)]
+        results[f"preprocess/{name}"] = measure(classifier.preprocess_image, frames, args.seconds)
+        print_result(f"preprocess/{name}", results[f"preprocess/{name}"])
+
+    for batch_size in BATCH_SIZES:
+        batches = [np.random.default_rng(seed).random((batch_size, 32, 32, 3), dtype=np.float32) for seed in range(2)]
+        name = f"inference/batch{batch_size}"
+        # Throughput is in images per second
+        results[name] = measure(classifier.run_model, batches, args.seconds, items=batch_size)
+        print_result(name, results[name])
+
+    labels = load_plan_labels(args.labels)
+    estimator = WeightEstimator()
+    rng = random.Random(0)
+    label_sample = [rng.choice(labels) for _ in range(1000)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = ProductDatabase(os.path.join(tmp, 'suite.db'), pool_size=1)
+        db.connect()
+        db.initialize_schema()
+        db.populate_default_products()
+        catalog = db.refresh_catalog()
+        plan = InferencePlan(labels, estimator.weight_database, catalog)
+        class_sample = [plan.class_ids[label] for label in label_sample]
+
+        for name, fn, inputs in [
+            ("weight/estimator", estimator.estimate_weight, label_sample),
+            ("weight/plan", plan.estimate_weight, class_sample),
+            ("price/catalog", lambda label: db.calculate_price(label, 250), label_sample),
+            ("price/plan", lambda class_id: plan.calculate_price(class_id, 250), class_sample),
+        ]:
+            results[name] = measure(fn, inputs, args.seconds)
+            print_result(name, results[name])
+        db.close()
+
+
+def run_load_test(args, results):
+    """Closed-loop load on a local gunicorn server, one endpoint at a time"""
+    frames = [synthetic_frame(width, height, seed) for seed, (width, height) in enumerate(FRAME_SIZES.values())]
+    # Products with a price, read from the server once it is up
+    labels = []
+    counter = iter(range(10 ** 9))
+    rng = random.Random(1)
+
+    def predict_request():
+        # A unique trailing byte keeps the prediction cache from answering
+        body = rng.choice(frames) + next(counter).to_bytes(8, 'big')
+        return 'POST', '/api/predict', body, {'Content-Type': 'image/jpeg'}
+
+    def price_request():
+        body = json.dumps({"product_name": rng.choice(labels), "weight_grams": rng.randint(50, 2000)})
+        return 'POST', '/api/calculate_price', body, {'Content-Type': 'application/json'}
+
+    def transaction_request():
+        weight = rng.randint(50, 2000)
+        body = json.dumps({"product_name": rng.choice(labels), "weight_g": weight, "price_per_kg": 9.99,
+                           "total_price": round(weight * 9.99 / 1000, 2), "confidence": 0.9})
+        return 'POST', '/api/transaction', body, {'Content-Type': 'application/json'}
+
+    port = free_port()
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(args.workers), MODEL_PATH=args.model,
+               PREDICTION_CACHE_SIZE='0', MODEL_REGISTRY_POLL='0', MODEL_REGISTRY_DIR=os.path.join(tmp, 'models'),
+               DB_PATH=os.path.join(tmp, 'products.db'))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(port, args.workers):
+            print("ERROR: server did not become ready, load test skipped")
+            return
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/products', timeout=10) as response:
+            labels += [product['name'] for product in json.load(response)['products']]
+
+        for name, make_request in [("load/predict", predict_request), ("load/calculate_price", price_request),
+                                   ("load/transaction", transaction_request)]:
+            stats = run_closed_loop('127.0.0.1', port, make_request, args.concurrency, args.load_seconds)
+            stats["rss_mb"] = round(tree_rss_mb(server.pid), 1)
+            results[name] = stats
+            print_result(name, stats)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_result(name, result):
+    print(f"{name:<26}{result['throughput']:>12.1f}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+          f"{result['p99_ms']:>10.3f}{result['rss_mb']:>9.0f}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(baseline, report, tolerance=None):
+    """
+    Compare two reports
+
+    Args:
+        baseline, report: Report dictionaries
+        tolerance: Allowed change in % for every metric (None: per-metric TOLERANCE)
+
+    Returns:
+        List of regression descriptions (empty when nothing got worse)
+    """
+    regressions = []
+    print(f"\n{'benchmark':<26}{'metric':<12}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(set(baseline["results"]) & set(report["results"])):
+        old, new = baseline["results"][name], report["results"][name]
+        for metric, default_tolerance in TOLERANCE.items():
+            if old.get(metric) in (None, 0) or new.get(metric) is None:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] * 100.0
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            limit = default_tolerance if tolerance is None else tolerance
+            flag = ''
+            if worse > limit:
+                flag = '  REGRESSION'
+                regressions.append(f"{name} {metric}: {old[metric]} -> {new[metric]} ({change:+.1f}%)")
+            print(f"{name:<26}{metric:<12}{old[metric]:>12.3f}{new[metric]:>12.3f}{change:>+8.1f}%{flag}")
+
+    for name in sorted(set(baseline["results"]) - set(report["results"])):
+        print(f"{name:<26}missing from the current report")
+
+    for key in ("cpu_count", "machine", "model"):
+        if baseline["meta"].get(key) != report["meta"].get(key):
+            print(f"WARNING: {key} differs from the baseline ({baseline['meta'].get(key)} vs "
+                  f"{report['meta'].get(key)}), numbers are not comparable")
+    return regressions
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def command_run(args):
+    report = {
+        "meta": {
+            "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "model": os.path.basename(args.model),
+            "seconds": args.seconds,
+            "load_seconds": args.load_seconds,
+            "workers": args.workers,
+            "concurrency": args.concurrency
+        },
+        "results": {}
+    }
+
+    print(f"\n{'benchmark':<26}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>9}")
+    if not args.skip_micro:
+        run_microbenchmarks(args, report["results"])
+    if not args.skip_load:
+        run_load_test(args, report["results"])
+
+    out = DEFAULT_BASELINE if args.save_baseline else args.out
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {out}")
+
+    if args.baseline and not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline} (create one with --save-baseline)")
+            return 0
+        regressions = compare(load_report(args.baseline), report, args.tolerance)
+        return report_regressions(regressions)
+    return 0
+
+
+def report_regressions(regressions):
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale API benchmark suite")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Run the benchmarks and write a JSON report")
+    run.add_argument('--model', default=os.path.join(BASE_DIR, 'fruit_classifier_model.h5'))
+    run.add_argument('--labels', default=os.path.join(BASE_DIR, 'model_info.json'))
+    run.add_argument('--out', default='benchmark_report.json')
+    run.add_argument('--baseline', default=DEFAULT_BASELINE, help="Compare with this report ('' to skip)")
+    run.add_argument('--save-baseline', action='store_true', help=f"Write the report to {DEFAULT_BASELINE}")
+    run.add_argument('--tolerance', type=float, default=None, help="Allowed change in %% for every metric")
+    run.add_argument('--seconds', type=float, default=2.0, help="Seconds per microbenchmark")
+    run.add_argument('--load-seconds', type=float, default=15.0, help="Seconds per load-test endpoint")
+    run.add_argument('--workers', type=int, default=2, help="gunicorn workers for the load test")
+    run.add_argument('--concurrency', type=int, default=8, help="Closed-loop clients")
+    run.add_argument('--skip-micro', action='store_true')
+    run.add_argument('--skip-load', action='store_true')
+    run.add_argument('--quick', action='store_true', help="Short runs for a smoke test")
+
+    compare_parser = commands.add_parser('compare', help="Compare a report with a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('report')
+    compare_parser.add_argument('--tolerance', type=float, default=None)
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        sys.exit(report_regressions(compare(load_report(args.baseline), load_report(args.report), args.tolerance)))
+
+    if args.quick:
+        args.seconds = 0.3
+        args.load_seconds = 3.0
+    sys.exit(command_run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,12 +6,15 @@
 // Configuration
 // Use relative URL for API calls - works both locally and in production
 const API_URL = window.location.origin + '/api';
+// How often the scale reading is polled when the server cannot stream it (ms)
+const SCALE_POLL_INTERVAL = 500;
 
 // Global state
 let cameraStream = null;
 let currentResult = null;
 let shoppingCart = [];
 let allProducts = [];
+let scaleReading = null;
 
 // DOM Elements
 const elements = {
@@ -47,7 +50,10 @@ const elements = {
     cartTotal: document.getElementById('cart-total'),
     checkoutBtn: document.getElementById('checkout-btn'),
     clearCartBtn: document.getElementById('clear-cart-btn'),
-    toast: document.getElementById('toast')
+    toast: document.getElementById('toast'),
+    scaleLive: document.getElementById('scale-live'),
+    scaleLiveWeight: document.getElementById('scale-live-weight'),
+    scaleLiveState: document.getElementById('scale-live-state')
 };
 
 // Initialize application
@@ -55,6 +61,7 @@ document.addEventListener('DOMContentLoaded', () => {
     initializeEventListeners();
     loadProducts();
     checkBackendStatus();
+    connectScale();
 });
 
 // Initialize event listeners
@@ -198,6 +205,98 @@ function stopCamera() {
     }
 }
 
+// Subscribe to live readings of the physical scale (pushed by the server, polled where it cannot push)
+async function connectScale() {
+    let data;
+    try {
+        const response = await fetch(`${API_URL}/scale`);
+        data = await response.json();
+        if (!data.enabled) {
+            return;
+        }
+    } catch (error) {
+        console.error('Scale status error:', error);
+        return;
+    }
+
+    elements.scaleLive.style.display = 'inline-block';
+    if (!data.stream) {
+        // Single-threaded workers cannot hold a stream open
+        updateScaleReading(data);
+        setInterval(pollScale, SCALE_POLL_INTERVAL);
+        return;
+    }
+
+    // EventSource reconnects by itself when the stream ends or the connection drops
+    const source = new EventSource(`${API_URL}/scale/stream`);
+    source.addEventListener('reading', (event) => updateScaleReading(JSON.parse(event.data)));
+    source.onerror = () => {
+        elements.scaleLiveState.textContent = 'łączenie...';
+        elements.scaleLive.classList.remove('stable');
+    };
+}
+
+// Fetch the latest scale reading once
+async function pollScale() {
+    try {
+        const response = await fetch(`${API_URL}/scale`);
+        updateScaleReading(await response.json());
+    } catch (error) {
+        elements.scaleLiveState.textContent = 'łączenie...';
+        elements.scaleLive.classList.remove('stable');
+    }
+}
+
+// Show a scale reading and re-price the displayed product when the weight settles
+function updateScaleReading(reading) {
+    scaleReading = reading;
+
+    if (!reading.connected) {
+        elements.scaleLiveWeight.textContent = '-';
+        elements.scaleLiveState.textContent = 'brak połączenia z wagą';
+        elements.scaleLive.classList.remove('stable');
+        return;
+    }
+
+    elements.scaleLiveWeight.textContent = reading.grams.toFixed(1);
+    elements.scaleLiveState.textContent = reading.stable ? 'stabilna' : 'ważenie...';
+    elements.scaleLive.classList.toggle('stable', reading.stable);
+
+    if (reading.stable && reading.stable_grams > 0 && currentResult && currentResult.price &&
+        currentResult.price.price_per_kg && elements.results.style.display === 'block') {
+        applyMeasuredWeight(reading.stable_grams);
+    }
+}
+
+// Settled weight on the scale in grams, or null
+function measuredWeight() {
+    if (scaleReading && scaleReading.connected && scaleReading.stable && scaleReading.stable_grams > 0) {
+        return scaleReading.stable_grams;
+    }
+    return null;
+}
+
+// Use the weight from the scale for the current product (price per kg is already known)
+function applyMeasuredWeight(weightGrams) {
+    const weightKg = weightGrams / 1000;
+    const totalPrice = Math.round(weightKg * currentResult.price.price_per_kg * 100) / 100;
+
+    currentResult.weight = {
+        weight_grams: weightGrams,
+        weight_kg: Math.round(weightKg * 1000) / 1000,
+        note: 'Zważono na wadze',
+        method: 'scale'
+    };
+    currentResult.price.weight_grams = weightGrams;
+    currentResult.price.weight_kg = currentResult.weight.weight_kg;
+    currentResult.price.total_price = totalPrice;
+
+    elements.weightGrams.textContent = weightGrams.toFixed(1);
+    elements.weightKg.textContent = currentResult.weight.weight_kg.toFixed(3);
+    elements.weightNote.textContent = currentResult.weight.note;
+    elements.totalPrice.textContent = totalPrice.toFixed(2);
+}
+
 // Classify image using backend API
 async function classifyImage(imageBlob) {
     try {
@@ -206,32 +305,24 @@ async function classifyImage(imageBlob) {
         elements.results.style.display = 'none';
         showStatus('Analizowanie obrazu...', 'info');
 
-        // Convert blob to base64
-        const reader = new FileReader();
-        reader.readAsDataURL(imageBlob);
-
-        reader.onloadend = async () => {
-            const base64Image = reader.result;
-
-            // Send to backend
-            const response = await fetch(`${API_URL}/predict`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ image: base64Image })
-            });
+        // Send the JPEG/PNG bytes as the raw request body (no base64 round-trip)
+        const response = await fetch(`${API_URL}/predict`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': imageBlob.type || 'application/octet-stream'
+            },
+            body: imageBlob
+        });
 
-            if (!response.ok) {
-                throw new Error('Classification failed');
-            }
+        if (!response.ok) {
+            throw new Error('Classification failed');
+        }
 
-            const data = await response.json();
+        const data = await response.json();
 
-            // Hide loading, show results
-            elements.loading.style.display = 'none';
-            displayResults(data);
-        };
+        // Hide loading, show results
+        elements.loading.style.display = 'none';
+        displayResults(data);
 
     } catch (error) {
         console.error('Classification error:', error);
@@ -412,8 +503,8 @@ async function confirmManualSelection() {
         const estimatorResponse = await fetch(`${API_URL}/product/${selectedProduct}`);
         const productData = await estimatorResponse.json();
 
-        // Estimate weight using current result or default
-        const weightGrams = currentResult?.weight?.weight_grams || 150;
+        // Weight from the scale, else the current result or a default
+        const weightGrams = measuredWeight() || currentResult?.weight?.weight_grams || 150;
 
         // Calculate price
         const priceResponse = await fetch(`${API_URL}/calculate_price`, {
@@ -532,8 +623,8 @@ async function selectAlternative(productName) {
     try {
         showStatus('Aktualizowanie wyboru...', 'info');
 
-        // Get weight estimate for selected product
-        const weightGrams = currentResult?.weight?.weight_grams || 150;
+        // Weight from the scale, else the current result or a default
+        const weightGrams = measuredWeight() || currentResult?.weight?.weight_grams || 150;
 
         // Calculate price
         const priceResponse = await fetch(`${API_URL}/calculate_price`, {
@@ -0,0 +1,100 @@
+"""
+Transaction history query tests
+Every filter combination of /api/transactions must be a range scan of an
+index ending in (created_at, id), so pages come out in order without a sort
+and keyset pagination stays as fast on page 1000 as on page 1.
+
+Usage:
+    python -m pytest tests/test_transactions_query.py
+"""
+
+import os
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
+
+from database import ProductDatabase, encode_cursor  # noqa: E402
+
+CURSOR = encode_cursor('2025-06-01 12:00:00', 500)
+MARCH = {'start': '2025-03-01', 'end': '2025-04-01'}
+
+# Filters -> index the page query must walk (each one ends in created_at, id)
+FILTER_INDEXES = [
+    ({}, 'idx_transactions_created_at'),
+    ({'cursor': CURSOR}, 'idx_transactions_created_at'),
+    (MARCH, 'idx_transactions_created_at'),
+    (dict(MARCH, cursor=CURSOR), 'idx_transactions_created_at'),
+    ({'min_confidence': 0.9}, 'idx_transactions_created_at'),
+    ({'min_confidence': 0.9, 'cursor': CURSOR}, 'idx_transactions_created_at'),
+    ({'product_name': 'Product 7'}, 'idx_transactions_product_name'),
+    ({'product_name': 'Product 7', 'cursor': CURSOR}, 'idx_transactions_product_name'),
+    (dict(MARCH, product_name='Product 7'), 'idx_transactions_product_name'),
+    (dict(MARCH, product_name='Product 7', min_confidence=0.5, cursor=CURSOR), 'idx_transactions_product_name'),
+    ({'store_id': 'store-1'}, 'idx_transactions_store'),
+    ({'store_id': 'store-1', 'cursor': CURSOR}, 'idx_transactions_store'),
+    (dict(MARCH, store_id='store-1'), 'idx_transactions_store'),
+    (dict(MARCH, store_id='store-1', min_confidence=0.5, cursor=CURSOR), 'idx_transactions_store'),
+]
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    """Migrated database with a year of synthetic transactions in a few stores"""
+    db = ProductDatabase(str(tmp_path_factory.mktemp('history') / 'history.db'), pool_size=2)
+    assert db.connect()
+    assert db.initialize_schema()
+    with db.pool.transaction() as conn:
+        conn.execute('''
+            WITH RECURSIVE seq(x) AS (SELECT 0 UNION ALL SELECT x + 1 FROM seq WHERE x + 1 < 5000)
+            INSERT INTO transactions (product_name, weight_g, price_per_kg, total_price, confidence, created_at,
+                                      store_id)
+            SELECT 'Product ' || (x % 20), 500, 6.0, 3.0, (x * 37 % 1000) / 1000.0,
+                   datetime('2025-01-01', '+' || (x * 6307) || ' seconds'), 'store-' || (x % 4)
+            FROM seq
+        ''')
+        conn.execute("ANALYZE")
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize('filters, index', FILTER_INDEXES,
+                         ids=['+'.join(sorted(filters)) or 'none' for filters, _ in FILTER_INDEXES])
+def test_page_query_uses_ordered_index(database, filters, index):
+    sql, params = database.build_transactions_query(51, **filters)
+    with database.pool.connection() as conn:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    assert len(plan) == 1, plan
+    assert f"USING INDEX {index}" in plan[0] or f"USING COVERING INDEX {index}" in plan[0], plan
+    assert not any('TEMP B-TREE' in step for step in plan), plan
+
+
+def test_pages_follow_the_cursor(database):
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = database.get_transactions_page(700, cursor=cursor, store_id='store-2')
+        seen += [(row['created_at'], row['id']) for row in page]
+        if cursor is None:
+            break
+
+    assert len(seen) == 1250
+    assert seen == sorted(seen, reverse=True)
+
+
+@pytest.mark.parametrize('start, end', [('2025-13', None), (None, '01.03.2025'), ('2025-03-01T00:00:00', None)])
+def test_malformed_dates_are_rejected(database, start, end):
+    with pytest.raises(ValueError):
+        database.get_transactions_page(10, start=start, end=end)
+
+
+def test_date_and_timestamp_bounds(database):
+    by_day, _ = database.get_transactions_page(1000, start='2025-03-01', end='2025-03-02')
+    by_time, _ = database.get_transactions_page(1000, start='2025-03-01 00:00:00', end='2025-03-01 12:00:00')
+
+    assert by_day and by_time
+    assert all('2025-03-01' <= row['created_at'] < '2025-03-02' for row in by_day)
+    assert all(row['created_at'] < '2025-03-01 12:00:00' for row in by_time)